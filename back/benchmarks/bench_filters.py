@@ -0,0 +1,128 @@
+"""
+Search filter benchmark.
+
+Builds an asset_type table with N rows (1,000,000 by default) in a SQLite
+file, then compares the legacy substring filter (ILIKE '%value%') with the
+compiled filter operators (eq, prefix, in) for the page query and the count
+query that search_items runs.
+
+Usage:
+    poetry run python benchmarks/bench_filters.py [--rows N] [--db PATH]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from uuid import uuid4
+
+from sqlalchemy import String, cast, create_engine, func, text
+from sqlmodel import select
+
+from app.models import utc_now
+from app.models.asset_type import AssetType, AssetTypeFilter
+from app.services import GenericService
+
+
+def legacy_filters(statement, filters: AssetTypeFilter):
+    """The filter loop GenericService used before filters were compiled."""
+    filter_data = filters.model_dump(exclude_unset=True, exclude_none=True)
+    for key in ("page", "page_size", "sort_by", "sort_order", "limit"):
+        filter_data.pop(key, None)
+    for field_name, value in filter_data.items():
+        field = getattr(AssetType, field_name)
+        if isinstance(value, str):
+            statement = statement.where(cast(field, String).ilike(f"%{value}%"))
+        else:
+            statement = statement.where(field == value)
+    return statement
+
+
+def populate(engine, rows: int) -> None:
+    AssetType.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT count(*) FROM asset_type")).scalar()
+        if existing >= rows:
+            return
+        now = utc_now().replace(tzinfo=None).isoformat(sep=" ")
+        batch = []
+        for i in range(existing, rows):
+            batch.append(
+                (now, now, uuid4().hex, 1, f"asset-{i:07d}", f"Description {i}")
+            )
+            if len(batch) == 50_000:
+                conn.exec_driver_sql(
+                    "INSERT INTO asset_type (created_at, modified_at, id, is_active,"
+                    " name, description) VALUES (?, ?, ?, ?, ?, ?)",
+                    batch,
+                )
+                batch.clear()
+        if batch:
+            conn.exec_driver_sql(
+                "INSERT INTO asset_type (created_at, modified_at, id, is_active,"
+                " name, description) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_bench_asset_type_name ON asset_type (name)"
+        )
+        conn.exec_driver_sql("ANALYZE")
+
+
+def timed(engine, statement, repeat: int) -> tuple[float, str]:
+    with engine.connect() as conn:
+        compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(statement).all()
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples), "; ".join(row[-1] for row in plan)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--db", default=os.path.join(tempfile.gettempdir(), "bench_filters.db")
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    print(f"populating {args.rows:,} rows in {args.db} ...")
+    populate(engine, args.rows)
+
+    service = GenericService(AssetType)
+    target = f"asset-{args.rows // 2:07d}"
+    cases = [
+        ("legacy contains", legacy_filters, AssetTypeFilter(name=target)),
+        ("eq", service._apply_filters, AssetTypeFilter(name=target)),
+        ("prefix", service._apply_filters, AssetTypeFilter(name__prefix=target[:-1])),
+        (
+            "in",
+            service._apply_filters,
+            AssetTypeFilter(name__in=f"{target},asset-0000001"),
+        ),
+    ]
+
+    for label, apply, filters in cases:
+        page = apply(select(AssetType).where(AssetType.is_active), filters)
+        page = page.order_by(AssetType.id).limit(100)
+        count = apply(
+            select(func.count()).select_from(AssetType).where(AssetType.is_active),
+            filters,
+        )
+        page_time, page_plan = timed(engine, page, args.repeat)
+        count_time, _ = timed(engine, count, args.repeat)
+        print(
+            f"{label:<16} page {page_time * 1000:9.2f} ms"
+            f"   count {count_time * 1000:9.2f} ms   plan: {page_plan}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Rebalancing benchmark.
+
+Builds P portfolios (10,000 by default) holding H of T tickers split over
+K asset types, and times:
+- compute_rebalance in target mode over every portfolio
+- mean_variance_weights, solved once for the batch
+against a per-portfolio, per-ticker Python loop of the same rules, run on a
+sample of portfolios and extrapolated.
+
+Usage:
+    poetry run python benchmarks/bench_rebalance.py [--portfolios P]
+        [--tickers T] [--holdings H] [--types K] [--sample S]
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.models.rebalance import RebalanceRequest
+from app.services.rebalance import compute_rebalance, mean_variance_weights
+
+TYPES = ("stock", "etf", "fixed-income", "crypto", "cash")
+
+
+def synthetic(portfolios: int, tickers: int, holdings: int, types: int, seed=0):
+    rng = np.random.default_rng(seed)
+    names = [f"T{i:04d}" for i in range(tickers)]
+    rows = []
+    for portfolio in range(portfolios):
+        for ticker in rng.choice(tickers, holdings, replace=False):
+            rows.append((portfolio, names[ticker], float(rng.integers(1, 500))))
+    positions = pd.DataFrame(rows, columns=["portfolio_id", "ticker", "quantity"])
+    prices = pd.Series(rng.uniform(5, 500, tickers), index=names)
+    request = RebalanceRequest(
+        targets=dict(zip(TYPES[:types], rng.dirichlet(np.ones(types)))),
+        asset_types={name: TYPES[i % types] for i, name in enumerate(names)},
+        lot_sizes={name: 10.0 for name in names[::7]},
+        min_trade=100.0,
+    )
+    return positions, prices, request
+
+
+def loop_rebalance(holdings, prices, request):
+    """One portfolio with dicts: {ticker: quantity} -> {ticker: trade}."""
+    types = request.asset_types
+    lots = request.lot_sizes
+    values = {t: q * prices[t] for t, q in holdings.items()}
+    total = sum(values.values())
+    by_type = {}
+    for ticker, value in values.items():
+        by_type[types[ticker]] = by_type.get(types[ticker], 0.0) + value
+    members = {}
+    for ticker, name in types.items():
+        members.setdefault(name, []).append(ticker)
+
+    wanted = {}
+    for name, target in request.targets.items():
+        for ticker in members[name]:
+            if by_type.get(name, 0.0) > 0:
+                share = values.get(ticker, 0.0) / by_type[name]
+            else:
+                share = 1 / len(members[name])
+            change = total * target * share - values.get(ticker, 0.0)
+            if abs(change) >= request.min_trade:
+                wanted[ticker] = change
+
+    trades, raised = {}, 0.0
+    for ticker, change in wanted.items():
+        if change < 0:
+            lot = lots.get(ticker, 1.0)
+            count = math.ceil(round(-change / prices[ticker] / lot, 9))
+            quantity = min(count * lot, holdings.get(ticker, 0.0))
+            trades[ticker] = -quantity
+            raised += quantity * prices[ticker]
+    needed = sum(change for change in wanted.values() if change > 0)
+    scale = raised / needed if needed > raised else 1.0
+    for ticker, change in wanted.items():
+        if change > 0:
+            lot = lots.get(ticker, 1.0)
+            count = math.floor(round(change * scale / prices[ticker] / lot, 9))
+            if count * lot * prices[ticker] >= request.min_trade:
+                trades[ticker] = count * lot
+    return {ticker: quantity for ticker, quantity in trades.items() if quantity}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--portfolios", type=int, default=10_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--holdings", type=int, default=30)
+    parser.add_argument("--types", type=int, default=4)
+    parser.add_argument("--sample", type=int, default=50)
+    args = parser.parse_args()
+
+    positions, prices, request = synthetic(
+        args.portfolios, args.tickers, args.holdings, args.types
+    )
+    print(
+        f"{args.portfolios:,} portfolios x {args.tickers} tickers, "
+        f"{len(positions):,} positions"
+    )
+
+    start = time.perf_counter()
+    result = compute_rebalance(positions, request, prices)
+    print(f"vectorized       {time.perf_counter() - start:9.2f} s")
+
+    rng = np.random.default_rng(1)
+    loadings = rng.normal(0, 0.1, (args.tickers, 5))
+    covariance = loadings @ loadings.T + np.diag(rng.uniform(0.01, 0.05, args.tickers))
+    mean = rng.normal(0.06, 0.03, args.tickers)
+    type_index = np.arange(args.tickers) % args.types
+    targets = np.array(list(request.targets.values()))
+    start = time.perf_counter()
+    mean_variance_weights(mean, covariance, type_index, targets, 3.0)
+    print(f"mean-variance    {time.perf_counter() - start:9.2f} s (once per batch)")
+
+    groups = positions.groupby("portfolio_id")
+    sample = [
+        dict(groups.get_group(portfolio)[["ticker", "quantity"]].values)
+        for portfolio in range(args.sample)
+    ]
+    start = time.perf_counter()
+    expected = [loop_rebalance(holdings, prices, request) for holdings in sample]
+    loop_time = (time.perf_counter() - start) / args.sample * args.portfolios
+    print(f"python loop      {loop_time:9.2f} s (extrapolated from {args.sample})")
+
+    trades = result.trades.groupby("portfolio_id")
+    for portfolio, loop_trades in enumerate(expected):
+        actual = trades.get_group(portfolio).set_index("ticker")["quantity"]
+        assert rounded(actual.to_dict()) == rounded(loop_trades)
+
+
+def rounded(trades):
+    return {ticker: round(quantity, 6) for ticker, quantity in trades.items()}
+
+
+if __name__ == "__main__":
+    main()
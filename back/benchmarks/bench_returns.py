@@ -0,0 +1,110 @@
+"""
+Portfolio returns benchmark.
+
+Values the synthetic portfolios of bench_valuation, then times
+compute_returns (TWR and XIRR over the 1M, 3M, YTD, 1Y and ITD windows of
+every portfolio) against a per-portfolio, per-window Python loop with a
+scalar root finder. The loop only runs on a sample of portfolios; its time
+for all of them is extrapolated.
+
+Usage:
+    poetry run python benchmarks/bench_returns.py [--portfolios P]
+        [--tickers T] [--days D] [--trades N] [--sample S]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.returns import WINDOWS, compute_returns, window_bases
+from app.services.valuation import value_portfolios
+from bench_valuation import synthetic
+
+
+def scalar_xirr(amounts, years, low=-0.9999, high=1e6):
+    """Newton from 10%, bisection when it leaves the bracket."""
+
+    def npv(rate):
+        return sum(a / (1 + rate) ** t for a, t in zip(amounts, years))
+
+    if npv(low) * npv(high) > 0:
+        return float("nan")
+    rate = 0.1
+    for _ in range(200):
+        value = npv(rate)
+        slope = sum(-t * a / (1 + rate) ** (t + 1) for a, t in zip(amounts, years))
+        if (value > 0) == (npv(low) > 0):
+            low = rate
+        else:
+            high = rate
+        step = rate - value / slope if slope else high + 1
+        guess = step if low < step < high else (low + high) / 2
+        if abs(guess - rate) < 1e-10:
+            return guess
+        rate = guess
+    return rate
+
+
+def loop_returns(valuation, portfolio, bases, end):
+    market_value = valuation.market_value[portfolio]
+    flows = valuation.flows[portfolio]
+    pnl = valuation.pnl[portfolio]
+    dates = market_value.index
+    results = []
+    for base in bases:
+        growth = 1.0
+        amounts, years = [], []
+        start = dates[max(base, 0)]
+        if base >= 0:
+            amounts.append(-market_value.iloc[base])
+            years.append(0.0)
+        for day in range(base + 1, end + 1):
+            opening = market_value.iloc[day - 1] if day else 0.0
+            invested = opening or flows.iloc[day]
+            if invested:
+                growth *= 1 + pnl.iloc[day] / invested
+            if flows.iloc[day]:
+                amounts.append(-flows.iloc[day])
+                years.append((dates[day] - start).days / 365.0)
+        amounts.append(market_value.iloc[end])
+        years.append((dates[end] - start).days / 365.0)
+        results.append((growth - 1, scalar_xirr(amounts, years)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--portfolios", type=int, default=1_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--days", type=int, default=5 * 252)
+    parser.add_argument("--trades", type=int, default=50, help="per portfolio")
+    parser.add_argument("--sample", type=int, default=5)
+    args = parser.parse_args()
+
+    trades, prices = synthetic(args.portfolios, args.tickers, args.days, args.trades)
+    valuation = value_portfolios(trades, prices)
+    print(
+        f"{args.portfolios:,} portfolios x {len(WINDOWS)} windows over "
+        f"{args.days:,} days, {len(trades):,} trades"
+    )
+
+    start = time.perf_counter()
+    returns = compute_returns(valuation)
+    engine_time = time.perf_counter() - start
+    print(f"vectorized       {engine_time:9.2f} s")
+
+    dates = valuation.market_value.index
+    bases = window_bases(dates, dates[-1], WINDOWS)
+    start = time.perf_counter()
+    for portfolio in range(args.sample):
+        expected = loop_returns(valuation, portfolio, bases, len(dates) - 1)
+        twr, xirr = map(list, zip(*expected))
+        np.testing.assert_allclose(returns.twr.loc[portfolio], twr, rtol=1e-6)
+        np.testing.assert_allclose(returns.xirr.loc[portfolio], xirr, rtol=1e-6)
+    loop_time = (time.perf_counter() - start) / args.sample * args.portfolios
+    print(f"python loop      {loop_time:9.2f} s (extrapolated from {args.sample})")
+
+
+if __name__ == "__main__":
+    main()
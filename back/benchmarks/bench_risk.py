@@ -0,0 +1,104 @@
+"""
+Rolling risk benchmark.
+
+Writes random daily prices for T tickers (5,000 by default) and a benchmark
+over D business days (10 years) to a temporary price store, then times:
+- rolling_risk over the whole return matrix
+- update_risk from an empty risk store, then after one more day of bars
+against a per-ticker loop of pandas rolling windows, run on a sample of
+tickers and extrapolated.
+
+Usage:
+    poetry run python benchmarks/bench_risk.py [--tickers T] [--days D]
+        [--window W] [--sample S]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.price_store import PriceStore
+from app.services.risk import RISK_COLUMNS, rolling_risk, update_risk
+
+
+def loop_risk(x: pd.Series, b: pd.Series, window: int) -> pd.DataFrame:
+    """Every metric with pandas rolling windows, one ticker at a time."""
+    rolling = x.rolling(window)
+
+    def drawdown(values):
+        wealth = np.concatenate([[1.0], np.cumprod(1 + values)])
+        return -(wealth / np.maximum.accumulate(wealth) - 1).min()
+
+    def tail(values):
+        return np.sort(values)[: int(np.ceil(0.05 * window))]
+
+    return pd.DataFrame(
+        {
+            "volatility": rolling.std() * np.sqrt(252),
+            "beta": rolling.cov(b) / b.rolling(window).var(),
+            "tracking_error": (x - b).rolling(window).std() * np.sqrt(252),
+            "max_drawdown": rolling.apply(drawdown, raw=True),
+            "var_historical": -rolling.apply(lambda v: tail(v)[-1], raw=True),
+            "cvar_historical": -rolling.apply(lambda v: tail(v).mean(), raw=True),
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickers", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=10 * 252)
+    parser.add_argument("--window", type=int, default=252)
+    parser.add_argument("--sample", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    days = pd.bdate_range("2015-01-01", periods=args.days + 1)
+    names = [f"T{i:04d}" for i in range(args.tickers)]
+    with tempfile.TemporaryDirectory() as root:
+        prices = PriceStore(f"{root}/prices")
+        for name in [*names, "SPY"]:
+            close = 100 * np.cumprod(1 + rng.normal(0.0003, 0.015, args.days))
+            prices.append(name, pd.DataFrame({"close": close}, index=days[:-1]))
+        print(f"{args.tickers:,} tickers x {args.days:,} days, window {args.window}")
+
+        frame = prices.read_many([*names, "SPY"])
+        returns = frame.pct_change(fill_method=None).to_numpy()
+        start = time.perf_counter()
+        metrics = rolling_risk(returns[:, :-1], returns[:, -1], args.window)
+        print(f"rolling_risk        {time.perf_counter() - start:9.2f} s")
+
+        store = PriceStore(f"{root}/risk", columns=RISK_COLUMNS)
+        start = time.perf_counter()
+        rows = update_risk(names, "SPY", args.window, prices, store)
+        print(
+            f"update_risk (full)  {time.perf_counter() - start:9.2f} s, {rows:,} rows"
+        )
+
+        for name in [*names, "SPY"]:
+            close = 100 * (1 + rng.normal(0.0003, 0.015, 1))
+            prices.append(name, pd.DataFrame({"close": close}, index=days[-1:]))
+        start = time.perf_counter()
+        rows = update_risk(names, "SPY", args.window, prices, store)
+        print(
+            f"update_risk (1 day) {time.perf_counter() - start:9.2f} s, {rows:,} rows"
+        )
+
+        benchmark = frame["SPY"].pct_change(fill_method=None)
+        start = time.perf_counter()
+        for j in range(args.sample):
+            expected = loop_risk(
+                frame[names[j]].pct_change(fill_method=None), benchmark, args.window
+            )
+            np.testing.assert_allclose(
+                metrics[: expected.shape[1], :, j].T, expected.to_numpy(), rtol=1e-6
+            )
+        loop_time = (time.perf_counter() - start) / args.sample * args.tickers
+        print(f"pandas loop     {loop_time:9.2f} s (extrapolated from {args.sample})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Response serialization benchmark.
+
+Compares the default FastAPI path (validate the returned model against the
+route's response_model, then encode with the stdlib JSON encoder) with the
+GenericRouter fast path (RowSerializer + orjson) for a single item and a
+100-item page of AssetType rows.
+
+Usage:
+    poetry run python benchmarks/bench_serialization.py [--rounds N]
+"""
+
+import argparse
+import asyncio
+import json
+import timeit
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.models import GenericListResponse, GenericResponse, utc_now
+from app.models.asset_type import AssetType, AssetTypeRead
+from app.utils.serialization import (
+    ORJSONResponse,
+    RowSerializer,
+    item_payload,
+    list_payload,
+)
+
+
+def make_rows(count: int) -> list[AssetType]:
+    now = utc_now()
+    return [
+        AssetType(
+            id=uuid4(),
+            created_at=now,
+            modified_at=now,
+            name=f"asset-type-{i}",
+            description=f"Description for asset type {i}",
+        )
+        for i in range(count)
+    ]
+
+
+loop = asyncio.new_event_loop()
+
+
+def fastapi_single(field, row) -> bytes:
+    content = loop.run_until_complete(
+        serialize_response(field=field, response_content=GenericResponse(data=row))
+    )
+    return JSONResponse(content).body
+
+
+def fastapi_list(field, rows) -> bytes:
+    content = loop.run_until_complete(
+        serialize_response(
+            field=field,
+            response_content=GenericListResponse(
+                items=rows, total=len(rows), page=1, page_size=len(rows)
+            ),
+        )
+    )
+    return JSONResponse(content).body
+
+
+def fast_single(serializer, row) -> bytes:
+    return ORJSONResponse(item_payload(serializer.dump(row))).body
+
+
+def fast_list(serializer, rows) -> bytes:
+    payload = list_payload(serializer.dump_many(rows), len(rows), 1, len(rows))
+    return ORJSONResponse(payload).body
+
+
+def report(name: str, rounds: int, baseline: float, fast: float) -> None:
+    print(
+        f"{name:<12} fastapi {baseline / rounds * 1e6:9.1f} us"
+        f"   fast path {fast / rounds * 1e6:9.1f} us"
+        f"   speedup x{baseline / fast:5.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    single_field = create_model_field(
+        name="response", type_=GenericResponse[AssetTypeRead], mode="serialization"
+    )
+    list_field = create_model_field(
+        name="response",
+        type_=GenericListResponse[AssetTypeRead],
+        mode="serialization",
+    )
+    serializer = RowSerializer(AssetTypeRead)
+    row = make_rows(1)[0]
+    rows = make_rows(100)
+
+    # Both paths must produce the same document
+    assert json.loads(fastapi_single(single_field, row)) == json.loads(
+        fast_single(serializer, row)
+    )
+    assert json.loads(fastapi_list(list_field, rows)) == json.loads(
+        fast_list(serializer, rows)
+    )
+
+    rounds = args.rounds
+    report(
+        "single item",
+        rounds,
+        timeit.timeit(lambda: fastapi_single(single_field, row), number=rounds),
+        timeit.timeit(lambda: fast_single(serializer, row), number=rounds),
+    )
+    list_rounds = max(rounds // 10, 1)
+    report(
+        "100 items",
+        list_rounds,
+        timeit.timeit(lambda: fastapi_list(list_field, rows), number=list_rounds),
+        timeit.timeit(lambda: fast_list(serializer, rows), number=list_rounds),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Monte Carlo simulation benchmark.
+
+Simulates P paths (100,000 by default) of a portfolio of T tickers over Y
+years with a random return model, and times simulate:
+- with chunks spread over a pool of W processes
+- with chunks run in threads (SIMULATION_WORKERS = 0)
+against a per-path Python loop, run on a sample of paths and extrapolated.
+Also prints the memory one array of every monthly draw would take, which
+chunking avoids.
+
+Usage:
+    poetry run python benchmarks/bench_simulation.py [--paths P]
+        [--tickers T] [--years Y] [--workers W] [--sample S]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.config import settings
+from app.services.simulation import ReturnModel, cholesky_factor, simulate
+
+
+def random_model(tickers: int, seed: int = 0) -> ReturnModel:
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(0, 0.03, (tickers, 3))
+    covariance = loadings @ loadings.T + np.diag(rng.uniform(0.0002, 0.002, tickers))
+    mean = rng.normal(0.006, 0.002, tickers)
+    return ReturnModel(
+        [f"T{i}" for i in range(tickers)], mean, cholesky_factor(covariance)
+    )
+
+
+def loop_paths(model, weights, initial, contribution, years, paths, seed):
+    """One path at a time, one month at a time."""
+    rng = np.random.default_rng(seed)
+    finals = []
+    for _ in range(paths):
+        value = initial
+        for _ in range(years * 12):
+            draws = model.mean + model.factor @ rng.standard_normal(len(weights))
+            value = max(value * float(np.exp(draws) @ weights) + contribution, 0.0)
+        finals.append(value)
+    return finals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    model = random_model(args.tickers)
+    weights = np.full(args.tickers, 1 / args.tickers)
+    initial, contribution = 100_000.0, 500.0
+    months = args.years * 12
+    unchunked = args.paths * months * args.tickers * 8
+    print(
+        f"{args.paths:,} paths x {args.years} years x {args.tickers} tickers, "
+        f"chunks of {settings.SIMULATION_CHUNK_PATHS:,} paths "
+        f"({unchunked / 2**30:.1f} GiB of draws unchunked)"
+    )
+
+    def run(executor=None):
+        start = time.perf_counter()
+        projection = asyncio.run(
+            simulate(
+                model,
+                weights,
+                initial,
+                contribution,
+                args.years,
+                args.paths,
+                seed=1,
+                executor=executor,
+            )
+        )
+        return projection, time.perf_counter() - start
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context) as pool:
+        run(pool)  # Start the workers
+        pooled, pool_time = run(pool)
+    print(f"process pool ({args.workers})  {pool_time:9.2f} s")
+
+    settings.SIMULATION_WORKERS = 0
+    threaded, thread_time = run()
+    print(f"threads           {thread_time:9.2f} s")
+    assert pooled.percentiles.equals(threaded.percentiles)
+    print(threaded.percentiles.iloc[[0, 10, 20, -1]].round(0).to_string())
+
+    start = time.perf_counter()
+    loop_paths(model, weights, initial, contribution, args.years, args.sample, 1)
+    loop_time = (time.perf_counter() - start) / args.sample * args.paths
+    print(f"python loop       {loop_time:9.2f} s (extrapolated from {args.sample})")
+
+
+if __name__ == "__main__":
+    main()
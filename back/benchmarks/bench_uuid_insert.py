@@ -0,0 +1,106 @@
+"""
+Primary key insert benchmark.
+
+Inserts N rows (1,000,000 by default) into a fresh asset_type table (with its
+declared indexes) in a SQLite file, once with random uuid4 ids and once with
+time-ordered uuid7 ids, committing every batch. The page cache is kept small
+so the primary key index outgrows it, as a production table would.
+
+Reports overall and final-decile throughput, since random keys slow down as
+the index grows, plus the resulting file size.
+
+Usage:
+    poetry run python benchmarks/bench_uuid_insert.py [--rows N] [--batch N]
+        [--cache-mb N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from uuid import uuid4
+
+from sqlalchemy import create_engine, event
+
+from app.models import utc_now
+from app.models.asset_type import AssetType
+from app.utils.ids import uuid7
+
+INSERT = (
+    "INSERT INTO asset_type (created_at, modified_at, id, is_active, name,"
+    " description) VALUES (?, ?, ?, 1, ?, ?)"
+)
+
+
+def run(generator, rows: int, batch_size: int, cache_mb: int, path: str) -> dict:
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA cache_size = -{cache_mb * 1024}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+    AssetType.__table__.create(engine)
+    now = utc_now().replace(tzinfo=None).isoformat(sep=" ")
+
+    batch_times = []
+    with engine.connect() as conn:
+        for start in range(0, rows, batch_size):
+            batch = [
+                (now, now, generator().hex, f"asset-{i:07d}", f"Description {i}")
+                for i in range(start, min(start + batch_size, rows))
+            ]
+            began = time.perf_counter()
+            conn.exec_driver_sql(INSERT, batch)
+            conn.commit()
+            batch_times.append((len(batch), time.perf_counter() - began))
+    engine.dispose()
+
+    total_rows = sum(count for count, _ in batch_times)
+    total_time = sum(elapsed for _, elapsed in batch_times)
+    tail = batch_times[-max(len(batch_times) // 10, 1) :]
+    return {
+        "rows_per_s": total_rows / total_time,
+        "tail_rows_per_s": sum(c for c, _ in tail) / sum(e for _, e in tail),
+        "seconds": total_time,
+        "size_mb": os.path.getsize(path) / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--cache-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    print(
+        f"{args.rows:,} rows, batches of {args.batch:,}, {args.cache_mb} MB page cache"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for name, generator in (("uuid4", uuid4), ("uuid7", uuid7)):
+            path = os.path.join(directory, f"{name}.db")
+            results[name] = run(generator, args.rows, args.batch, args.cache_mb, path)
+            result = results[name]
+            print(
+                f"{name}: {result['seconds']:7.1f} s"
+                f"   {result['rows_per_s']:9,.0f} rows/s"
+                f"   last 10% {result['tail_rows_per_s']:9,.0f} rows/s"
+                f"   {result['size_mb']:7.1f} MB"
+            )
+
+    random_ids, ordered_ids = results["uuid4"], results["uuid7"]
+    print(
+        f"uuid7 speedup: x{ordered_ids['rows_per_s'] / random_ids['rows_per_s']:.2f}"
+        " overall, "
+        f"x{ordered_ids['tail_rows_per_s'] / random_ids['tail_rows_per_s']:.2f}"
+        " in the last 10%"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Portfolio valuation benchmark.
+
+Generates random trades for P portfolios (1,000 by default) over T tickers
+(500) and D business days (5 years), then times value_portfolios against a
+per-position, per-day Python loop. The loop only runs on a sample of
+portfolios; its time for all of them is extrapolated.
+
+Usage:
+    poetry run python benchmarks/bench_valuation.py [--portfolios P]
+        [--tickers T] [--days D] [--trades N] [--sample S]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.valuation import TRADE_COLUMNS, value_portfolios
+
+
+def synthetic(portfolios: int, tickers: int, days: int, trades: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2020-01-01", periods=days)
+    names = [f"T{i:04d}" for i in range(tickers)]
+    returns = rng.normal(0.0003, 0.02, (days, tickers))
+    prices = pd.DataFrame(
+        100 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=names
+    )
+    count = portfolios * trades
+    frame = pd.DataFrame(
+        {
+            "portfolio_id": rng.integers(portfolios, size=count),
+            "date": dates[rng.integers(days, size=count)],
+            "ticker": np.array(names)[rng.integers(tickers, size=count)],
+            "quantity": rng.integers(1, 100, size=count).astype(float),
+            "price": np.nan,
+        },
+        columns=TRADE_COLUMNS,
+    )
+    return frame, prices
+
+
+def loop_valuation(trades: pd.DataFrame, prices: pd.DataFrame, portfolio) -> list:
+    """Market value per day, one position and one day at a time."""
+    mine = trades[trades["portfolio_id"] == portfolio]
+    values = []
+    for day in prices.index:
+        total = 0.0
+        positions = mine[mine["date"] <= day].groupby("ticker")["quantity"].sum()
+        for ticker, quantity in positions.items():
+            total += quantity * prices.at[day, ticker]
+        values.append(total)
+    return values
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--portfolios", type=int, default=1_000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--days", type=int, default=5 * 252)
+    parser.add_argument("--trades", type=int, default=50, help="per portfolio")
+    parser.add_argument("--sample", type=int, default=2)
+    args = parser.parse_args()
+
+    trades, prices = synthetic(args.portfolios, args.tickers, args.days, args.trades)
+    print(
+        f"{args.portfolios:,} portfolios x {args.tickers:,} tickers x "
+        f"{args.days:,} days, {len(trades):,} trades"
+    )
+
+    start = time.perf_counter()
+    valuation = value_portfolios(trades, prices)
+    engine_time = time.perf_counter() - start
+    print(f"vectorized       {engine_time:9.2f} s")
+
+    start = time.perf_counter()
+    for portfolio in range(args.sample):
+        expected = loop_valuation(trades, prices, portfolio)
+        np.testing.assert_allclose(valuation.market_value[portfolio], expected)
+    loop_time = (time.perf_counter() - start) / args.sample * args.portfolios
+    print(f"python loop      {loop_time:9.2f} s (extrapolated from {args.sample})")
+
+
+if __name__ == "__main__":
+    main()
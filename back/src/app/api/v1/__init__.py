@@ -1,12 +1,16 @@
-from typing import Callable, Generic, Optional, Type, TypeVar, List
+from typing import Awaitable, Callable, Generic, Literal, Optional, Type, TypeVar, List
 from uuid import UUID
 import time
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.background import BackgroundTask
 
 from app.auth.security import get_current_user
-from app.db.session import get_session
+from app.config import settings
+from app.db.session import SessionLocal, engine, get_session
 from app.models import (
     GenericCreate,
     GenericFilter,
@@ -17,7 +21,34 @@ from app.models import (
 )
 from app.models.user import User
 from app.services import GenericService
+from app.utils.admission import AdmissionController
+from app.utils.cache import (
+    CachedPage,
+    LazyPage,
+    SingleFlight,
+    list_cache,
+    list_flights,
+    table_versions,
+)
+from app.utils.idempotency import IdempotencyStore
+from app.utils.rate_limit import rate_limiter
+from app.utils.conditional import (
+    is_not_modified,
+    item_etag,
+    list_etag,
+    normalized_query,
+    not_modified_response,
+    set_validators,
+)
 from app.utils.logging import log_user_action
+from app.utils.serialization import (
+    ORJSONResponse,
+    RowSerializer,
+    dumps,
+    item_payload,
+    list_payload,
+)
+from app.utils.streaming import EXPORT_MEDIA_TYPES, encode_stream
 from app.metrics import track_user_action, track_database_operation
 
 ModelType = TypeVar("ModelType")
@@ -26,6 +57,9 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=GenericUpdate)
 FilterSchemaType = TypeVar("FilterSchemaType", bound=GenericFilter)
 ReadSchemaType = TypeVar("ReadSchemaType", bound=GenericRead)
 
+admission = AdmissionController(engine)
+idempotency_store = IdempotencyStore(engine)
+
 
 class GenericRouter(
     APIRouter,
@@ -35,6 +69,29 @@ class GenericRouter(
 ):
     """
     Generic router class that provides CRUD operations for any model.
+
+    Routes keep their declared response_model for the OpenAPI schema, but
+    build the response themselves: rows are serialized once with a
+    RowSerializer for the read schema and rendered with orjson, skipping
+    FastAPI's response validation and stdlib JSON encoding.
+
+    With cache_lists, rendered list pages are kept in memory keyed by the
+    table version, which every GenericService write bumps. Meant for
+    reference data that is read far more often than it is written.
+
+    With coalesce_reads, identical concurrent GETs from the same user (same
+    route, path and normalized query) share one in-flight query and
+    rendering and receive the same bytes; conditional headers are still
+    evaluated per request.
+
+    Every route passes admission control first: requests over the adaptive
+    concurrency limit of their route class are shed with 503 and Retry-After.
+    Each user then draws from a token bucket per route class; requests over
+    the quota are rejected with 429 and every response reports the remaining
+    budget in RateLimit-* headers.
+
+    Write routes accept an Idempotency-Key header: the first response for a
+    key is stored and replayed to retries instead of repeating the write.
     """
 
     def __init__(
@@ -46,9 +103,18 @@ class GenericRouter(
         update_schema: Type[UpdateSchemaType],
         read_schema: Type[ReadSchemaType],
         filter_schema: Type[FilterSchemaType],
+        cache_lists: bool = False,
+        coalesce_reads: bool = False,
     ):
         super().__init__(
-            prefix=f"/{model_name}", tags=[model_name.title().replace("_", " ")]
+            prefix=f"/{model_name}",
+            tags=[model_name.title().replace("_", " ")],
+            # Admission runs before get_session, so shed requests never
+            # wait on the pool
+            dependencies=[
+                Depends(admission),
+                Depends(rate_limiter.per_user(model_name)),
+            ],
         )
         self.service = service
         self.create_schema = create_schema
@@ -56,6 +122,10 @@ class GenericRouter(
         self.read_schema = read_schema
         self.filter_schema = filter_schema
         self.model_name = model_name
+        self.serializer = RowSerializer(read_schema)
+        self.cache_lists = cache_lists and settings.CACHE_ENABLED
+        self.coalesce_reads = coalesce_reads and settings.COALESCE_ENABLED
+        self.read_flights = SingleFlight(model_name)
 
         # Register routes
         self._register_crud_routes()
@@ -64,6 +134,8 @@ class GenericRouter(
     def _register_crud_routes(self):
         """Register standard CRUD routes."""
         self._register_create_route()
+        # Registered before "/{uid}" so the static path takes precedence
+        self._register_export_route()
         self._register_get_route()
         self._register_list_route()
         self._register_search_route()
@@ -76,43 +148,104 @@ class GenericRouter(
         """Register custom routes. Override this method in subclasses to add custom routes."""
         pass
 
+    def _parse_fields(self, fields: Optional[str]) -> Optional[List[str]]:
+        """Parse a comma-separated sparse fieldset and check it against the read schema."""
+        if not fields:
+            return None
+        names = list(dict.fromkeys(name.strip() for name in fields.split(",")))
+        names = [name for name in names if name]
+        unknown = [name for name in names if name not in self.read_schema.model_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields for {self.model_name}: {', '.join(unknown)}",
+            )
+        return names or None
+
+    async def _write(
+        self,
+        request: Request,
+        user: User,
+        idempotency_key: Optional[str],
+        execute: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """Run a write route, once per Idempotency-Key when the client sends one."""
+        if idempotency_key is None:
+            return await execute()
+        return await idempotency_store.run(
+            request, user.id, idempotency_key, self.model_name, execute
+        )
+
     def _register_create_route(self):
         @self.post("/", response_model=GenericResponse[self.read_schema])
         async def create_item(
+            request: Request,
             obj_in: self.create_schema,
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         ):
-            start_time = time.time()
-            obj = await self.service.create(db, obj_in)
-            duration = time.time() - start_time
-
-            # Track metrics
-            track_user_action("create", self.model_name)
-            track_database_operation("create", self.model_name, duration)
-
-            # Log action
-            await log_user_action(
-                session=db,
-                user_id=user.id,
-                action="create",
-                method="POST",
-                path=f"/{self.model_name}/",
-                target_type=self.model_name,
-                target_id=obj.id,
-                details={"data": obj_in.dict()},
-            )
-            return GenericResponse(data=obj)
+            async def execute() -> Response:
+                start_time = time.time()
+                obj = await self.service.create(db, obj_in)
+                duration = time.time() - start_time
+                data = self.serializer.dump(obj)
+
+                # Track metrics
+                track_user_action("create", self.model_name)
+                track_database_operation("create", self.model_name, duration)
+
+                # Log action
+                await log_user_action(
+                    session=db,
+                    user_id=user.id,
+                    action="create",
+                    method="POST",
+                    path=f"/{self.model_name}/",
+                    target_type=self.model_name,
+                    target_id=obj.id,
+                    details={"data": obj_in.model_dump(mode="json")},
+                )
+                return ORJSONResponse(item_payload(data))
+
+            return await self._write(request, user, idempotency_key, execute)
 
     def _register_get_route(self):
         @self.get("/{uid}", response_model=GenericResponse[self.read_schema])
         async def get_item(
             item_id: UUID,
+            request: Request,
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
         ):
             start_time = time.time()
-            obj = await self.service.get_by_id(db, item_id)
+            if self.coalesce_reads:
+
+                async def render() -> LazyPage:
+                    obj = await self.service.get_by_id(db, item_id, cached=True)
+                    # Read the row now: the leader's session may commit (and
+                    # expire it) before a follower renders
+                    data = self.serializer.dump(obj)
+                    return LazyPage(
+                        item_etag(obj.id, obj.modified_at),
+                        obj.modified_at,
+                        lambda: dumps(item_payload(data)),
+                    )
+
+                # Concurrent identical requests share one lookup, and one
+                # rendering among those not answered 304
+                page = await self.read_flights.do(("get", user.id, item_id), render)
+            else:
+                obj = await self.service.get_by_id(db, item_id, cached=True)
+                page = LazyPage(
+                    item_etag(obj.id, obj.modified_at),
+                    obj.modified_at,
+                    lambda: dumps(item_payload(self.serializer.dump(obj))),
+                )
+            etag, last_modified = page.etag, page.last_modified
+            not_modified = is_not_modified(request, etag, last_modified)
+            # Render before the audit log commits the session and expires obj
+            body = None if not_modified else page.body
             duration = time.time() - start_time
 
             # Track metrics
@@ -129,29 +262,85 @@ class GenericRouter(
                 target_type=self.model_name,
                 target_id=item_id,
             )
-            return GenericResponse(data=obj)
+            if not_modified:
+                return not_modified_response(etag, last_modified)
+            return set_validators(
+                Response(body, media_type="application/json"), etag, last_modified
+            )
 
     def _register_list_route(self):
         @self.get("/", response_model=GenericListResponse[self.read_schema])
         async def list_items(
+            request: Request,
             page: int = Query(1, ge=1),
             page_size: int = Query(10, ge=1, le=100),
             sort_by: str | None = None,
             sort_order: str = "asc",
+            fields: str | None = Query(
+                None, description="Comma-separated list of fields to return"
+            ),
+            after: UUID | None = Query(
+                None, description="Return the items after this id (keyset paging)"
+            ),
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
         ):
             """List all items with basic pagination and sorting."""
             start_time = time.time()
-            skip = (page - 1) * page_size
-            items = await self.service.get_all(
-                db,
-                skip=skip,
-                limit=page_size,
-                sort_by=sort_by,
-                sort_order=sort_order,
-            )
-            total = await self.service.count(db)
+            # A keyset cursor replaces the page offset
+            skip = 0 if after else (page - 1) * page_size
+            field_names = self._parse_fields(fields)
+            query = normalized_query(request)
+
+            async def render(etag: Optional[str] = None) -> CachedPage:
+                total, last_modified = await self.service.version(db)
+                items = await self.service.get_all(
+                    db,
+                    skip=skip,
+                    limit=page_size,
+                    sort_by=sort_by,
+                    sort_order=sort_order,
+                    fields=field_names,
+                    after=after,
+                )
+                rows = items if field_names else self.serializer.dump_many(items)
+                body = dumps(list_payload(rows, total, page, page_size))
+                if etag is None:
+                    etag = list_etag((total, last_modified), query)
+                return CachedPage(body, etag, last_modified, total)
+
+            # Only the ETag validates a page: a hard delete leaves
+            # max(modified_at) unchanged or moves it back, so If-Modified-Since
+            # would still match the stale page
+            if self.cache_lists:
+                # The version counter validates the page without touching the
+                # database; a miss is rendered once however many requests wait
+                table = self.service.model.__tablename__
+                version = table_versions.token(table)
+                etag = list_etag(version, query)
+                cached = list_cache.get(table, version, query)
+                last_modified = cached.last_modified if cached else None
+                not_modified = is_not_modified(request, etag)
+                if cached is None and not not_modified:
+
+                    async def build() -> CachedPage:
+                        page_entry = await render(etag)
+                        list_cache.set(table, version, query, page_entry)
+                        return page_entry
+
+                    cached = await list_flights.do((table, version, query), build)
+            elif self.coalesce_reads:
+                # Concurrent identical requests share one query and rendering;
+                # each still gets its own 304 decision
+                cached = await self.read_flights.do(("list", user.id, query), render)
+                etag, last_modified = cached.etag, cached.last_modified
+                not_modified = is_not_modified(request, etag)
+            else:
+                # The table version validates the page before any row is read
+                total, last_modified = await self.service.version(db)
+                etag = list_etag((total, last_modified), query)
+                not_modified = is_not_modified(request, etag)
+                cached = None if not_modified else await render(etag)
             duration = time.time() - start_time
 
             # Track metrics
@@ -171,23 +360,34 @@ class GenericRouter(
                     "page_size": page_size,
                     "sort_by": sort_by,
                     "sort_order": sort_order,
-                    "total": total,
+                    "fields": field_names,
+                    "after": str(after) if after else None,
+                    "total": cached.total if cached else None,
+                    "not_modified": not_modified,
                 },
             )
-            return GenericListResponse(
-                items=items, total=total, page=page, page_size=page_size
+            if not_modified:
+                return not_modified_response(etag, last_modified)
+            return set_validators(
+                Response(cached.body, media_type="application/json"),
+                etag,
+                cached.last_modified,
             )
 
     def _register_search_route(self):
         @self.post("/search", response_model=GenericListResponse[self.read_schema])
         async def search_items(
             filters: self.filter_schema = Depends(),
+            fields: str | None = Query(
+                None, description="Comma-separated list of fields to return"
+            ),
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
         ):
             """Search items with filtering, pagination, and sorting."""
             start_time = time.time()
-            skip = (filters.page - 1) * filters.page_size
+            skip = 0 if filters.after else (filters.page - 1) * filters.page_size
+            field_names = self._parse_fields(fields)
             items = await self.service.get_all(
                 db,
                 filters=filters,
@@ -195,9 +395,12 @@ class GenericRouter(
                 limit=filters.page_size,
                 sort_by=filters.sort_by,
                 sort_order=filters.sort_order or "asc",
+                fields=field_names,
+                after=filters.after,
             )
             total = await self.service.count(db, filters=filters)
             duration = time.time() - start_time
+            rows = items if field_names else self.serializer.dump_many(items)
 
             # Track metrics
             track_user_action("search", self.model_name)
@@ -212,127 +415,231 @@ class GenericRouter(
                 path=f"/{self.model_name}/search",
                 target_type=self.model_name,
                 details={
-                    "filters": filters.dict(),
+                    "filters": filters.model_dump(mode="json"),
+                    "fields": field_names,
                     "total": total,
                 },
             )
-            return GenericListResponse(
-                items=items, total=total, page=filters.page, page_size=filters.page_size
+            return ORJSONResponse(
+                list_payload(rows, total, filters.page, filters.page_size)
+            )
+
+    def _register_export_route(self):
+        @self.get("/export", response_class=StreamingResponse)
+        async def export_items(
+            export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+            gzip: bool = Query(False, description="Compress the export with gzip"),
+            filters: self.filter_schema = Depends(),
+            db: AsyncSession = Depends(get_session),
+            user: User = Depends(get_current_user),
+        ):
+            """Export all matching items as NDJSON or CSV, streamed in batches."""
+            fields = list(self.read_schema.model_fields)
+            # The export slot is held until the stream ends, not the handler
+            slot = admission.acquire("export") if settings.ADMISSION_ENABLED else None
+
+            def release(dropped: bool = False) -> None:
+                if slot is not None:
+                    slot.release(dropped)
+
+            async def batches():
+                dropped = False
+                try:
+                    # The request session is closed before the body is
+                    # streamed, so the export runs on its own session
+                    async with SessionLocal(engine) as session:
+                        start_time = time.time()
+                        async for rows in self.service.stream(
+                            session,
+                            fields,
+                            sort_by=filters.sort_by,
+                            sort_order=filters.sort_order or "asc",
+                            filters=filters,
+                            yield_per=settings.EXPORT_YIELD_PER,
+                        ):
+                            yield rows
+                        duration = time.time() - start_time
+                        track_database_operation("read", self.model_name, duration)
+                except PoolTimeoutError:
+                    dropped = True
+                    raise
+                finally:
+                    release(dropped)
+
+            try:
+                # Track metrics
+                track_user_action("export", self.model_name)
+
+                # Log action
+                await log_user_action(
+                    session=db,
+                    user_id=user.id,
+                    action="export",
+                    method="GET",
+                    path=f"/{self.model_name}/export",
+                    target_type=self.model_name,
+                    details={
+                        "format": export_format,
+                        "gzip": gzip,
+                        "filters": filters.model_dump(mode="json"),
+                    },
+                )
+            except BaseException:
+                release()
+                raise
+
+            headers = {
+                "Content-Disposition": (
+                    f'attachment; filename="{self.model_name}.{export_format}"'
+                )
+            }
+            if gzip:
+                headers["Content-Encoding"] = "gzip"
+            return StreamingResponse(
+                encode_stream(batches(), export_format, fields, gzip=gzip),
+                media_type=EXPORT_MEDIA_TYPES[export_format],
+                headers=headers,
+                # A body never started (client gone) still frees the slot
+                background=BackgroundTask(release),
             )
 
     def _register_update_route(self):
         @self.put("/{uid}", response_model=GenericResponse[self.read_schema])
         async def update_item(
+            request: Request,
             item_id: UUID,
             obj_in: self.update_schema,
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         ):
-            start_time = time.time()
-            obj = await self.service.update(db, item_id, obj_in)
-            duration = time.time() - start_time
-
-            # Track metrics
-            track_user_action("update", self.model_name)
-            track_database_operation("update", self.model_name, duration)
-
-            # Log action
-            await log_user_action(
-                session=db,
-                user_id=user.id,
-                action="update",
-                method="PUT",
-                path=f"/{self.model_name}/{item_id}",
-                target_type=self.model_name,
-                target_id=item_id,
-                details={"data": obj_in.dict()},
-            )
-            return GenericResponse(data=obj)
+            async def execute() -> Response:
+                start_time = time.time()
+                obj = await self.service.update(db, item_id, obj_in)
+                duration = time.time() - start_time
+                data = self.serializer.dump(obj)
+
+                # Track metrics
+                track_user_action("update", self.model_name)
+                track_database_operation("update", self.model_name, duration)
+
+                # Log action
+                await log_user_action(
+                    session=db,
+                    user_id=user.id,
+                    action="update",
+                    method="PUT",
+                    path=f"/{self.model_name}/{item_id}",
+                    target_type=self.model_name,
+                    target_id=item_id,
+                    details={"data": obj_in.model_dump(mode="json")},
+                )
+                return ORJSONResponse(item_payload(data))
+
+            return await self._write(request, user, idempotency_key, execute)
 
     def _register_patch_route(self):
         @self.patch("/{uid}", response_model=GenericResponse[self.read_schema])
         async def patch_item(
+            request: Request,
             item_id: UUID,
             obj_in: self.update_schema,
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         ):
-            start_time = time.time()
-            obj = await self.service.patch(db, item_id, obj_in)
-            duration = time.time() - start_time
-
-            # Track metrics
-            track_user_action("patch", self.model_name)
-            track_database_operation("update", self.model_name, duration)
-
-            # Log action
-            await log_user_action(
-                session=db,
-                user_id=user.id,
-                action="patch",
-                method="PATCH",
-                path=f"/{self.model_name}/{item_id}",
-                target_type=self.model_name,
-                target_id=item_id,
-                details={"data": obj_in.dict()},
-            )
-            return GenericResponse(data=obj)
+            async def execute() -> Response:
+                start_time = time.time()
+                obj = await self.service.patch(db, item_id, obj_in)
+                duration = time.time() - start_time
+                data = self.serializer.dump(obj)
+
+                # Track metrics
+                track_user_action("patch", self.model_name)
+                track_database_operation("update", self.model_name, duration)
+
+                # Log action
+                await log_user_action(
+                    session=db,
+                    user_id=user.id,
+                    action="patch",
+                    method="PATCH",
+                    path=f"/{self.model_name}/{item_id}",
+                    target_type=self.model_name,
+                    target_id=item_id,
+                    details={"data": obj_in.model_dump(mode="json")},
+                )
+                return ORJSONResponse(item_payload(data))
+
+            return await self._write(request, user, idempotency_key, execute)
 
     def _register_delete_route(self):
         @self.delete("/{uid}", response_model=GenericResponse[self.read_schema])
         async def delete_item(
+            request: Request,
             item_id: UUID,
             hard_delete: bool = Query(False),
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         ):
-            start_time = time.time()
-            obj = await self.service.delete(db, item_id, hard_delete)
-            duration = time.time() - start_time
-
-            # Track metrics
-            track_user_action("delete", self.model_name)
-            track_database_operation("delete", self.model_name, duration)
-
-            # Log action
-            await log_user_action(
-                session=db,
-                user_id=user.id,
-                action="delete",
-                method="DELETE",
-                path=f"/{self.model_name}/{item_id}",
-                target_type=self.model_name,
-                target_id=item_id,
-                details={"hard_delete": hard_delete},
-            )
-            return GenericResponse(data=obj)
+            async def execute() -> Response:
+                start_time = time.time()
+                obj = await self.service.delete(db, item_id, hard_delete)
+                duration = time.time() - start_time
+                data = self.serializer.dump(obj)
+
+                # Track metrics
+                track_user_action("delete", self.model_name)
+                track_database_operation("delete", self.model_name, duration)
+
+                # Log action
+                await log_user_action(
+                    session=db,
+                    user_id=user.id,
+                    action="delete",
+                    method="DELETE",
+                    path=f"/{self.model_name}/{item_id}",
+                    target_type=self.model_name,
+                    target_id=item_id,
+                    details={"hard_delete": hard_delete},
+                )
+                return ORJSONResponse(item_payload(data))
+
+            return await self._write(request, user, idempotency_key, execute)
 
     def _register_restore_route(self):
         @self.put("/{uid}/restore", response_model=GenericResponse[self.read_schema])
         async def restore_item(
+            request: Request,
             item_id: UUID,
             db: AsyncSession = Depends(get_session),
             user: User = Depends(get_current_user),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         ):
-            start_time = time.time()
-            obj = await self.service.restore(db, item_id)
-            duration = time.time() - start_time
-
-            # Track metrics
-            track_user_action("restore", self.model_name)
-            track_database_operation("update", self.model_name, duration)
-
-            # Log action
-            await log_user_action(
-                session=db,
-                user_id=user.id,
-                action="restore",
-                method="PUT",
-                path=f"/{self.model_name}/{item_id}/restore",
-                target_type=self.model_name,
-                target_id=item_id,
-            )
-            return GenericResponse(data=obj)
+            async def execute() -> Response:
+                start_time = time.time()
+                obj = await self.service.restore(db, item_id)
+                duration = time.time() - start_time
+                data = self.serializer.dump(obj)
+
+                # Track metrics
+                track_user_action("restore", self.model_name)
+                track_database_operation("update", self.model_name, duration)
+
+                # Log action
+                await log_user_action(
+                    session=db,
+                    user_id=user.id,
+                    action="restore",
+                    method="PUT",
+                    path=f"/{self.model_name}/{item_id}/restore",
+                    target_type=self.model_name,
+                    target_id=item_id,
+                )
+                return ORJSONResponse(item_payload(data))
+
+            return await self._write(request, user, idempotency_key, execute)
 
     def add_custom_route(
         self, path: str, method: str, response_model: Type, handler: Callable, **kwargs
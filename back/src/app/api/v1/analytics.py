@@ -0,0 +1,170 @@
+import asyncio
+from datetime import date
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.v1 import admission
+from app.auth.security import get_current_user
+from app.config import settings
+from app.db.session import get_session
+from app.metrics import track_user_action
+from app.models.rebalance import RebalanceRequest
+from app.models.user import User
+from app.services.rebalance import rebalance_portfolios
+from app.services.returns import WINDOWS, portfolio_returns
+from app.services.risk import load_risk, portfolio_risk
+from app.services.simulation import portfolio_projection
+from app.utils.rate_limit import rate_limiter
+from app.utils.serialization import ORJSONResponse, item_payload
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"],
+    dependencies=[Depends(admission), Depends(rate_limiter.per_user("analytics"))],
+)
+
+WINDOW_QUERY = Query(None, ge=2, le=2520, description="Daily returns per window")
+BENCHMARK_QUERY = Query(None, max_length=32, description="Benchmark ticker")
+
+
+def series_payload(frame: pd.DataFrame) -> Dict[str, Any]:
+    """A dates x metrics frame as columns: {"dates": [...], metric: [...]}."""
+    payload: Dict[str, Any] = {"dates": frame.index.strftime("%Y-%m-%d").tolist()}
+    for name in frame.columns:
+        # NaN is rendered as null
+        payload[name] = frame[name].tolist()
+    return payload
+
+
+@router.get("/tickers/{ticker}/risk")
+async def get_ticker_risk(
+    ticker: str,
+    window: Optional[int] = WINDOW_QUERY,
+    benchmark: Optional[str] = BENCHMARK_QUERY,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user: User = Depends(get_current_user),
+):
+    """Rolling risk metrics of a ticker against a benchmark."""
+    frame = await asyncio.to_thread(
+        load_risk,
+        ticker.upper(),
+        benchmark.upper() if benchmark else None,
+        window,
+        start,
+        end,
+    )
+    track_user_action("get", "analytics")
+    if frame.empty:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Not enough price history for {ticker.upper()}",
+        )
+    return ORJSONResponse(item_payload(series_payload(frame)))
+
+
+@router.get("/portfolios/{portfolio_id}/risk")
+async def get_portfolio_risk(
+    portfolio_id: UUID,
+    window: Optional[int] = WINDOW_QUERY,
+    benchmark: Optional[str] = BENCHMARK_QUERY,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Rolling risk metrics of a portfolio, from its ledger."""
+    risk = await portfolio_risk(
+        db,
+        [portfolio_id],
+        benchmark.upper() if benchmark else None,
+        window,
+        start,
+        end,
+    )
+    track_user_action("get", "analytics")
+    return ORJSONResponse(item_payload(series_payload(risk[portfolio_id])))
+
+
+@router.get("/portfolios/{portfolio_id}/returns")
+async def get_portfolio_returns(
+    portfolio_id: UUID,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Time- and money-weighted returns of a portfolio over WINDOWS."""
+    returns = await portfolio_returns(db, [portfolio_id], end)
+    track_user_action("get", "analytics")
+    payload = {
+        "windows": list(WINDOWS),
+        "twr": returns.twr.loc[portfolio_id].tolist(),
+        "xirr": returns.xirr.loc[portfolio_id].tolist(),
+    }
+    return ORJSONResponse(item_payload(payload))
+
+
+@router.get("/portfolios/{portfolio_id}/projection")
+async def get_portfolio_projection(
+    portfolio_id: UUID,
+    years: int = Query(30, ge=1, le=settings.SIMULATION_MAX_YEARS),
+    paths: int = Query(10_000, ge=100, le=settings.SIMULATION_MAX_PATHS),
+    contribution: float = Query(0.0, description="Added monthly, < 0 withdraws"),
+    goal: Optional[float] = Query(None, gt=0, description="Target final value"),
+    seed: Optional[int] = Query(None, ge=0, lt=2**63),
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Monte Carlo percentile bands of a portfolio's value, by year."""
+    projection = await portfolio_projection(
+        db, portfolio_id, contribution, years, paths, goal, seed
+    )
+    track_user_action("get", "analytics")
+    percentiles = projection.percentiles
+    payload: Dict[str, Any] = {"years": percentiles.index.tolist()}
+    payload.update({name: percentiles[name].tolist() for name in percentiles})
+    payload.update(
+        goal_probability=projection.goal_probability,
+        depleted_probability=projection.depleted_probability,
+        seed=projection.seed,
+    )
+    return ORJSONResponse(item_payload(payload))
+
+
+@router.post("/rebalance")
+async def rebalance(
+    request: RebalanceRequest,
+    db: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Trades bringing a batch of portfolios to target weights by asset type."""
+    result = await rebalance_portfolios(db, request)
+    track_user_action("rebalance", "analytics")
+    columns = ["ticker", "quantity", "price", "value"]
+    trades = {
+        portfolio: group[columns].to_dict("records")
+        for portfolio, group in result.trades.groupby("portfolio_id", sort=False)
+    }
+    portfolios = [
+        {
+            "portfolio_id": portfolio,
+            "drift": drift,
+            "cash": cash,
+            "trades": trades.get(portfolio, []),
+        }
+        for portfolio, drift, cash in zip(
+            result.cash.index, result.drift.tolist(), result.cash.tolist()
+        )
+    ]
+    payload: Dict[str, Any] = {"portfolios": portfolios}
+    if result.weights is not None:
+        payload["model"] = {
+            "weights": result.weights.to_dict(),
+            "expected_return": result.expected_return,
+            "volatility": result.volatility,
+        }
+    return ORJSONResponse(item_payload(payload))
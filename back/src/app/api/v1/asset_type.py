@@ -23,6 +23,8 @@ router = GenericRouter(
     update_schema=AssetTypeUpdate,
     read_schema=AssetTypeRead,
     filter_schema=AssetTypeFilter,
+    cache_lists=True,
+    coalesce_reads=True,
 )
 
 router.add_custom_route(
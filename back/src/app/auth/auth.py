@@ -8,9 +8,15 @@ from app.models.user import User
 from app.auth.security import verify_password, get_password_hash
 from app.db.session import get_session
 from app.config import settings
+from app.utils.rate_limit import rate_limiter
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/auth", tags=["Auth"])
+# Password checks are slow on purpose: limit them per client IP
+router = APIRouter(
+    prefix="/auth",
+    tags=["Auth"],
+    dependencies=[Depends(rate_limiter.per_client("auth"))],
+)
 
 
 @router.post("/backdoor-register", status_code=201)
@@ -9,9 +9,15 @@ from app.db.session import get_session
 from app.config import settings
 from passlib.context import CryptContext
 from app.metrics import track_token_operation, track_auth_failure
+from app.utils.cache import SingleFlight
+from app.utils.shared_cache import get_shared_cache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/token")
+principal_flights = SingleFlight("principal")
+# User columns kept in the shared cache: what requests read off the principal,
+# never credentials
+PRINCIPAL_FIELDS = ("id", "username", "email", "is_active")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -22,6 +28,11 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def principal_values(user: User) -> dict:
+    """The PRINCIPAL_FIELDS of a user, the form principals are cached in."""
+    return {name: getattr(user, name) for name in PRINCIPAL_FIELDS}
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)
 ) -> User:
@@ -42,13 +53,38 @@ async def get_current_user(
         track_auth_failure("invalid_token")
         raise credentials_exception
 
-    result = await session.exec(select(User).where(User.id == UUID(user_id)))
-    user = result.first()
+    # Principals are looked up on every request: try the host's shared cache
+    cache = get_shared_cache()
+    key = f"{User.__tablename__}:{user_id}"
+    if cache is not None:
+        values = cache.get(key, max_age=settings.SHARED_CACHE_PRINCIPAL_TTL)
+        if values is not None:
+            track_token_operation("validate", "success")
+            return User(**values)
+        version = cache.version(User.__tablename__)
+
+    async def load() -> User | None:
+        result = await session.exec(select(User).where(User.id == UUID(user_id)))
+        user = result.first()
+        if user is not None:
+            # Detach the principal so commits made later in the request (or
+            # in requests sharing this lookup) don't expire it
+            session.expunge(user)
+        return user
+
+    if settings.COALESCE_ENABLED:
+        # A dashboard's burst of requests for one user shares one lookup
+        user = await principal_flights.do(user_id, load)
+    else:
+        user = await load()
     if user is None:
         track_token_operation("validate", "failure")
         track_auth_failure("user_not_found")
         raise credentials_exception
 
+    if cache is not None:
+        cache.set(key, principal_values(user), version)
+
     track_token_operation("validate", "success")
     return user
 
@@ -1,6 +1,6 @@
 # src/app/core/config.py
 import os
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
@@ -54,6 +54,111 @@ class Settings(BaseSettings):
     DB_POOL_RECYCLE: int = 1800
     DB_ECHO: bool = False
 
+    # Cache settings
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 1024  # Rendered list pages kept per process
+    CACHE_FALLBACK_TTL: int = 30  # Max entry age (s) while the bus is down
+
+    # Admission control settings (adaptive concurrency limits per route class)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 20
+    ADMISSION_MIN_LIMIT: int = 2
+    ADMISSION_MAX_LIMIT: int = 200
+    ADMISSION_POOL_PRESSURE: float = 0.9  # Checked-out share that shrinks limits
+    ADMISSION_RETRY_AFTER_MAX: int = 30  # Cap (s) on the Retry-After hint
+
+    # Request coalescing settings
+    COALESCE_ENABLED: bool = True  # Master switch for coalesce_reads routers
+
+    # Shared-memory cache settings (one table per host, shared by workers)
+    SHARED_CACHE_ENABLED: bool = True
+    SHARED_CACHE_PATH: Optional[str] = None  # Defaults to /dev/shm/pwb-<uid>/cache-*
+    SHARED_CACHE_SLOTS: int = 8192
+    SHARED_CACHE_SLOT_SIZE: int = 1024  # Bytes per entry, key included
+    SHARED_CACHE_PRINCIPAL_TTL: int = 60  # Max age (s) of cached users
+
+    # Cache invalidation bus settings
+    CACHE_BUS_ENABLED: bool = True
+    CACHE_BUS_CHANNEL: str = "cache_invalidation"  # PostgreSQL NOTIFY channel
+    CACHE_BUS_POLL_INTERVAL: float = 1.0  # Seconds between polls (non-Postgres)
+    CACHE_BUS_RETENTION: int = 300  # Seconds polled events are kept
+
+    # Rate limit settings (quotas are "<requests>/<second|minute|hour|day>")
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["local", "shared"] = "local"  # shared: per host
+    RATE_LIMIT_MAX_KEYS: int = 10000  # Buckets kept per backend
+    RATE_LIMIT_DEFAULT: str = "600/minute"
+    # By route class, or "<router>.<route class>" to override one router
+    RATE_LIMIT_QUOTAS: Dict[str, str] = {
+        "read": "600/minute",
+        "write": "120/minute",
+        "export": "10/minute",
+        "auth": "10/minute",
+        "analytics.read": "60/minute",
+        "analytics.write": "10/minute",
+    }
+
+    # Idempotency settings
+    IDEMPOTENCY_TTL: int = 86400  # Seconds a stored response can be replayed
+    IDEMPOTENCY_LOCK_TTL: int = 120  # Seconds an in-flight request holds its key
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 30.0  # Max wait on an in-flight duplicate
+    IDEMPOTENCY_POLL_INTERVAL: float = 0.05  # Seconds between checks on another worker
+    IDEMPOTENCY_MAX_KEY_LENGTH: int = 255
+
+    # Scheduler settings (one process per host runs the jobs)
+    SCHEDULER_ENABLED: bool = True  # False on every host but one when scaled out
+    SCHEDULER_LOCK_PATH: Optional[str] = None  # Defaults to $TMPDIR/pwb-scheduler-*
+    SCHEDULER_ELECTION_INTERVAL: int = 30  # Seconds between standby takeover tries
+
+    # Market data settings
+    MARKET_DATA_ENABLED: bool = True  # Run the refresh job in this process
+    MARKET_DATA_PROVIDER: Literal["yfinance", "fake"] = "yfinance"
+    MARKET_DATA_REFRESH_INTERVAL: int = 30  # Seconds between refreshes
+    MARKET_DATA_TICKERS: List[str] = []  # Tracked in addition to market_quote rows
+    MARKET_DATA_BATCH_SIZE: int = 50  # Symbols per provider request
+    MARKET_DATA_CONCURRENCY: int = 4  # Provider requests in flight
+    MARKET_DATA_TIMEOUT: float = 20.0  # Seconds before a batch counts as failed
+
+    # Price history settings
+    PRICE_STORE_PATH: str = "data/prices"
+    PRICE_STORE_HISTORY_YEARS: int = 10  # Backfilled for tickers without history
+    PRICE_STORE_SYNC_INTERVAL: int = 3600  # Seconds between history syncs
+    PRICE_STORE_TAIL_ROWS: int = 300  # Recent bars per ticker kept in memory
+    PRICE_STORE_TAIL_TICKERS: int = 1000  # Tickers whose recent bars are kept
+    PRICE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # Memory for cached series
+
+    # Valuation settings
+    VALUATION_CHUNK_CELLS: int = 16_000_000  # Holdings cells (8 bytes) per chunk
+
+    # Risk analytics settings
+    RISK_STORE_PATH: str = "data/risk"
+    RISK_BENCHMARK: str = "SPY"  # Ticker for beta and tracking error
+    RISK_WINDOW: int = 252  # Daily returns per rolling window
+    RISK_CONFIDENCE: float = 0.95  # VaR and CVaR confidence level
+    RISK_BATCH_TICKERS: int = 250  # Tickers read and computed together
+    RISK_CHUNK_CELLS: int = 16_000_000  # Working cells (8 bytes) per chunk of tickers
+
+    # Simulation settings
+    SIMULATION_HISTORY_YEARS: int = 10  # Price history return models are fitted on
+    SIMULATION_MAX_PATHS: int = 100_000
+    SIMULATION_MAX_YEARS: int = 50
+    SIMULATION_CHUNK_PATHS: int = 10_000  # Paths simulated and reduced together
+    SIMULATION_WORKERS: int = 4  # Processes running chunks; 0 runs them in threads
+    SIMULATION_SKETCH_POINTS: int = 1001  # Quantiles kept per year of a sketch
+
+    # Rebalancing settings
+    REBALANCE_LOT_SIZE: float = 1.0  # Quantity step of tickers without a lot size
+    REBALANCE_MIN_TRADE: float = 50.0  # Smallest trade value suggested
+    REBALANCE_BATCH_PORTFOLIOS: int = 1_000  # Portfolios rebalanced together
+
+    # Ledger settings
+    LEDGER_SNAPSHOT_EVENTS: int = 500  # Ledger entries between position snapshots
+    POSITIONS_CHECK_INTERVAL: int = 6 * 3600  # Seconds between checks; 0 disables
+    POSITIONS_CHECK_REPAIR: bool = False  # Overwrite drifted current positions
+
+    # Export settings
+    EXPORT_YIELD_PER: int = 1000  # Rows fetched per server-side cursor batch
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
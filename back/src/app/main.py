@@ -4,10 +4,19 @@ from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import SQLModel
 
-from app.api.v1 import asset_type
+from app.api.v1 import analytics, asset_type
 from app.auth import auth, security
 from app.config import settings
 from app.db.session import engine, get_session_raw
+from app.models.indexes import create_indexes
+from app.services.fulltext import install_fulltext
+from app.utils.cache import evict, set_fallback_ttl
+from app.utils.idempotency import purge_expired
+from app.utils.invalidation import create_invalidation_bus
+from app.services.simulation import close_simulation_pool
+from app.utils.scheduler import start_scheduler, stop_scheduler
+from app.utils.shared_cache import close_shared_cache, open_shared_cache
+from app.utils.rate_limit import RateLimitHeadersMiddleware, rate_limiter
 from app.utils.tracing import configure_tracer, CorrelationIdMiddleware
 from app.db.seed import seed_initial_data
 from app.utils.logging import setup_logging
@@ -15,6 +24,11 @@ from app.metrics import configure_metrics
 
 from app.models.user import User
 from app.models.asset_type import AssetType
+from app.models.cache_event import CacheEvent
+from app.models.idempotency import IdempotencyRecord
+from app.models.market_quote import MarketQuote
+from app.models.position_snapshot import PositionSnapshot
+from app.models.current_position import CurrentPosition
 
 
 @asynccontextmanager
@@ -25,6 +39,8 @@ async def lifespan(app: FastAPI):
     # Create database tables
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(create_indexes)
+        await conn.run_sync(install_fulltext)
 
     # Seed initial data
     session = await get_session_raw()
@@ -33,8 +49,31 @@ async def lifespan(app: FastAPI):
     finally:
         await session.close()
 
+    # Drop idempotency keys that can no longer be replayed
+    await purge_expired(engine)
+
+    # Map the cache shared by the workers of this host
+    open_shared_cache()
+
+    # Relay cache invalidations between workers
+    bus = None
+    if settings.CACHE_BUS_ENABLED:
+        bus = create_invalidation_bus(engine)
+        bus.subscribe(evict, on_state=set_fallback_ttl)
+        await bus.start()
+
+    # Keep market data fresh and check current positions
+    start_scheduler()
+
     yield
 
+    stop_scheduler()
+    if bus is not None:
+        await bus.stop()
+    rate_limiter.close()
+    close_shared_cache()
+    close_simulation_pool()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -58,6 +97,9 @@ configure_tracer(app)
 # Add correlation ID middleware
 app.add_middleware(CorrelationIdMiddleware)
 
+# Report rate limit budgets on every limited route
+app.add_middleware(RateLimitHeadersMiddleware)
+
 # Configure CORS
 origins = settings.SEC_CORS_ORIGINS
 app.add_middleware(
@@ -71,6 +113,7 @@ app.add_middleware(
 # Include routers directly (not versioned APIRouter wrapper)
 app.include_router(auth.router, prefix=settings.API_PREFIX)
 app.include_router(asset_type.router, prefix=settings.API_PREFIX)
+app.include_router(analytics.router, prefix=settings.API_PREFIX)
 
 
 @app.get("/health", tags=["Health"])
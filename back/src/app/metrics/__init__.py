@@ -3,7 +3,13 @@ Metrics package for the application.
 
 This package provides Prometheus metrics for monitoring various aspects of the application:
 - Authentication and authorization
+- Admission control and load shedding
+- Rate limiting
 - Business operations
+- Response caches
+- Idempotent write requests
+- Market data refreshes
+- Materialized positions consistency
 - Database operations
 - HTTP requests
 - System metrics
@@ -30,6 +36,21 @@ from app.metrics.auth import (
     track_token_refresh,
 )
 
+from app.metrics.admission import (
+    admission_requests_total,
+    admission_limit,
+    admission_inflight,
+    track_admission,
+    track_admission_state,
+)
+
+from app.metrics.rate_limit import (
+    rate_limit_requests_total,
+    rate_limit_keys,
+    track_rate_limit,
+    track_rate_limit_keys,
+)
+
 from app.metrics.business import (
     active_users,
     user_actions_total,
@@ -37,6 +58,59 @@ from app.metrics.business import (
     update_active_users,
 )
 
+from app.metrics.cache import (
+    cache_requests_total,
+    cache_entries,
+    cache_size_bytes,
+    cache_stores_total,
+    cache_evicted_bytes_total,
+    single_flight_waits_total,
+    single_flight_calls_total,
+    single_flight_coalesce_ratio,
+    table_version_bumps_total,
+    invalidations_published_total,
+    invalidations_received_total,
+    invalidation_delay_seconds,
+    invalidations_missed_total,
+    invalidation_bus_connected,
+    track_cache_request,
+    track_cache_entries,
+    track_cache_size,
+    track_cache_store,
+    track_cache_eviction,
+    track_single_flight_wait,
+    track_single_flight_call,
+    track_version_bump,
+    track_invalidation_published,
+    track_invalidation_received,
+    track_invalidation_missed,
+    track_bus_connected,
+)
+
+from app.metrics.idempotency import (
+    idempotent_requests_total,
+    idempotency_wait_seconds,
+    track_idempotent_request,
+    track_idempotency_wait,
+)
+
+from app.metrics.market_data import (
+    market_data_fetch_seconds,
+    market_data_symbol_failures_total,
+    price_store_rows_appended_total,
+    price_store_read_seconds,
+    track_market_data_fetch,
+    track_symbol_failures,
+    track_price_store_append,
+    track_price_store_read,
+)
+
+from app.metrics.positions import (
+    positions_drift,
+    positions_check_seconds,
+    track_positions_check,
+)
+
 from app.metrics.database import (
     database_operations_total,
     database_operation_duration_seconds,
@@ -69,11 +143,67 @@ __all__ = [
     "track_auth_failure",
     "track_token_operation",
     "track_token_refresh",
+    # Admission metrics
+    "admission_requests_total",
+    "admission_limit",
+    "admission_inflight",
+    "track_admission",
+    "track_admission_state",
+    # Rate limit metrics
+    "rate_limit_requests_total",
+    "rate_limit_keys",
+    "track_rate_limit",
+    "track_rate_limit_keys",
     # Business metrics
     "active_users",
     "user_actions_total",
     "track_user_action",
     "update_active_users",
+    # Cache metrics
+    "cache_requests_total",
+    "cache_entries",
+    "cache_size_bytes",
+    "cache_stores_total",
+    "cache_evicted_bytes_total",
+    "single_flight_waits_total",
+    "single_flight_calls_total",
+    "single_flight_coalesce_ratio",
+    "table_version_bumps_total",
+    "invalidations_published_total",
+    "invalidations_received_total",
+    "invalidation_delay_seconds",
+    "invalidations_missed_total",
+    "invalidation_bus_connected",
+    "track_cache_request",
+    "track_cache_entries",
+    "track_cache_size",
+    "track_cache_store",
+    "track_cache_eviction",
+    "track_single_flight_wait",
+    "track_single_flight_call",
+    "track_version_bump",
+    "track_invalidation_published",
+    "track_invalidation_received",
+    "track_invalidation_missed",
+    "track_bus_connected",
+    # Idempotency metrics
+    "idempotent_requests_total",
+    "idempotency_wait_seconds",
+    "track_idempotent_request",
+    "track_idempotency_wait",
+    # Market data metrics
+    "market_data_fetch_seconds",
+    "market_data_symbol_failures_total",
+    "price_store_rows_appended_total",
+    "price_store_read_seconds",
+    "track_market_data_fetch",
+    "track_symbol_failures",
+    "track_price_store_append",
+    "track_price_store_read",
+    # Positions metrics
+    "positions_drift",
+    "positions_check_seconds",
+    "track_positions_check",
     # Database metrics
     "database_operations_total",
     "database_operation_duration_seconds",
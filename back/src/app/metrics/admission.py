@@ -0,0 +1,52 @@
+"""
+Admission control metrics module.
+
+This module provides metrics for tracking admission control:
+- Requests admitted or shed (rejected with 503), per route class
+- Current adaptive concurrency limit and in-flight requests per route class
+"""
+
+from prometheus_client import Counter, Gauge
+from app.config import settings
+from app.metrics.config import get_metric_name
+
+# Common labels for all metrics
+COMMON_LABELS = {
+    "environment": settings.ENV,
+    "api_version": settings.API_VERSION,
+    "component": "api",
+    "version": settings.VERSION,
+}
+
+# Admission metrics
+admission_requests_total = Counter(
+    get_metric_name("admission_requests_total"),
+    "Total number of requests seen by admission control, by outcome",
+    ["route_class", "result"] + list(COMMON_LABELS.keys()),
+)
+
+admission_limit = Gauge(
+    get_metric_name("admission_limit"),
+    "Current adaptive concurrency limit",
+    ["route_class"] + list(COMMON_LABELS.keys()),
+)
+
+admission_inflight = Gauge(
+    get_metric_name("admission_inflight"),
+    "Requests currently admitted and running",
+    ["route_class"] + list(COMMON_LABELS.keys()),
+)
+
+
+def track_admission(route_class: str, admitted: bool):
+    """Track a request admitted or shed."""
+    result = "admitted" if admitted else "shed"
+    labels = {"route_class": route_class, "result": result, **COMMON_LABELS}
+    admission_requests_total.labels(**labels).inc()
+
+
+def track_admission_state(route_class: str, limit: float, inflight: int):
+    """Update the limit and in-flight gauges of a route class."""
+    labels = {"route_class": route_class, **COMMON_LABELS}
+    admission_limit.labels(**labels).set(limit)
+    admission_inflight.labels(**labels).set(inflight)
@@ -0,0 +1,184 @@
+"""
+Cache metrics module.
+
+This module provides metrics for tracking the in-process response caches:
+- Cache lookups by result (hit or miss)
+- Cache size in entries and, for the shared-memory and price caches, in bytes
+- Shared-memory cache stores by outcome (stored, evicted, stale, too large)
+- Bytes evicted from memory-bounded caches
+- Requests that waited on an in-flight build (single-flight)
+- Single-flight calls by role and the resulting coalesce ratio (the share
+  of calls answered by another call's computation)
+- Table version bumps (cache invalidations)
+- Cross-worker invalidation bus traffic, propagation delay and losses
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+from app.config import settings
+from app.metrics.config import get_metric_name
+
+# Common labels for all metrics
+COMMON_LABELS = {
+    "environment": settings.ENV,
+    "api_version": settings.API_VERSION,
+    "component": "api",
+    "version": settings.VERSION,
+}
+
+# Cache metrics
+cache_requests_total = Counter(
+    get_metric_name("cache_requests_total"),
+    "Total number of cache lookups",
+    ["cache", "table", "result"] + list(COMMON_LABELS.keys()),
+)
+
+cache_entries = Gauge(
+    get_metric_name("cache_entries"),
+    "Number of entries in the cache",
+    ["cache"] + list(COMMON_LABELS.keys()),
+)
+
+cache_size_bytes = Gauge(
+    get_metric_name("cache_size_bytes"),
+    "Memory mapped or held by the cache",
+    ["cache"] + list(COMMON_LABELS.keys()),
+)
+
+cache_stores_total = Counter(
+    get_metric_name("cache_stores_total"),
+    "Total number of cache stores by outcome",
+    ["cache", "table", "result"] + list(COMMON_LABELS.keys()),
+)
+
+cache_evicted_bytes_total = Counter(
+    get_metric_name("cache_evicted_bytes_total"),
+    "Total number of bytes evicted to keep the cache within its budget",
+    ["cache"] + list(COMMON_LABELS.keys()),
+)
+
+single_flight_waits_total = Counter(
+    get_metric_name("single_flight_waits_total"),
+    "Total number of requests that waited on an in-flight computation",
+    ["cache"] + list(COMMON_LABELS.keys()),
+)
+
+single_flight_calls_total = Counter(
+    get_metric_name("single_flight_calls_total"),
+    "Total number of single-flight calls, by whether they ran or shared a call",
+    ["cache", "result"] + list(COMMON_LABELS.keys()),
+)
+
+single_flight_coalesce_ratio = Gauge(
+    get_metric_name("single_flight_coalesce_ratio"),
+    "Share of single-flight calls answered by another call's computation",
+    ["cache"] + list(COMMON_LABELS.keys()),
+)
+
+table_version_bumps_total = Counter(
+    get_metric_name("table_version_bumps_total"),
+    "Total number of table version bumps caused by writes",
+    ["table"] + list(COMMON_LABELS.keys()),
+)
+
+invalidations_published_total = Counter(
+    get_metric_name("cache_invalidations_published_total"),
+    "Total number of invalidation events published to other workers",
+    ["table", "backend"] + list(COMMON_LABELS.keys()),
+)
+
+invalidations_received_total = Counter(
+    get_metric_name("cache_invalidations_received_total"),
+    "Total number of invalidation events received from other workers",
+    ["table", "backend"] + list(COMMON_LABELS.keys()),
+)
+
+invalidation_delay_seconds = Histogram(
+    get_metric_name("cache_invalidation_delay_seconds"),
+    "Delay between publishing an invalidation event and receiving it",
+    ["backend"] + list(COMMON_LABELS.keys()),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+invalidations_missed_total = Counter(
+    get_metric_name("cache_invalidations_missed_total"),
+    "Total number of invalidation events lost (gaps, disconnects, send errors)",
+    ["backend", "reason"] + list(COMMON_LABELS.keys()),
+)
+
+invalidation_bus_connected = Gauge(
+    get_metric_name("cache_invalidation_bus_connected"),
+    "Whether the invalidation bus is connected (1) or on TTL fallback (0)",
+    ["backend"] + list(COMMON_LABELS.keys()),
+)
+
+
+def track_cache_request(cache: str, table: str, result: str):
+    """Track a cache lookup."""
+    labels = {"cache": cache, "table": table, "result": result, **COMMON_LABELS}
+    cache_requests_total.labels(**labels).inc()
+
+
+def track_cache_entries(cache: str, count: int):
+    """Update the number of entries in a cache."""
+    cache_entries.labels(cache=cache, **COMMON_LABELS).set(count)
+
+
+def track_cache_size(cache: str, size: int):
+    """Update the memory mapped or held by a cache."""
+    cache_size_bytes.labels(cache=cache, **COMMON_LABELS).set(size)
+
+
+def track_cache_eviction(cache: str, size: int):
+    """Track bytes evicted from a memory-bounded cache."""
+    cache_evicted_bytes_total.labels(cache=cache, **COMMON_LABELS).inc(size)
+
+
+def track_cache_store(cache: str, table: str, result: str):
+    """Track a cache store."""
+    labels = {"cache": cache, "table": table, "result": result, **COMMON_LABELS}
+    cache_stores_total.labels(**labels).inc()
+
+
+def track_single_flight_wait(cache: str):
+    """Track a request served by an in-flight computation."""
+    single_flight_waits_total.labels(cache=cache, **COMMON_LABELS).inc()
+
+
+def track_single_flight_call(cache: str, shared: bool, ratio: float):
+    """Track a single-flight call and update the cache's coalesce ratio."""
+    result = "shared" if shared else "executed"
+    single_flight_calls_total.labels(cache=cache, result=result, **COMMON_LABELS).inc()
+    single_flight_coalesce_ratio.labels(cache=cache, **COMMON_LABELS).set(ratio)
+
+
+def track_version_bump(table: str):
+    """Track a table version bump."""
+    table_version_bumps_total.labels(table=table, **COMMON_LABELS).inc()
+
+
+def track_invalidation_published(table: str, backend: str):
+    """Track an invalidation event sent to other workers."""
+    labels = {"table": table, "backend": backend, **COMMON_LABELS}
+    invalidations_published_total.labels(**labels).inc()
+
+
+def track_invalidation_received(table: str, backend: str, delay: float):
+    """Track an invalidation event received from another worker."""
+    labels = {"table": table, "backend": backend, **COMMON_LABELS}
+    invalidations_received_total.labels(**labels).inc()
+    invalidation_delay_seconds.labels(backend=backend, **COMMON_LABELS).observe(
+        max(delay, 0.0)
+    )
+
+
+def track_invalidation_missed(backend: str, reason: str, count: int = 1):
+    """Track invalidation events that were lost."""
+    labels = {"backend": backend, "reason": reason, **COMMON_LABELS}
+    invalidations_missed_total.labels(**labels).inc(count)
+
+
+def track_bus_connected(backend: str, connected: bool):
+    """Update the invalidation bus connection state."""
+    invalidation_bus_connected.labels(backend=backend, **COMMON_LABELS).set(
+        1 if connected else 0
+    )
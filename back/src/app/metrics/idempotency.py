@@ -0,0 +1,47 @@
+"""
+Idempotency metrics module.
+
+This module provides metrics for tracking Idempotency-Key handling:
+- Write requests by outcome (executed, replayed, waited on an in-flight
+  duplicate, rejected)
+- Time duplicates spent waiting for the first execution
+"""
+
+from prometheus_client import Counter, Histogram
+from app.config import settings
+from app.metrics.config import get_metric_name
+
+# Common labels for all metrics
+COMMON_LABELS = {
+    "environment": settings.ENV,
+    "api_version": settings.API_VERSION,
+    "component": "api",
+    "version": settings.VERSION,
+}
+
+# Idempotency metrics
+idempotent_requests_total = Counter(
+    get_metric_name("idempotent_requests_total"),
+    "Total number of write requests carrying an Idempotency-Key, by outcome",
+    ["target_type", "result"] + list(COMMON_LABELS.keys()),
+)
+
+idempotency_wait_seconds = Histogram(
+    get_metric_name("idempotency_wait_seconds"),
+    "Time a duplicate request waited for the first execution to finish",
+    ["target_type"] + list(COMMON_LABELS.keys()),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def track_idempotent_request(target_type: str, result: str):
+    """Track a write request carrying an Idempotency-Key."""
+    labels = {"target_type": target_type, "result": result, **COMMON_LABELS}
+    idempotent_requests_total.labels(**labels).inc()
+
+
+def track_idempotency_wait(target_type: str, duration: float):
+    """Track the time a duplicate waited on an in-flight execution."""
+    idempotency_wait_seconds.labels(target_type=target_type, **COMMON_LABELS).observe(
+        duration
+    )
@@ -0,0 +1,75 @@
+"""
+Market data metrics module.
+
+This module provides metrics for tracking market data refreshes:
+- Provider fetch latency and outcome, per batch
+- Symbols a refresh could not price, per symbol
+- Price history rows appended and read latency of the price store
+"""
+
+from typing import Iterable
+
+from prometheus_client import Counter, Histogram
+from app.config import settings
+from app.metrics.config import get_metric_name
+
+# Common labels for all metrics
+COMMON_LABELS = {
+    "environment": settings.ENV,
+    "api_version": settings.API_VERSION,
+    "component": "api",
+    "version": settings.VERSION,
+}
+
+# Market data metrics
+market_data_fetch_seconds = Histogram(
+    get_metric_name("market_data_fetch_seconds"),
+    "Time taken by a provider to price one batch of symbols",
+    ["provider", "result"] + list(COMMON_LABELS.keys()),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0),
+)
+
+market_data_symbol_failures_total = Counter(
+    get_metric_name("market_data_symbol_failures_total"),
+    "Total number of refreshes that could not price a symbol",
+    ["provider", "ticker"] + list(COMMON_LABELS.keys()),
+)
+
+price_store_rows_appended_total = Counter(
+    get_metric_name("price_store_rows_appended_total"),
+    "Total number of daily bars written to the price store",
+    list(COMMON_LABELS.keys()),
+)
+
+price_store_read_seconds = Histogram(
+    get_metric_name("price_store_read_seconds"),
+    "Time taken by price store reads, by kind (range, tail, many)",
+    ["kind"] + list(COMMON_LABELS.keys()),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+
+def track_market_data_fetch(provider: str, duration: float, success: bool):
+    """Track the latency of a batch fetch."""
+    result = "success" if success else "failure"
+    market_data_fetch_seconds.labels(
+        provider=provider, result=result, **COMMON_LABELS
+    ).observe(duration)
+
+
+def track_symbol_failures(provider: str, tickers: Iterable[str]):
+    """Track symbols a refresh could not price."""
+    for ticker in tickers:
+        market_data_symbol_failures_total.labels(
+            provider=provider, ticker=ticker, **COMMON_LABELS
+        ).inc()
+
+
+def track_price_store_append(rows: int):
+    """Track bars written to the price store."""
+    price_store_rows_appended_total.labels(**COMMON_LABELS).inc(rows)
+
+
+def track_price_store_read(kind: str, duration: float):
+    """Track the latency of a price store read."""
+    price_store_read_seconds.labels(kind=kind, **COMMON_LABELS).observe(duration)
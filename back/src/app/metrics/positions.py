@@ -0,0 +1,39 @@
+"""
+Positions metrics module.
+
+This module provides metrics for tracking the materialized positions:
+- Positions found out of line with the ledger by the consistency check
+- Duration of the consistency check
+"""
+
+from prometheus_client import Gauge, Histogram
+from app.config import settings
+from app.metrics.config import get_metric_name
+
+# Common labels for all metrics
+COMMON_LABELS = {
+    "environment": settings.ENV,
+    "api_version": settings.API_VERSION,
+    "component": "api",
+    "version": settings.VERSION,
+}
+
+# Positions metrics
+positions_drift = Gauge(
+    get_metric_name("positions_drift"),
+    "Current positions that differ from a rebuild from the ledger, last check",
+    list(COMMON_LABELS.keys()),
+)
+
+positions_check_seconds = Histogram(
+    get_metric_name("positions_check_seconds"),
+    "Time taken to rebuild positions from the ledger and compare them",
+    list(COMMON_LABELS.keys()),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+
+def track_positions_check(drifted: int, duration: float):
+    """Track the outcome of a consistency check."""
+    positions_drift.labels(**COMMON_LABELS).set(drifted)
+    positions_check_seconds.labels(**COMMON_LABELS).observe(duration)
@@ -0,0 +1,44 @@
+"""
+Rate limit metrics module.
+
+This module provides metrics for tracking rate limiting:
+- Requests allowed or limited (rejected with 429), per route class
+- Token buckets currently tracked, per backend
+"""
+
+from prometheus_client import Counter, Gauge
+from app.config import settings
+from app.metrics.config import get_metric_name
+
+# Common labels for all metrics
+COMMON_LABELS = {
+    "environment": settings.ENV,
+    "api_version": settings.API_VERSION,
+    "component": "api",
+    "version": settings.VERSION,
+}
+
+# Rate limit metrics
+rate_limit_requests_total = Counter(
+    get_metric_name("rate_limit_requests_total"),
+    "Total number of requests checked against a rate limit, by outcome",
+    ["route_class", "result"] + list(COMMON_LABELS.keys()),
+)
+
+rate_limit_keys = Gauge(
+    get_metric_name("rate_limit_keys"),
+    "Token buckets currently tracked",
+    ["backend"] + list(COMMON_LABELS.keys()),
+)
+
+
+def track_rate_limit(route_class: str, allowed: bool):
+    """Track a request allowed or limited."""
+    result = "allowed" if allowed else "limited"
+    labels = {"route_class": route_class, "result": result, **COMMON_LABELS}
+    rate_limit_requests_total.labels(**labels).inc()
+
+
+def track_rate_limit_keys(backend: str, keys: int):
+    """Update the number of buckets a backend tracks."""
+    rate_limit_keys.labels(backend=backend, **COMMON_LABELS).set(keys)
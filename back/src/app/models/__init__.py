@@ -1,9 +1,13 @@
 from datetime import datetime, timezone
-from typing import ClassVar, Generic, List, Optional, TypeVar
-from uuid import UUID, uuid4
+from typing import ClassVar, Generic, List, Optional, Tuple, TypeVar
+from uuid import UUID
 
+from sqlalchemy.orm import declared_attr
 from sqlmodel import Field, SQLModel
 
+from app.models.indexes import model_indexes
+from app.utils.ids import uuid7
+
 # Type variable for the model
 T = TypeVar("T")
 
@@ -14,9 +18,14 @@ def utc_now() -> datetime:
 
 
 class IdMixin(SQLModel):
-    """Mixin for models with UUID primary key."""
+    """
+    Mixin for models with UUID primary key.
+
+    Ids are UUIDv7, so new rows append to the end of the primary key index
+    and ordering by id follows creation order.
+    """
 
-    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    id: UUID = Field(default_factory=uuid7, primary_key=True)
 
 
 class TimestampMixin(SQLModel):
@@ -30,8 +39,24 @@ class GenericModel(IdMixin, TimestampMixin, SQLModel):
     """Base SQLModel with common fields for all models."""
 
     __tablename__: ClassVar[Optional[str]] = None
+    # Text columns served by a full-text index (see app.services.fulltext)
+    __fulltext__: ClassVar[Tuple[str, ...]] = ()
+    # Columns looked up on active rows, and columns unique among active rows
+    __lookup_fields__: ClassVar[Tuple[str, ...]] = ()
+    __unique_fields__: ClassVar[Tuple[str, ...]] = ()
+    # Columns filtered by prefix (see app.services.filters)
+    __prefix_fields__: ClassVar[Tuple[str, ...]] = ()
     is_active: bool = Field(default=True)
 
+    @declared_attr
+    def __table_args__(cls):
+        return model_indexes(
+            cls.__tablename__,
+            cls.__lookup_fields__,
+            cls.__unique_fields__,
+            cls.__prefix_fields__,
+        )
+
 
 # Generic schemas for CRUD operations
 class GenericCreate(SQLModel):
@@ -74,9 +99,22 @@ class GenericListResponse(SQLModel, Generic[T]):
 
 
 class GenericFilter(SQLModel):
-    """Generic schema for filtering resources."""
+    """
+    Generic schema for filtering resources.
+
+    Filter fields are named after a model column, optionally followed by an
+    operator: "name" (equality), "name__prefix", "name__in", "created_at__gte",
+    and so on. See app.services.filters for the supported operators. q runs a
+    ranked full-text search on models that declare __fulltext__.
+    """
 
+    q: Optional[str] = None  # Full-text search over the model's text fields
+    after: Optional[UUID] = None  # Keyset pagination: items after this id
     is_active: Optional[bool] = None
+    created_at__gte: Optional[datetime] = None
+    created_at__lt: Optional[datetime] = None
+    modified_at__gte: Optional[datetime] = None
+    modified_at__lt: Optional[datetime] = None
     page: int = 1
     page_size: int = 100
     sort_by: Optional[str] = None
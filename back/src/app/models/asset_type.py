@@ -17,6 +17,9 @@ class AssetType(GenericModel, table=True):
     """
 
     __tablename__ = "asset_type"
+    __fulltext__ = ("name", "description")
+    __unique_fields__ = ("name",)
+    __prefix_fields__ = ("name",)
 
     name: str
     description: str | None = None
@@ -74,6 +77,8 @@ class AssetTypeFilter(GenericFilter):
     """
 
     name: str | None = None
-    description: str | None = None
+    name__prefix: str | None = None
+    name__in: str | None = None
+    description__contains: str | None = None
     page: int = 1
     limit: int = 10
@@ -16,7 +16,9 @@ class AuditLog(SQLModel, table=True):
     target_type: str = Field(
         description="Type of the target object (e.g., 'user', 'portfolio')"
     )
-    target_id: UUID = Field(description="ID of the target object")
+    target_id: Optional[UUID] = Field(
+        default=None, description="ID of the target object, if any"
+    )
     details: Optional[dict] = Field(
         default=None, sa_type=JSON, description="Additional details about the action"
     )
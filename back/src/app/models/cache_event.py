@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from sqlalchemy import JSON
+from sqlmodel import Field, SQLModel
+
+
+class CacheEvent(SQLModel, table=True):
+    """Model for cache invalidation events relayed between workers by polling."""
+
+    __tablename__ = "cache_event"
+    # Ids are never reused once pruned, so pollers can resume from the last one
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    origin: str = Field(description="Worker that published the event")
+    table_name: str = Field(description="Table whose cached data changed")
+    keys: List[str] = Field(
+        default_factory=list, sa_type=JSON, description="Ids of the changed rows"
+    )
+    sent_at: float = Field(description="Unix time the event was published")
@@ -0,0 +1,23 @@
+from datetime import datetime, UTC
+from uuid import UUID
+
+from sqlmodel import Field, SQLModel
+
+
+class CurrentPosition(SQLModel, table=True):
+    """Model for the current holding of a ticker in a portfolio."""
+
+    # Keyed on (portfolio_id, ticker): a portfolio's holdings are one index range
+    __tablename__ = "current_positions"
+
+    portfolio_id: UUID = Field(primary_key=True)
+    ticker: str = Field(primary_key=True, max_length=32)
+    quantity: float = Field(default=0.0, description="Quantity held; 0 once closed")
+    cost_basis: float = Field(
+        default=0.0, description="Cost of the quantity held, at average cost"
+    )
+    last_event_id: int = Field(description="Last ledger entry applied")
+    modified_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        description="When the position last changed",
+    )
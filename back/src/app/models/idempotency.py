@@ -0,0 +1,21 @@
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import LargeBinary
+from sqlmodel import Field, SQLModel
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    """Model for the first response to a write carrying an Idempotency-Key."""
+
+    __tablename__ = "idempotency_record"
+
+    user_id: UUID = Field(primary_key=True, description="User who sent the key")
+    key: str = Field(primary_key=True, description="Idempotency-Key header value")
+    fingerprint: str = Field(description="Hash of the method, path and body")
+    status_code: Optional[int] = Field(
+        default=None, description="Response status; None while in flight"
+    )
+    media_type: Optional[str] = Field(default=None)
+    body: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
+    expires_at: float = Field(index=True, description="Unix time the key expires")
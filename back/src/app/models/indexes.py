@@ -0,0 +1,91 @@
+"""
+Index declarations module.
+
+This module provides the indexes shared by every GenericModel table:
+- Composite (is_active, <sort key>) indexes serving the default list queries
+- Lookup indexes on active rows for each model's __lookup_fields__
+- Unique indexes on active rows for each model's __unique_fields__
+- text_pattern_ops indexes on PostgreSQL for each model's __prefix_fields__,
+  so prefix filters (LIKE 'p%') are indexed whatever the collation
+- A startup helper creating declared indexes missing from existing tables
+"""
+
+import logging
+from typing import Sequence, Tuple
+
+from sqlalchemy import Index, column, true
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel
+
+logger = logging.getLogger(__name__)
+
+# Sort keys every list query can use without a table scan
+ACTIVE_SORT_KEYS = ("id", "modified_at")
+
+
+def active_condition():
+    """
+    The predicate selecting active rows.
+
+    Services filter on exactly this expression so SQLite can match it against
+    the WHERE clause of the partial indexes below.
+    """
+    return column("is_active") == true()
+
+
+def model_indexes(
+    table_name: str,
+    lookup_fields: Sequence[str] = (),
+    unique_fields: Sequence[str] = (),
+    prefix_fields: Sequence[str] = (),
+) -> Tuple[Index, ...]:
+    """Build the index declarations for a GenericModel table."""
+    indexes = [
+        Index(f"ix_{table_name}_active_{key}", "is_active", key)
+        for key in ACTIVE_SORT_KEYS
+    ]
+    for name in lookup_fields:
+        indexes.append(
+            Index(
+                f"ix_{table_name}_{name}_active",
+                name,
+                sqlite_where=active_condition(),
+                postgresql_where=active_condition(),
+            )
+        )
+    # Uniqueness only applies to active rows, so a soft-deleted name can be reused
+    for name in unique_fields:
+        indexes.append(
+            Index(
+                f"uq_{table_name}_{name}_active",
+                name,
+                unique=True,
+                sqlite_where=active_condition(),
+                postgresql_where=active_condition(),
+            )
+        )
+    # SQLite matches prefixes with a range the indexes above already serve
+    for name in prefix_fields:
+        indexes.append(
+            Index(
+                f"ix_{table_name}_{name}_prefix",
+                name,
+                postgresql_ops={name: "text_pattern_ops"},
+                postgresql_where=active_condition(),
+            ).ddl_if(dialect="postgresql")
+        )
+    return tuple(indexes)
+
+
+def create_indexes(conn: Connection) -> None:
+    """Create declared indexes that are missing from existing tables."""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with conn.begin_nested():
+                    index.create(conn, checkfirst=True)
+            except IntegrityError as e:
+                # Existing duplicates must be cleaned up before the unique
+                # index can be built; keep serving instead of failing startup
+                logger.warning(f"Could not create index {index.name}: {e}")
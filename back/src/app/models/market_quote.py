@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class MarketQuote(SQLModel, table=True):
+    """Model for the latest quote of each tracked ticker."""
+
+    __tablename__ = "market_quote"
+
+    ticker: str = Field(primary_key=True, max_length=32)
+    price: Optional[float] = Field(
+        default=None, description="Last price; None until the first refresh"
+    )
+    as_of: Optional[datetime] = Field(
+        default=None, description="Market time of the price"
+    )
+    provider: Optional[str] = Field(default=None, description="Source of the price")
+    fetched_at: Optional[datetime] = Field(
+        default=None, description="When the price was fetched"
+    )
@@ -2,13 +2,21 @@ from datetime import datetime, UTC
 from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Index
 from sqlmodel import Field, SQLModel
 
+# Change type of the entries that buy (positive quantity) or sell securities
+TRADE = "trade"
+
 
 class PortfolioLedger(SQLModel, table=True):
     """Model for tracking changes to portfolios."""
 
+    # Replays read one portfolio's events over a time range
+    __table_args__ = (
+        Index("ix_portfolioledger_portfolio_id_timestamp", "portfolio_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     portfolio_id: UUID = Field(description="ID of the portfolio that was changed")
     change_type: str = Field(
@@ -0,0 +1,24 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import JSON, Index
+from sqlmodel import Field, SQLModel
+
+
+class PositionSnapshot(SQLModel, table=True):
+    """Model for the holdings of a portfolio after a given ledger entry."""
+
+    __tablename__ = "position_snapshot"
+    __table_args__ = (
+        Index(
+            "ix_position_snapshot_portfolio_id_timestamp", "portfolio_id", "timestamp"
+        ),
+    )
+
+    portfolio_id: UUID = Field(primary_key=True)
+    ledger_id: int = Field(
+        primary_key=True, description="Last ledger entry included in the holdings"
+    )
+    timestamp: datetime = Field(description="Timestamp of that ledger entry")
+    events: int = Field(description="Ledger entries of the portfolio up to it")
+    holdings: dict = Field(sa_type=JSON, description="Quantity held by ticker")
@@ -0,0 +1,31 @@
+from typing import Dict, List, Literal, Optional
+from uuid import UUID
+
+from pydantic import PositiveFloat
+from sqlmodel import Field, SQLModel
+
+
+class RebalanceRequest(SQLModel):
+    """
+    Rebalance request
+    """
+
+    portfolio_ids: Optional[List[UUID]] = Field(
+        default=None, description="Portfolios to rebalance; all with positions if None"
+    )
+    targets: Dict[str, float] = Field(
+        description="Target weight by asset type name, summing to 1"
+    )
+    asset_types: Dict[str, str] = Field(
+        description="Asset type name by ticker; other tickers are left untouched"
+    )
+    lot_sizes: Dict[str, PositiveFloat] = Field(
+        default_factory=dict, description="Tradable quantity step by ticker"
+    )
+    min_trade: Optional[float] = Field(
+        default=None, ge=0, description="Smallest trade value; REBALANCE_MIN_TRADE"
+    )
+    mode: Literal["target", "mean_variance"] = "target"
+    risk_aversion: float = Field(
+        default=3.0, gt=0, description="Mean-variance trade-off of return for risk"
+    )
@@ -19,6 +19,7 @@ class User(GenericModel, table=True):
     """
 
     __tablename__ = "user"
+    __prefix_fields__ = ("username", "email")
 
     username: str = Field(index=True, nullable=False, unique=True)
     email: str = Field(index=True, nullable=False, unique=True)
@@ -79,6 +80,8 @@ class UserFilter(GenericFilter):
     """
 
     username: str | None = None
+    username__prefix: str | None = None
     email: str | None = None
+    email__prefix: str | None = None
     page: int = 1
     limit: int = 10
@@ -1,12 +1,31 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 from uuid import UUID
 
 from fastapi import HTTPException, status
 from sqlmodel import SQLModel, select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import String, cast
+from sqlalchemy import false, func, true
+from sqlalchemy import select as select_columns
+from sqlalchemy.exc import IntegrityError
 
-from app.models import GenericFilter, GenericModel
+from app.models import GenericFilter, GenericModel, utc_now
+from app.services.filters import compile_filter
+from app.services.fulltext import apply_text_search
+from app.utils.cache import table_versions
+from app.utils.invalidation import publish_invalidation
+from app.utils.shared_cache import get_shared_cache, invalidate_shared, row_values
 
 T = TypeVar("T", bound=GenericModel)
 
@@ -23,22 +42,111 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
     def __init__(self, model: Type[T]):
         self.model = model
 
+    @property
+    def active(self):
+        """Clause selecting active rows, in the form the model indexes match."""
+        return self.model.is_active == true()
+
+    async def _commit(self, db: AsyncSession, *keys: UUID) -> None:
+        """
+        Commit a write, bump the table version and tell the other workers.
+
+        keys are the ids of the written rows. Unique constraint violations
+        are reported as a conflict.
+        """
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"{self.model.__name__} conflicts with an existing record",
+            )
+        invalidate_shared(self.model.__tablename__, keys)
+        table_versions.bump(self.model.__tablename__)
+        await publish_invalidation(db, self.model.__tablename__, keys)
+
+    def _apply_filters(
+        self, db: AsyncSession, statement, filters: Optional[FilterSchemaType]
+    ):
+        """Add the WHERE clauses for a filter schema to a statement."""
+        if not filters:
+            return statement
+
+        dialect = db.get_bind().dialect.name
+        compiled = compile_filter(self.model, type(filters), dialect)
+        try:
+            clauses = compiled.clauses(filters)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid filter value: {e}",
+            )
+        return statement.where(*clauses) if clauses else statement
+
+    def _apply_search(
+        self,
+        db: AsyncSession,
+        statement,
+        filters: Optional[FilterSchemaType],
+        ranked: bool = False,
+    ):
+        """Restrict a statement to the full-text matches for filters.q, if set."""
+        query = getattr(filters, "q", None) if filters else None
+        if not query:
+            return statement
+        dialect = db.get_bind().dialect.name
+        return apply_text_search(statement, self.model, query, dialect, ranked=ranked)
+
+    def _apply_sorting(self, statement, sort_by: Optional[str], sort_order: str):
+        """Order a statement by a model field, defaulting to the primary key."""
+        sort_field = sort_by if sort_by and hasattr(self.model, sort_by) else "id"
+        if sort_order.lower() == "desc":
+            return statement.order_by(getattr(self.model, sort_field).desc())
+        return statement.order_by(getattr(self.model, sort_field).asc())
+
+    def _apply_keyset(
+        self, statement, after: UUID, sort_by: Optional[str], sort_order: str
+    ):
+        """Continue an id-ordered listing after the given id."""
+        if sort_by and sort_by != "id":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Keyset pagination with 'after' requires sorting by id",
+            )
+        if sort_order.lower() == "desc":
+            return statement.where(self.model.id < after)
+        return statement.where(self.model.id > after)
+
     async def create(self, db: AsyncSession, obj_in: CreateSchemaType) -> T:
         """Create a new instance of the model."""
         obj_data = obj_in.model_dump(exclude_unset=True)
         db_obj = self.model(**obj_data)
 
         db.add(db_obj)
-        await db.commit()
+        await self._commit(db, db_obj.id)
         await db.refresh(db_obj)
 
         return db_obj
 
-    async def get_by_id(self, db: AsyncSession, obj_id: UUID) -> Optional[T]:
-        """Get an instance of the model by ID."""
-        statement = select(self.model).where(
-            self.model.id == obj_id, self.model.is_active
-        )
+    async def get_by_id(
+        self, db: AsyncSession, obj_id: UUID, cached: bool = False
+    ) -> Optional[T]:
+        """
+        Get an instance of the model by ID.
+
+        With cached=True the row may come from the host's shared cache, as an
+        instance detached from the session: use it for reads only.
+        """
+        cache = get_shared_cache() if cached else None
+        if cache is not None:
+            key = f"{self.model.__tablename__}:{obj_id}"
+            values = cache.get(key)
+            if values is not None:
+                return self.model(**values)
+            version = cache.version(self.model.__tablename__)
+
+        statement = select(self.model).where(self.model.id == obj_id, self.active)
         result = await db.exec(statement)
         db_obj = result.first()
 
@@ -47,6 +155,8 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"{self.model.__name__} with ID {obj_id} not found",
             )
+        if cache is not None:
+            cache.set(key, row_values(db_obj), version)
         return db_obj
 
     async def get_all(
@@ -57,70 +167,96 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
         sort_by: Optional[str] = None,
         sort_order: str = "asc",
         filters: Optional[FilterSchemaType] = None,
-    ) -> List[T]:
-        """Get all instances of the model with pagination, sorting, and filtering."""
-        statement = select(self.model).where(self.model.is_active)
+        fields: Optional[List[str]] = None,
+        after: Optional[UUID] = None,
+    ) -> Union[List[T], List[Dict[str, Any]]]:
+        """
+        Get all instances of the model with pagination, sorting, and filtering.
+
+        When fields is given, only those columns are selected and plain dicts
+        are returned instead of model instances. When after is given, the page
+        starts after that id (keyset pagination over the time-ordered ids).
+        """
+        if fields:
+            # Plain SQLAlchemy select so results stay rows even for one column
+            columns = [getattr(self.model, field_name) for field_name in fields]
+            statement = select_columns(*columns).where(self.active)
+        else:
+            statement = select(self.model).where(self.active)
 
         # Apply filters if provided
-        if filters:
-            filter_data = filters.model_dump(exclude_unset=True, exclude_none=True)
-            # Remove pagination and sorting params from filter data
-            filter_data.pop("page", None)
-            filter_data.pop("page_size", None)
-            filter_data.pop("sort_by", None)
-            filter_data.pop("sort_order", None)
-
-            for field_name, value in filter_data.items():
-                if hasattr(self.model, field_name):
-                    field = getattr(self.model, field_name)
-                    # For string fields, use LIKE for substring search
-                    if isinstance(value, str):
-                        statement = statement.where(
-                            cast(field, String).ilike(f"%{value}%")
-                        )
-                    else:
-                        statement = statement.where(field == value)
+        statement = self._apply_filters(db, statement, filters)
+
+        # Text search results are ranked by relevance unless an order is given
+        ranked = not sort_by and after is None
+        statement = self._apply_search(db, statement, filters, ranked=ranked)
 
         # Apply sorting
-        sort_field = sort_by if sort_by and hasattr(self.model, sort_by) else "id"
-        if sort_order.lower() == "desc":
-            statement = statement.order_by(getattr(self.model, sort_field).desc())
-        else:
-            statement = statement.order_by(getattr(self.model, sort_field).asc())
+        statement = self._apply_sorting(statement, sort_by, sort_order)
 
         # Apply pagination
+        if after is not None:
+            statement = self._apply_keyset(statement, after, sort_by, sort_order)
         statement = statement.offset(skip).limit(limit)
         result = await db.exec(statement)
+        if fields:
+            return [dict(row) for row in result.mappings()]
         return list(result.all())
 
+    async def stream(
+        self,
+        db: AsyncSession,
+        fields: List[str],
+        sort_by: Optional[str] = None,
+        sort_order: str = "asc",
+        filters: Optional[FilterSchemaType] = None,
+        yield_per: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream the selected columns of all matching rows in batches.
+
+        Rows are fetched through a server-side cursor in batches of yield_per
+        and never loaded into the identity map, so memory use stays flat
+        regardless of table size.
+        """
+        columns = [getattr(self.model, field_name) for field_name in fields]
+        statement = select_columns(*columns).where(self.active)
+        statement = self._apply_filters(db, statement, filters)
+        statement = self._apply_search(db, statement, filters, ranked=not sort_by)
+        statement = self._apply_sorting(statement, sort_by, sort_order)
+        statement = statement.execution_options(yield_per=yield_per)
+
+        result = await db.stream(statement)
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
     async def count(
         self, db: AsyncSession, filters: Optional[FilterSchemaType] = None
     ) -> int:
         """Count all instances of the model with filtering."""
-        statement = select(self.model).where(self.model.is_active)
+        statement = select(func.count()).select_from(self.model).where(self.active)
 
         # Apply filters if provided
-        if filters:
-            filter_data = filters.model_dump(exclude_unset=True, exclude_none=True)
-            # Remove pagination and sorting params from filter data
-            filter_data.pop("page", None)
-            filter_data.pop("page_size", None)
-            filter_data.pop("sort_by", None)
-            filter_data.pop("sort_order", None)
-
-            for field_name, value in filter_data.items():
-                if hasattr(self.model, field_name):
-                    field = getattr(self.model, field_name)
-                    # For string fields, use LIKE for substring search
-                    if isinstance(value, str):
-                        statement = statement.where(
-                            cast(field, String).ilike(f"%{value}%")
-                        )
-                    else:
-                        statement = statement.where(field == value)
+        statement = self._apply_filters(db, statement, filters)
+        statement = self._apply_search(db, statement, filters)
 
         result = await db.exec(statement)
-        return len(result.all())
+        return result.one()
+
+    async def version(self, db: AsyncSession) -> Tuple[int, Optional[datetime]]:
+        """
+        Get a change validator for the table: (active rows, latest modified_at).
+
+        Every write, soft deletes included, bumps modified_at, so any change to
+        the active rows changes one of the two values. Both come from the
+        (is_active, modified_at) index without reading rows.
+        """
+        statement = select_columns(
+            func.count().filter(self.active), func.max(self.model.modified_at)
+        )
+        result = await db.exec(statement)
+        count, last_modified = result.one()
+        return count, last_modified
 
     async def update(
         self,
@@ -134,9 +270,11 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
 
         # Convert input to dict if it's not already
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.model_dump(exclude_unset=True)
+        # modified_at has a default on the update schema, so it is never "set"
+        update_data.setdefault("modified_at", utc_now())
 
         # Update the object attributes
         for field, value in update_data.items():
@@ -144,7 +282,7 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
                 setattr(db_obj, field, value)
 
         db.add(db_obj)
-        await db.commit()
+        await self._commit(db, db_obj.id)
         await db.refresh(db_obj)
 
         return db_obj
@@ -163,16 +301,19 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
             await db.delete(db_obj)
         else:
             setattr(db_obj, "is_active", False)
+            setattr(db_obj, "modified_at", utc_now())
             db.add(db_obj)
 
-        await db.commit()
+        await self._commit(db, db_obj.id)
+        if not hard_delete:
+            await db.refresh(db_obj)
         return db_obj
 
     async def restore(self, db: AsyncSession, obj_id: UUID) -> T:
         """Restore a soft-deleted instance of the model."""
         # Custom query to find inactive object
         statement = select(self.model).where(
-            self.model.id == obj_id, not self.model.is_active
+            self.model.id == obj_id, self.model.is_active == false()
         )
         result = await db.exec(statement)
         db_obj = result.first()
@@ -184,8 +325,9 @@ class GenericService(Generic[T, CreateSchemaType, UpdateSchemaType, FilterSchema
             )
 
         setattr(db_obj, "is_active", True)
+        setattr(db_obj, "modified_at", utc_now())
         db.add(db_obj)
-        await db.commit()
+        await self._commit(db, db_obj.id)
         await db.refresh(db_obj)
 
         return db_obj
@@ -37,9 +37,7 @@ class AssetTypeService(
         user: User = Depends(get_current_user),
     ) -> AssetTypeRead:
         """Get an asset type by its name."""
-        statement = select(self.model).where(
-            self.model.name == name, self.model.is_active
-        )
+        statement = select(self.model).where(self.model.name == name, self.active)
         result = await db.exec(statement)
         asset_type = result.first()
 
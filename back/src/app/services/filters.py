@@ -0,0 +1,207 @@
+"""
+Filter compilation module.
+
+This module turns GenericFilter schemas into SQLAlchemy WHERE clauses:
+- Filter fields are named "<column>" or "<column>__<operator>"
+- Each (model, filter schema, dialect) is compiled once into a list of terms
+- Equality, IN, range and prefix terms are written so B-tree indexes apply
+- Terms are compiled per dialect: prefixes are a code point range on SQLite
+  and a LIKE 'p%' pattern on PostgreSQL, whose collation may not sort by
+  code point (see app.models.indexes for the matching index)
+
+Supported operators:
+    eq        column = value (default when no operator is given)
+    in        column IN (a, b, ...)       value: "a,b,..."
+    prefix    column starts with value    (case-sensitive)
+    contains  case-insensitive substring  (cannot use an index)
+    gt, gte, lt, lte
+    between   lo <= column <= hi          value: "lo,hi"
+    is_null   column IS [NOT] NULL        value: true/false
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from uuid import UUID
+
+from sqlalchemy import and_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models import GenericFilter
+
+# Filter fields that control paging, sorting and full-text search
+RESERVED_FIELDS = frozenset(
+    {"page", "page_size", "limit", "sort_by", "sort_order", "q", "after"}
+)
+
+OPERATOR_SEPARATOR = "__"
+
+# Highest code point; any string with a given prefix sorts below prefix + this
+# under a code point collation, such as SQLite's default BINARY one
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+LIKE_ESCAPE = "/"
+
+
+def _prefix(column, value: str) -> ColumnElement:
+    # The range lets the planner use a B-tree index on the column; LIKE keeps
+    # the match exact (and case-sensitive on SQLite, whose LIKE is not)
+    return and_(
+        column >= value,
+        column < value + PREFIX_UPPER_BOUND,
+        column.startswith(value, autoescape=True),
+    )
+
+
+def _prefix_pattern(column, value: str) -> ColumnElement:
+    # A linguistic collation can sort prefix + U+10FFFF anywhere, so the range
+    # would drop matches; a constant 'p%' pattern uses a text_pattern_ops index
+    for special in (LIKE_ESCAPE, "%", "_"):
+        value = value.replace(special, LIKE_ESCAPE + special)
+    return column.like(value + "%", escape=LIKE_ESCAPE)
+
+
+def _between(column, value: Tuple[Any, Any]) -> ColumnElement:
+    low, high = value
+    return column.between(low, high)
+
+
+def _is_null(column, value: bool) -> ColumnElement:
+    return column.is_(None) if value else column.is_not(None)
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], ColumnElement]] = {
+    "eq": lambda column, value: column == value,
+    "in": lambda column, value: column.in_(value),
+    "prefix": _prefix,
+    "contains": lambda column, value: column.icontains(value, autoescape=True),
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "between": _between,
+    "is_null": _is_null,
+}
+
+# Operators built differently on a dialect
+DIALECT_OPERATORS: Dict[str, Dict[str, Callable[[Any, Any], ColumnElement]]] = {
+    "postgresql": {"prefix": _prefix_pattern},
+}
+
+# Operators whose value arrives as a comma-separated string
+LIST_OPERATORS = frozenset({"in", "between"})
+
+
+def _scalar_coercer(column) -> Callable[[Any], Any]:
+    """Build a function converting query-string parts to the column's type."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return lambda value: value
+
+    if python_type is bool:
+        return lambda value: str(value).lower() in ("1", "true", "yes", "on")
+    if python_type is datetime:
+        return datetime.fromisoformat
+    if python_type is date:
+        return date.fromisoformat
+    if python_type is UUID:
+        return lambda value: value if isinstance(value, UUID) else UUID(str(value))
+    return python_type
+
+
+def _list_coercer(column, operator: str) -> Callable[[Any], Any]:
+    """Build a function splitting and converting list-valued filter input."""
+    coerce = _scalar_coercer(column)
+
+    def split(value: Any) -> List[Any]:
+        parts = value.split(",") if isinstance(value, str) else list(value)
+        return [
+            coerce(part.strip() if isinstance(part, str) else part) for part in parts
+        ]
+
+    if operator == "between":
+
+        def pair(value: Any) -> Tuple[Any, Any]:
+            parts = split(value)
+            if len(parts) != 2:
+                raise ValueError("between expects two comma-separated values")
+            return parts[0], parts[1]
+
+        return pair
+    return split
+
+
+@dataclass(frozen=True)
+class FilterTerm:
+    """A single compiled filter field."""
+
+    field_name: str
+    operator: str
+    build: Callable[[Any, Any], ColumnElement]
+    column: Any
+    coerce: Optional[Callable[[Any], Any]] = None
+
+    def clause(self, value: Any) -> ColumnElement:
+        if self.coerce is not None:
+            value = self.coerce(value)
+        return self.build(self.column, value)
+
+
+class CompiledFilter:
+    """The compiled form of a filter schema for one model."""
+
+    def __init__(self, terms: List[FilterTerm]):
+        self.terms = terms
+
+    def clauses(self, filters: GenericFilter) -> List[ColumnElement]:
+        """Build the WHERE clauses for the values set on a filter instance."""
+        clauses = []
+        for term in self.terms:
+            value = getattr(filters, term.field_name, None)
+            if value is None:
+                continue
+            clauses.append(term.clause(value))
+        return clauses
+
+
+def parse_field_name(field_name: str) -> Tuple[str, str]:
+    """Split a filter field name into (column name, operator)."""
+    column_name, separator, operator = field_name.rpartition(OPERATOR_SEPARATOR)
+    if separator and operator in OPERATORS:
+        return column_name, operator
+    return field_name, "eq"
+
+
+@lru_cache(maxsize=None)
+def compile_filter(
+    model: Type[Any], filter_schema: Type[GenericFilter], dialect: str = "sqlite"
+) -> CompiledFilter:
+    """
+    Compile a filter schema against a model, for a database dialect.
+
+    Fields that don't map to a model column are skipped, as are the paging
+    and sorting fields. The result is cached per (model, schema, dialect).
+    """
+    operators = {**OPERATORS, **DIALECT_OPERATORS.get(dialect, {})}
+    terms = []
+    for field_name in filter_schema.model_fields:
+        if field_name in RESERVED_FIELDS:
+            continue
+        column_name, operator = parse_field_name(field_name)
+        column = getattr(model, column_name, None)
+        if column is None or not hasattr(column, "property"):
+            continue
+
+        coerce = _list_coercer(column, operator) if operator in LIST_OPERATORS else None
+        terms.append(
+            FilterTerm(
+                field_name=field_name,
+                operator=operator,
+                build=operators[operator],
+                column=column,
+                coerce=coerce,
+            )
+        )
+    return CompiledFilter(terms)
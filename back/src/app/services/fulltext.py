@@ -0,0 +1,168 @@
+"""
+Full-text search module.
+
+This module provides opt-in substring search indexes for text fields:
+- SQLite: an FTS5 table with the trigram tokenizer, kept in sync by triggers
+- PostgreSQL: pg_trgm GIN indexes on each searchable column
+
+Models opt in by listing their searchable columns in __fulltext__.
+install_fulltext creates the indexes at startup, and apply_text_search
+rewrites a query so it is served by them, with results ranked by relevance.
+"""
+
+import logging
+from typing import Any, List, Type
+
+from sqlalchemy import column, func, or_, table, text
+from sqlalchemy.engine import Connection
+from sqlmodel.main import default_registry
+
+logger = logging.getLogger(__name__)
+
+# FTS5 trigram queries need at least this many characters per term
+TRIGRAM_MIN_LENGTH = 3
+
+LIKE_ESCAPE = "/"
+
+
+def fulltext_models() -> List[Type[Any]]:
+    """List the mapped models that declare full-text searchable columns."""
+    return [
+        mapper.class_
+        for mapper in default_registry.mappers
+        if getattr(mapper.class_, "__fulltext__", None)
+    ]
+
+
+def fts_table_name(model: Type[Any]) -> str:
+    return f"{model.__tablename__}_fts"
+
+
+def _install_sqlite(conn: Connection, model: Type[Any]) -> None:
+    source = model.__tablename__
+    fts = fts_table_name(model)
+    columns = list(model.__fulltext__)
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{name}" for name in columns)
+
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+    ).first()
+
+    # The FTS table keeps its own copy of the text keyed by the source id;
+    # implicit rowids are not stable across VACUUM for tables with UUID keys
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+        f"USING fts5(id UNINDEXED, {column_list}, tokenize = 'trigram')"
+    )
+    # Triggers are recreated on every start so their definitions follow the
+    # model's current __fulltext__ columns
+    triggers = {
+        "ai": (
+            f"AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {fts} (id, {column_list}) VALUES (new.id, {new_values}); "
+            "END"
+        ),
+        "ad": (
+            f"AFTER DELETE ON {source} BEGIN DELETE FROM {fts} WHERE id = old.id; END"
+        ),
+        "au": (
+            f"AFTER UPDATE OF id, {column_list} ON {source} BEGIN "
+            f"DELETE FROM {fts} WHERE id = old.id; "
+            f"INSERT INTO {fts} (id, {column_list}) VALUES (new.id, {new_values}); "
+            "END"
+        ),
+    }
+    for suffix, body in triggers.items():
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {fts}_{suffix} {body}")
+
+    if not exists:
+        # Index the rows written before the FTS table existed
+        conn.exec_driver_sql(
+            f"INSERT INTO {fts} (id, {column_list}) "
+            f"SELECT id, {column_list} FROM {source}"
+        )
+
+
+def _install_postgresql(conn: Connection, model: Type[Any]) -> None:
+    source = model.__tablename__
+    conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name in model.__fulltext__:
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{source}_{name}_trgm "
+            f"ON {source} USING gin ({name} gin_trgm_ops)"
+        )
+
+
+def install_fulltext(conn: Connection) -> None:
+    """Create the full-text indexes for every opted-in model."""
+    dialect = conn.dialect.name
+    for model in fulltext_models():
+        if dialect == "sqlite":
+            _install_sqlite(conn, model)
+        elif dialect == "postgresql":
+            _install_postgresql(conn, model)
+        else:
+            logger.warning(
+                f"Full-text search is not supported on {dialect}; "
+                f"{model.__tablename__} will use substring scans"
+            )
+
+
+def _like_pattern(query: str) -> str:
+    escaped = (
+        query.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", f"{LIKE_ESCAPE}%")
+        .replace("_", f"{LIKE_ESCAPE}_")
+    )
+    return f"%{escaped}%"
+
+
+def _fts5_phrase(query: str) -> str:
+    """Quote a user query as a single FTS5 phrase (a substring match with trigrams)."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def apply_text_search(
+    statement, model: Type[Any], query: str, dialect: str, ranked: bool = True
+):
+    """
+    Restrict a statement to rows whose searchable columns contain query.
+
+    When ranked is True the statement is ordered by relevance, best first.
+    Models without __fulltext__, queries too short for trigram matching and
+    unsupported dialects fall back to a case-insensitive substring scan.
+    """
+    columns = [getattr(model, name) for name in getattr(model, "__fulltext__", ())]
+    if not columns:
+        return statement
+
+    if dialect == "sqlite" and len(query) >= TRIGRAM_MIN_LENGTH:
+        fts_name = fts_table_name(model)
+        fts = table(fts_name, column("id"), column("rank"))
+        statement = statement.join(fts, fts.c.id == model.id).where(
+            text(f"{fts_name} MATCH :fts_query").bindparams(
+                fts_query=_fts5_phrase(query)
+            )
+        )
+        if ranked:
+            statement = statement.order_by(fts.c.rank)
+        return statement
+
+    pattern = _like_pattern(query)
+    if dialect == "postgresql":
+        # ILIKE on the raw column is what the gin_trgm_ops indexes serve
+        statement = statement.where(
+            or_(*(col.ilike(pattern, escape=LIKE_ESCAPE) for col in columns))
+        )
+        if ranked:
+            similarity = func.greatest(
+                *(func.word_similarity(query, col) for col in columns)
+            )
+            statement = statement.order_by(similarity.desc())
+        return statement
+
+    return statement.where(
+        or_(*(col.icontains(query, autoescape=True) for col in columns))
+    )
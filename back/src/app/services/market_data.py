@@ -0,0 +1,359 @@
+"""
+Market data module.
+
+This module keeps prices of every tracked ticker up to date:
+- MarketDataProvider is the interface price sources implement; one call
+  prices, or fetches the daily history of, a batch of symbols
+- YFinanceProvider serves a batch with a single multi-symbol yfinance
+  download; FakeMarketDataProvider returns deterministic prices for tests
+  and offline runs
+- refresh_quotes fetches all tracked tickers in batches, with at most
+  MARKET_DATA_CONCURRENCY batches in flight, and writes the quotes back
+  with one bulk upsert into market_quote
+- sync_history appends to the price store only the daily bars each ticker
+  is missing
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.metrics.market_data import track_market_data_fetch, track_symbol_failures
+from app.models.market_quote import MarketQuote
+from app.services.price_store import PriceStore
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Bars downloaded per symbol: the last close of a few days of 5-minute bars
+# is the latest price in market hours and the last close outside them
+DOWNLOAD_PERIOD = "5d"
+DOWNLOAD_INTERVAL = "5m"
+
+# yfinance column names of the price store's columns
+HISTORY_COLUMNS = {
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+    "Close": "close",
+    "Adj Close": "adj_close",
+    "Volume": "volume",
+}
+
+
+class PriceQuote:
+    """A symbol's price at a point in market time."""
+
+    __slots__ = ("ticker", "price", "as_of")
+
+    def __init__(self, ticker: str, price: float, as_of: datetime):
+        self.ticker = ticker
+        self.price = price
+        self.as_of = as_of
+
+
+class MarketDataProvider:
+    """A source of prices; fetch() prices one batch of symbols."""
+
+    name = "base"
+
+    async def fetch(self, symbols: Sequence[str]) -> Dict[str, PriceQuote]:
+        """Latest quotes by symbol; symbols that could not be priced are left out."""
+        raise NotImplementedError
+
+    async def history(
+        self, symbols: Sequence[str], start: date
+    ) -> Dict[str, pd.DataFrame]:
+        """Daily bars by symbol since start, with the price store's columns."""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Prices from Yahoo Finance, one download request per batch."""
+
+    name = "yfinance"
+
+    async def fetch(self, symbols: Sequence[str]) -> Dict[str, PriceQuote]:
+        # yfinance is blocking: keep it off the event loop
+        return await asyncio.to_thread(self._quotes, list(symbols))
+
+    async def history(
+        self, symbols: Sequence[str], start: date
+    ) -> Dict[str, pd.DataFrame]:
+        return await asyncio.to_thread(self._history, list(symbols), start)
+
+    def _download(self, symbols: List[str], **window) -> pd.DataFrame:
+        import yfinance as yf
+
+        return yf.download(
+            tickers=symbols,
+            group_by="ticker",
+            auto_adjust=False,
+            actions=False,
+            threads=False,
+            progress=False,
+            timeout=settings.MARKET_DATA_TIMEOUT,
+            **window,
+        )
+
+    def _columns(self, frame: pd.DataFrame, symbol: str) -> pd.DataFrame:
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+        try:
+            return frame[symbol].dropna(subset=["Close"])
+        except KeyError:
+            return pd.DataFrame()
+
+    def _quotes(self, symbols: List[str]) -> Dict[str, PriceQuote]:
+        frame = self._download(
+            symbols, period=DOWNLOAD_PERIOD, interval=DOWNLOAD_INTERVAL
+        )
+        quotes: Dict[str, PriceQuote] = {}
+        for symbol in symbols:
+            closes = self._columns(frame, symbol)
+            if closes.empty:
+                continue
+            as_of = closes.index[-1].to_pydatetime()
+            if as_of.tzinfo is None:
+                as_of = as_of.replace(tzinfo=timezone.utc)
+            quotes[symbol] = PriceQuote(symbol, float(closes["Close"].iloc[-1]), as_of)
+        return quotes
+
+    def _history(self, symbols: List[str], start: date) -> Dict[str, pd.DataFrame]:
+        frame = self._download(symbols, start=start.isoformat(), interval="1d")
+        history: Dict[str, pd.DataFrame] = {}
+        for symbol in symbols:
+            bars = self._columns(frame, symbol)
+            if not bars.empty:
+                history[symbol] = bars.rename(columns=HISTORY_COLUMNS)
+        return history
+
+
+def _seed(symbol: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(symbol.encode(), digest_size=8).digest(), "little"
+    )
+
+
+def fake_price(symbol: str, at: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+    """A price between 10 and 500 that drifts +/-5% over a day (vectorized)."""
+    seed = _seed(symbol)
+    base = 10 + (seed % 49_000) / 100
+    phase = (seed >> 32) % 1000 / 1000 * 2 * math.pi
+    return np.round(base * (1 + 0.05 * np.sin(at / 86400 * 2 * math.pi + phase)), 4)
+
+
+class FakeMarketDataProvider(MarketDataProvider):
+    """Deterministic prices computed from the symbol and the clock."""
+
+    name = "fake"
+
+    def __init__(
+        self, failing: Iterable[str] = (), clock: Callable[[], float] = time.time
+    ):
+        self.failing = set(failing)
+        self.clock = clock
+        self.calls: List[List[str]] = []
+
+    async def fetch(self, symbols: Sequence[str]) -> Dict[str, PriceQuote]:
+        self.calls.append(list(symbols))
+        now = self.clock()
+        as_of = datetime.fromtimestamp(now, timezone.utc)
+        return {
+            symbol: PriceQuote(symbol, float(fake_price(symbol, now)), as_of)
+            for symbol in symbols
+            if symbol not in self.failing
+        }
+
+    async def history(
+        self, symbols: Sequence[str], start: date
+    ) -> Dict[str, pd.DataFrame]:
+        self.calls.append(list(symbols))
+        today = datetime.fromtimestamp(self.clock(), timezone.utc).date()
+        days = pd.bdate_range(start, today, name="date")
+        seconds = days.as_unit("s").asi8.astype(float)
+        history = {}
+        for symbol in symbols:
+            if symbol in self.failing:
+                continue
+            # Opening at 9:30, closing at 16:00
+            opens = fake_price(symbol, seconds + 34_200)
+            closes = fake_price(symbol, seconds + 57_600)
+            history[symbol] = pd.DataFrame(
+                {
+                    "open": opens,
+                    "high": np.maximum(opens, closes) * 1.01,
+                    "low": np.minimum(opens, closes) * 0.99,
+                    "close": closes,
+                    "adj_close": closes,
+                    "volume": float(1_000_000 + _seed(symbol) % 1_000_000),
+                },
+                index=days,
+            )
+        return history
+
+
+def create_provider() -> MarketDataProvider:
+    """The provider selected by MARKET_DATA_PROVIDER."""
+    if settings.MARKET_DATA_PROVIDER == "fake":
+        return FakeMarketDataProvider()
+    return YFinanceProvider()
+
+
+async def tracked_tickers(engine: AsyncEngine) -> List[str]:
+    """Tickers listed in settings or already present in market_quote."""
+    async with AsyncSession(engine) as db:
+        result = await db.exec(select(MarketQuote.ticker))
+        tickers = set(result.all())
+    tickers.update(ticker.upper() for ticker in settings.MARKET_DATA_TICKERS)
+    return sorted(tickers)
+
+
+async def _fetch_batched(
+    provider: MarketDataProvider,
+    symbols: Sequence[str],
+    fetch: Callable[[Sequence[str]], Awaitable[Dict[str, T]]],
+) -> Tuple[Dict[str, T], List[str]]:
+    """Call fetch on batches of symbols, with bounded concurrency."""
+    size = settings.MARKET_DATA_BATCH_SIZE
+    batches = [symbols[i : i + size] for i in range(0, len(symbols), size)]
+    semaphore = asyncio.Semaphore(settings.MARKET_DATA_CONCURRENCY)
+
+    async def fetch_batch(batch: Sequence[str]) -> Dict[str, T]:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                results = await asyncio.wait_for(
+                    fetch(batch), settings.MARKET_DATA_TIMEOUT
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Market data batch of {len(batch)} symbols failed "
+                    f"({provider.name}): {e!r}"
+                )
+                track_market_data_fetch(
+                    provider.name, time.perf_counter() - start, False
+                )
+                return {}
+            track_market_data_fetch(provider.name, time.perf_counter() - start, True)
+            return results
+
+    results: Dict[str, T] = {}
+    for batch_results in await asyncio.gather(*map(fetch_batch, batches)):
+        results.update(batch_results)
+    failed = [symbol for symbol in symbols if symbol not in results]
+    track_symbol_failures(provider.name, failed)
+    return results, failed
+
+
+async def fetch_quotes(
+    provider: MarketDataProvider, symbols: Sequence[str]
+) -> Tuple[Dict[str, PriceQuote], List[str]]:
+    """Price symbols in batches; returns (quotes, failed symbols)."""
+    return await _fetch_batched(provider, symbols, provider.fetch)
+
+
+async def upsert_quotes(
+    engine: AsyncEngine, quotes: Iterable[PriceQuote], provider: str
+) -> int:
+    """Write quotes with a single INSERT .. ON CONFLICT statement."""
+    fetched_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "ticker": quote.ticker,
+            "price": quote.price,
+            "as_of": quote.as_of,
+            "provider": provider,
+            "fetched_at": fetched_at,
+        }
+        for quote in quotes
+    ]
+    if not rows:
+        return 0
+
+    insert = postgresql_insert if engine.dialect.name == "postgresql" else sqlite_insert
+    statement = insert(MarketQuote).values(rows)
+    table = MarketQuote.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.ticker],
+        set_={
+            name: statement.excluded[name]
+            for name in ("price", "as_of", "provider", "fetched_at")
+        },
+        # A slower worker must not overwrite a newer price
+        where=table.c.as_of.is_(None) | (statement.excluded.as_of >= table.c.as_of),
+    )
+    async with AsyncSession(engine) as db:
+        await db.exec(statement)
+        await db.commit()
+    return len(rows)
+
+
+async def refresh_quotes(
+    engine: AsyncEngine, provider: MarketDataProvider
+) -> Tuple[int, List[str]]:
+    """Refresh every tracked ticker; returns (quotes written, failed symbols)."""
+    symbols = await tracked_tickers(engine)
+    if not symbols:
+        return 0, []
+    quotes, failed = await fetch_quotes(provider, symbols)
+    written = await upsert_quotes(engine, quotes.values(), provider.name)
+    if failed:
+        logger.warning(f"No market data for {len(failed)} symbols: {failed[:20]}")
+    return written, failed
+
+
+async def sync_history(
+    provider: MarketDataProvider, store: PriceStore, symbols: Sequence[str]
+) -> Tuple[int, List[str]]:
+    """Append the daily bars each ticker is missing; returns (rows, failed symbols)."""
+    today = datetime.now(timezone.utc).date()
+    backfill = today - timedelta(days=365 * settings.PRICE_STORE_HISTORY_YEARS)
+    # One download per start date: after the first sync, nearly all share one
+    by_start: Dict[date, List[str]] = {}
+    for symbol in symbols:
+        last = store.last_date(symbol)
+        # From the last stored bar, which may have been taken mid-session
+        start = backfill if last is None else last.date()
+        by_start.setdefault(start, []).append(symbol)
+
+    def append(history: Dict[str, pd.DataFrame]) -> int:
+        return sum(store.append(symbol, bars) for symbol, bars in history.items())
+
+    written = 0
+    failed: List[str] = []
+    for start, group in sorted(by_start.items()):
+        history, missing = await _fetch_batched(
+            provider, group, partial(provider.history, start=start)
+        )
+        written += await asyncio.to_thread(append, history)
+        failed.extend(missing)
+    if failed:
+        logger.warning(f"No price history for {len(failed)} symbols: {failed[:20]}")
+    return written, failed
@@ -0,0 +1,508 @@
+"""
+Positions module.
+
+This module projects the portfolio ledger onto holdings:
+- Holdings map tickers to the quantity held, folded from "trade" entries
+  (see app.services.valuation for their details); other entries only count
+  towards the snapshot cadence
+- Snapshots of the holdings are stored per portfolio every
+  LEDGER_SNAPSHOT_EVENTS entries, and at the end of each day with entries
+- Holdings at a point in time are the nearest earlier snapshot plus a replay
+  of the entries recorded after it, read through the (portfolio_id,
+  timestamp) index, so a lookup costs the same however long the ledger is
+- The current_positions table holds the quantity, average cost basis and
+  last applied entry of each (portfolio, ticker); ledger writes update it
+  in their own transaction, one upsert per trade, so current holdings are a
+  single primary key range read
+- A consistency check rebuilds the positions from the ledger and reports
+  (and optionally repairs) the rows that drifted
+- Ledger ids are assigned when entries are flushed, before they commit. On
+  PostgreSQL writers therefore lock the portfolios they write to, so the
+  entries of a portfolio commit in id order, and the check reads its
+  watermark once the writers in flight have committed (see lock_ledger)
+
+Entries are assumed to be recorded in timestamp order, as
+app.utils.logging.record_portfolio_changes does.
+"""
+
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import case, func, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.metrics.positions import track_positions_check
+from app.models.current_position import CurrentPosition
+from app.models.portfolio_ledger import TRADE, PortfolioLedger
+from app.models.position_snapshot import PositionSnapshot
+
+logger = logging.getLogger(__name__)
+
+Holdings = Dict[str, float]
+# (portfolio_id, ticker) -> (quantity, cost_basis)
+Positions = Dict[Tuple[UUID, str], Tuple[float, float]]
+
+# Advisory lock classes: the ledger as a whole, and each of its portfolios
+LEDGER_LOCK = 0x4C474552
+PORTFOLIO_LOCK = 0x4C475054
+
+
+def portfolio_lock_key(portfolio_id: UUID) -> int:
+    """The advisory lock key of a portfolio; collisions only over-serialize."""
+    return int.from_bytes(portfolio_id.bytes[:4], "big", signed=True)
+
+
+async def lock_ledger(db: AsyncSession, portfolio_ids: Sequence[UUID]) -> None:
+    """
+    Lock portfolios for a ledger write, until the transaction ends.
+
+    Call before flushing the entries. Writers to a portfolio take turns, so
+    its entries get their ids in commit order and a snapshot never skips an
+    entry that commits after it; every writer also shares the ledger lock
+    that ledger_watermark waits on. A no-op on SQLite, where a writer
+    holds the database write lock from its flush to its commit.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    await db.exec(
+        text("SELECT pg_advisory_xact_lock_shared(:lock, 0)").bindparams(
+            lock=LEDGER_LOCK
+        )
+    )
+    # In key order, so writers to overlapping portfolios cannot deadlock
+    for key in sorted({portfolio_lock_key(p) for p in portfolio_ids}):
+        await db.exec(
+            text("SELECT pg_advisory_xact_lock(:lock, :key)").bindparams(
+                lock=PORTFOLIO_LOCK, key=key
+            )
+        )
+
+
+async def ledger_watermark(db: AsyncSession) -> int:
+    """
+    The id of the last ledger entry, with every entry up to it committed.
+
+    max(id) alone is not enough on PostgreSQL: a lower id flushed by a
+    writer still in flight may commit after it. The exclusive ledger lock
+    waits for those writers and holds new ones back while max(id) is read;
+    the transaction is committed to release it.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        await db.exec(
+            text("SELECT pg_advisory_xact_lock(:lock, 0)").bindparams(lock=LEDGER_LOCK)
+        )
+    result = await db.exec(select(func.max(PortfolioLedger.id)))
+    through = result.one() or 0
+    await db.commit()
+    return through
+
+
+def trade_of(
+    change_type: str, details: Optional[dict]
+) -> Optional[Tuple[str, float, Optional[float]]]:
+    """(ticker, quantity, cost) of a trade entry, None for other entries."""
+    if change_type != TRADE:
+        return None
+    details = details or {}
+    quantity = float(details["quantity"])
+    price = details.get("price")
+    cost = None if price is None else quantity * float(price)
+    return str(details["ticker"]).upper(), quantity, cost
+
+
+def apply_trade(
+    quantity: float, cost_basis: float, delta: float, cost: Optional[float]
+) -> Tuple[float, float]:
+    """
+    Quantity and cost basis after a trade, at average cost.
+
+    Trades growing a position add their cost; trades reducing it keep the
+    average cost, as do trades without a price; a trade crossing zero opens
+    the remainder at its own price. Mirrors _cost_update.
+    """
+    held = quantity + delta
+    if not held:
+        return 0.0, 0.0
+    opposite = quantity * delta < 0
+    if cost is None or (opposite and abs(delta) <= abs(quantity)):
+        return held, cost_basis * held / quantity if quantity else 0.0
+    if opposite:
+        return held, cost * held / delta
+    return held, cost_basis + cost
+
+
+def apply_entries(holdings: Holdings, entries: Iterable[PortfolioLedger]) -> Holdings:
+    """The holdings after the trades of entries, as a new dict."""
+    holdings = dict(holdings)
+    for entry in entries:
+        trade = trade_of(entry.change_type, entry.details)
+        if trade is None:
+            continue
+        ticker, delta, _ = trade
+        quantity = holdings.get(ticker, 0.0) + delta
+        if quantity:
+            holdings[ticker] = quantity
+        else:
+            holdings.pop(ticker, None)
+    return holdings
+
+
+async def latest_snapshot(
+    db: AsyncSession, portfolio_id: UUID, at: Optional[datetime] = None
+) -> Optional[PositionSnapshot]:
+    """The last snapshot of a portfolio taken at or before at."""
+    statement = select(PositionSnapshot).where(
+        PositionSnapshot.portfolio_id == portfolio_id
+    )
+    if at is not None:
+        statement = statement.where(PositionSnapshot.timestamp <= at)
+    statement = statement.order_by(
+        PositionSnapshot.timestamp.desc(), PositionSnapshot.ledger_id.desc()
+    ).limit(1)
+    result = await db.exec(statement)
+    return result.first()
+
+
+async def entries_after(
+    db: AsyncSession,
+    portfolio_id: UUID,
+    snapshot: Optional[PositionSnapshot] = None,
+    at: Optional[datetime] = None,
+) -> List[PortfolioLedger]:
+    """Ledger entries of a portfolio recorded after snapshot, up to at."""
+    statement = select(PortfolioLedger).where(
+        PortfolioLedger.portfolio_id == portfolio_id
+    )
+    if snapshot is not None:
+        # The timestamp bound keeps the scan on the index range after it
+        statement = statement.where(
+            PortfolioLedger.timestamp >= snapshot.timestamp,
+            PortfolioLedger.id > snapshot.ledger_id,
+        )
+    if at is not None:
+        statement = statement.where(PortfolioLedger.timestamp <= at)
+    result = await db.exec(statement.order_by(PortfolioLedger.id))
+    return list(result.all())
+
+
+async def holdings_at(
+    db: AsyncSession, portfolio_id: UUID, at: Optional[datetime] = None
+) -> Holdings:
+    """Holdings of a portfolio at a point in time (now by default)."""
+    if at is None:
+        positions = await current_positions(db, portfolio_id)
+        return {position.ticker: position.quantity for position in positions}
+    snapshot = await latest_snapshot(db, portfolio_id, at)
+    entries = await entries_after(db, portfolio_id, snapshot, at)
+    return apply_entries(snapshot.holdings if snapshot else {}, entries)
+
+
+def _snapshot(
+    portfolio_id: UUID, entry: PortfolioLedger, events: int, holdings: Holdings
+) -> PositionSnapshot:
+    return PositionSnapshot(
+        portfolio_id=portfolio_id,
+        ledger_id=entry.id,
+        timestamp=entry.timestamp,
+        events=events,
+        holdings=holdings,
+    )
+
+
+async def update_snapshots(
+    db: AsyncSession, portfolio_ids: Sequence[UUID], every: Optional[int] = None
+) -> int:
+    """
+    Add the snapshots that are due for portfolios; returns how many.
+
+    A snapshot is due every `every` entries (LEDGER_SNAPSHOT_EVENTS by
+    default) and after the last entry of a day once a later one exists. The
+    snapshots are added to the session, the caller commits them.
+
+    Replays resume after the snapshot's ledger_id, so this relies on the
+    entries of a portfolio committing in id order (see lock_ledger): an
+    entry with a lower id committed later would be skipped for good.
+    """
+    every = every or settings.LEDGER_SNAPSHOT_EVENTS
+    added = 0
+    for portfolio_id in dict.fromkeys(portfolio_ids):
+        snapshot = await latest_snapshot(db, portfolio_id)
+        entries = await entries_after(db, portfolio_id, snapshot)
+        if snapshot is None:
+            holdings, events, day = {}, 0, None
+        else:
+            holdings, events = snapshot.holdings, snapshot.events
+            day = snapshot.timestamp.date()
+
+        pending = 0
+        previous = None
+        for entry in entries:
+            if pending and entry.timestamp.date() != day:
+                # Close the previous day
+                db.add(_snapshot(portfolio_id, previous, events, holdings))
+                added += 1
+                pending = 0
+            holdings = apply_entries(holdings, (entry,))
+            events += 1
+            pending += 1
+            day = entry.timestamp.date()
+            previous = entry
+            if pending >= every:
+                db.add(_snapshot(portfolio_id, entry, events, holdings))
+                added += 1
+                pending = 0
+    return added
+
+
+async def current_positions(
+    db: AsyncSession, portfolio_id: UUID
+) -> List[CurrentPosition]:
+    """Open positions of a portfolio, by ticker."""
+    statement = (
+        select(CurrentPosition)
+        .where(CurrentPosition.portfolio_id == portfolio_id)
+        .where(CurrentPosition.quantity != 0)
+        .order_by(CurrentPosition.ticker)
+    )
+    result = await db.exec(statement)
+    return list(result.all())
+
+
+def _cost_update(statement, priced: bool):
+    """The cost basis of an upserted position, in SQL; mirrors apply_trade."""
+    table = CurrentPosition.__table__
+    quantity, cost_basis = table.c.quantity, table.c.cost_basis
+    delta = statement.excluded.quantity
+    held = quantity + delta
+    average = case((quantity == 0, 0.0), else_=cost_basis * held / quantity)
+    if not priced:
+        return case((held == 0, 0.0), else_=average)
+    cost = statement.excluded.cost_basis
+    opposite = quantity * delta < 0
+    return case(
+        (held == 0, 0.0),
+        (opposite & (func.abs(delta) <= func.abs(quantity)), average),
+        (opposite, cost * held / delta),
+        else_=cost_basis + cost,
+    )
+
+
+async def update_current_positions(
+    db: AsyncSession, entries: Sequence[PortfolioLedger]
+) -> int:
+    """
+    Apply the trades of flushed ledger entries to current_positions.
+
+    Each trade is an INSERT .. ON CONFLICT DO UPDATE computing the new
+    quantity and cost basis from the stored ones, so concurrent writers to
+    a position serialize on its row. Nothing is committed; returns the
+    number of trades applied.
+    """
+    rows = []
+    modified_at = datetime.now(timezone.utc)
+    for entry in entries:
+        trade = trade_of(entry.change_type, entry.details)
+        if trade is None:
+            continue
+        ticker, quantity, cost = trade
+        rows.append(
+            {
+                "portfolio_id": entry.portfolio_id,
+                "ticker": ticker,
+                "quantity": quantity,
+                "cost_basis": cost,
+                "last_event_id": entry.id,
+                "modified_at": modified_at,
+            }
+        )
+    if not rows:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    table = CurrentPosition.__table__
+    # Runs of priced and unpriced trades, applied in ledger order
+    for priced, run in groupby(rows, key=lambda row: row["cost_basis"] is not None):
+        run = list(run)
+        if not priced:
+            for row in run:
+                row["cost_basis"] = 0.0
+        statement = insert(CurrentPosition)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.portfolio_id, table.c.ticker],
+            set_={
+                "quantity": table.c.quantity + statement.excluded.quantity,
+                "cost_basis": _cost_update(statement, priced),
+                "last_event_id": statement.excluded.last_event_id,
+                "modified_at": statement.excluded.modified_at,
+            },
+        )
+        await db.exec(statement, params=run)
+    return len(rows)
+
+
+class PositionDrift:
+    """A current position that differs from its rebuild from the ledger."""
+
+    __slots__ = ("portfolio_id", "ticker", "expected", "actual")
+
+    def __init__(
+        self,
+        portfolio_id: UUID,
+        ticker: str,
+        expected: Tuple[float, float],
+        actual: Tuple[float, float],
+    ):
+        self.portfolio_id = portfolio_id
+        self.ticker = ticker
+        # (quantity, cost_basis)
+        self.expected = expected
+        self.actual = actual
+
+    def __repr__(self) -> str:
+        return (
+            f"PositionDrift({self.portfolio_id}, {self.ticker!r}, "
+            f"expected={self.expected}, actual={self.actual})"
+        )
+
+
+async def rebuild_positions(db: AsyncSession, through: int) -> Positions:
+    """Positions from a replay of the ledger up to entry through."""
+    statement = (
+        select(
+            PortfolioLedger.portfolio_id,
+            PortfolioLedger.change_type,
+            PortfolioLedger.details,
+        )
+        .where(PortfolioLedger.change_type == TRADE)
+        .where(PortfolioLedger.id <= through)
+        .order_by(PortfolioLedger.id)
+        .execution_options(yield_per=settings.EXPORT_YIELD_PER)
+    )
+    positions: Positions = {}
+    result = await db.stream(statement)
+    async for portfolio_id, change_type, details in result:
+        ticker, delta, cost = trade_of(change_type, details)
+        key = (portfolio_id, ticker)
+        positions[key] = apply_trade(*positions.get(key, (0.0, 0.0)), delta, cost)
+    return positions
+
+
+def _same(expected: Tuple[float, float], actual: Tuple[float, float]) -> bool:
+    return all(
+        math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6) for a, b in zip(expected, actual)
+    )
+
+
+async def repair_positions(
+    db: AsyncSession, drifts: Sequence[PositionDrift], through: int
+) -> None:
+    """
+    Overwrite drifted rows with their rebuild up to ledger entry through.
+
+    Rows a later entry has already moved past through are left alone, so a
+    trade committed while the check ran is never undone. Nothing is
+    committed.
+    """
+    table = CurrentPosition.__table__
+    rows = []
+    for drift in drifts:
+        if drift.expected == (0.0, 0.0):
+            await db.exec(
+                delete(CurrentPosition)
+                .where(CurrentPosition.portfolio_id == drift.portfolio_id)
+                .where(CurrentPosition.ticker == drift.ticker)
+                .where(CurrentPosition.last_event_id <= through)
+            )
+            continue
+        quantity, cost_basis = drift.expected
+        rows.append(
+            {
+                "portfolio_id": drift.portfolio_id,
+                "ticker": drift.ticker,
+                "quantity": quantity,
+                "cost_basis": cost_basis,
+                "last_event_id": through,
+                "modified_at": datetime.now(timezone.utc),
+            }
+        )
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    statement = insert(CurrentPosition)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.portfolio_id, table.c.ticker],
+        set_={
+            "quantity": statement.excluded.quantity,
+            "cost_basis": statement.excluded.cost_basis,
+            "last_event_id": statement.excluded.last_event_id,
+            "modified_at": statement.excluded.modified_at,
+        },
+        where=table.c.last_event_id <= through,
+    )
+    await db.exec(statement, params=rows)
+
+
+async def check_positions(
+    engine: AsyncEngine, repair: bool = False
+) -> List[PositionDrift]:
+    """
+    Compare current_positions with a rebuild from the ledger.
+
+    The ledger is replayed up to its last committed entry when the check
+    starts (see ledger_watermark); positions changed by later entries are
+    skipped. With repair, drifted
+    rows are overwritten with the rebuilt values in the transaction that
+    read them, locked where the database supports it (see repair_positions).
+    """
+    started = time.perf_counter()
+    async with AsyncSession(engine) as db:
+        through = await ledger_watermark(db)
+        expected = await rebuild_positions(db, through)
+
+        statement = select(CurrentPosition).where(
+            CurrentPosition.last_event_id <= through
+        )
+        if repair:
+            # Ledger writes to these rows wait for the repair (no-op on SQLite)
+            statement = statement.with_for_update()
+        stored = await db.exec(statement)
+        actual: Positions = {}
+        for position in stored.all():
+            key = (position.portfolio_id, position.ticker)
+            actual[key] = (position.quantity, position.cost_basis)
+        newer = await db.exec(
+            select(CurrentPosition.portfolio_id, CurrentPosition.ticker).where(
+                CurrentPosition.last_event_id > through
+            )
+        )
+        skipped = set(newer.all())
+
+        drifts = []
+        for key in expected.keys() | actual.keys():
+            want, have = expected.get(key, (0.0, 0.0)), actual.get(key, (0.0, 0.0))
+            if key not in skipped and not _same(want, have):
+                drifts.append(PositionDrift(*key, want, have))
+        if repair and drifts:
+            await repair_positions(db, drifts, through)
+        await db.commit()
+
+    track_positions_check(len(drifts), time.perf_counter() - started)
+    if drifts:
+        logger.warning(
+            f"{len(drifts)} current positions drifted from the ledger"
+            f"{' and were repaired' if repair else ''}: {drifts[:10]}"
+        )
+    return drifts
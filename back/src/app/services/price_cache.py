@@ -0,0 +1,187 @@
+"""
+Price cache module.
+
+This module keeps recently used price series in memory within a byte budget:
+- Frames are compacted before they are stored: float32 prices, categorical
+  string columns (tickers) and an int64 epoch-nanosecond index
+- Entry sizes are measured with DataFrame.memory_usage(deep=True); least
+  recently used entries are evicted once PRICE_CACHE_MAX_BYTES is reached
+- Entries remember the price store version they were read at, so a ticker
+  with new bars is read again instead of served stale
+- Hits, misses, bytes held and bytes evicted are exported as metrics
+
+Cached frames are shared between callers and must be treated as read-only.
+The cache may be used from worker threads (e.g. through asyncio.to_thread).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_object_dtype, is_string_dtype
+
+from app.config import settings
+from app.metrics.cache import (
+    track_cache_entries,
+    track_cache_eviction,
+    track_cache_request,
+    track_cache_size,
+    track_cache_store,
+)
+from app.services.price_store import (
+    DATE_DTYPE,
+    DateLike,
+    align,
+    epoch_ns,
+    get_price_store,
+)
+
+# Float columns kept in float64: share counts exceed float32's exact range
+WIDE_COLUMNS = ("volume",)
+
+
+def compact(frame: pd.DataFrame) -> pd.DataFrame:
+    """A copy of frame with float32 prices, categorical strings and an int64 index."""
+    columns = {}
+    for name in frame.columns:
+        values = frame[name]
+        if is_float_dtype(values.dtype) and name not in WIDE_COLUMNS:
+            values = values.astype(np.float32)
+        elif is_object_dtype(values.dtype) or is_string_dtype(values.dtype):
+            values = values.astype("category")
+        columns[name] = values.array
+    index = frame.index
+    if isinstance(index, pd.DatetimeIndex):
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        index = pd.Index(index.as_unit("ns").asi8, name=index.name)
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def expand(frame: pd.DataFrame) -> pd.DataFrame:
+    """A view of a compacted frame with its DatetimeIndex restored."""
+    if frame.index.dtype != DATE_DTYPE:
+        return frame
+    index = pd.DatetimeIndex(
+        frame.index.to_numpy().view("datetime64[ns]"), name=frame.index.name
+    )
+    view = frame.copy(deep=False)
+    view.index = index
+    return view
+
+
+class PriceSeriesCache:
+    """LRU map of compacted DataFrames bounded by their memory usage."""
+
+    def __init__(self, max_bytes: int, name: str = "price"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # key -> (version, frame, bytes)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, pd.DataFrame, int]]"
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: Any = None) -> Optional[pd.DataFrame]:
+        """The compacted frame stored at version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+        if entry is None or entry[0] != version:
+            track_cache_request(self.name, "price_series", "miss")
+            return None
+        track_cache_request(self.name, "price_series", "hit")
+        return entry[1]
+
+    def put(
+        self, key: Hashable, frame: pd.DataFrame, version: Any = None
+    ) -> pd.DataFrame:
+        """Compact and store frame, evicting as needed; returns the compacted frame."""
+        frame = compact(frame)
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                track_cache_store(self.name, "price_series", "too_large")
+                return frame
+
+            evicted = 0
+            while self._entries and self.bytes + size > self.max_bytes:
+                _, (_, _, entry_size) = self._entries.popitem(last=False)
+                self.bytes -= entry_size
+                evicted += entry_size
+            self._entries[key] = (version, frame, size)
+            self.bytes += size
+        if evicted:
+            track_cache_eviction(self.name, evicted)
+        track_cache_store(self.name, "price_series", "stored")
+        self._track()
+        return frame
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+        self._track()
+
+    def _track(self) -> None:
+        track_cache_entries(self.name, len(self._entries))
+        track_cache_size(self.name, self.bytes)
+
+
+price_cache = PriceSeriesCache(settings.PRICE_CACHE_MAX_BYTES)
+
+
+def _history(ticker: str) -> pd.DataFrame:
+    """The compacted full history of a ticker, read through the cache."""
+    store = get_price_store()
+    version = store.version(ticker)
+    frame = price_cache.get(ticker, version)
+    if frame is None:
+        frame = price_cache.put(ticker, store.read(ticker), version)
+    return frame
+
+
+def _bounds(
+    frame: pd.DataFrame, start: Optional[DateLike], end: Optional[DateLike]
+) -> slice:
+    dates = frame.index.to_numpy()
+    low = 0 if start is None else np.searchsorted(dates, epoch_ns(start), "left")
+    high = len(dates) if end is None else np.searchsorted(dates, epoch_ns(end), "right")
+    return slice(low, high)
+
+
+def load_history(
+    ticker: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None
+) -> pd.DataFrame:
+    """Daily bars of a ticker between start and end, through the price cache."""
+    frame = _history(ticker)
+    return expand(frame.iloc[_bounds(frame, start, end)])
+
+
+def load_prices(
+    tickers: Sequence[str],
+    start: Optional[DateLike] = None,
+    end: Optional[DateLike] = None,
+    column: str = "adj_close",
+) -> pd.DataFrame:
+    """One column of many tickers aligned on their dates, through the price cache."""
+    series = []
+    for ticker in tickers:
+        frame = _history(ticker)
+        bounds = _bounds(frame, start, end)
+        series.append(
+            (frame.index.to_numpy()[bounds], frame[column].to_numpy()[bounds])
+        )
+    return align(tickers, series)
@@ -0,0 +1,307 @@
+"""
+Price store module.
+
+This module keeps daily price history on disk, one ticker per partition:
+- Columns are raw little-endian files: <ticker>.dates (int64 nanoseconds)
+  and <ticker>.bars (float64 rows of open, high, low, close, adj_close,
+  volume), spread over 256 hashed directories
+- New bars are appended to the end of the files; a bar for the last stored
+  date (today's, still moving) is overwritten in place. Nothing is
+  rewritten, and an append interrupted half-way is trimmed by the next one
+- Range reads memory-map the files and binary-search the dates, so the
+  returned DataFrame is a view of the page cache rather than a copy
+- The last PRICE_STORE_TAIL_ROWS bars of recently read tickers are kept in
+  memory for last-N-day reads
+- read_many aligns one column of many tickers on a shared date index
+
+Other daily series (e.g. the risk metrics of app.services.risk) use the same
+layout through a PriceStore with their own columns.
+"""
+
+import fcntl
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.metrics.market_data import track_price_store_append, track_price_store_read
+
+COLUMNS = ("open", "high", "low", "close", "adj_close", "volume")
+DATE_DTYPE = np.dtype("<i8")
+BAR_DTYPE = np.dtype("<f8")
+
+DateLike = Union[str, date, datetime, pd.Timestamp]
+
+
+def epoch_ns(value: DateLike) -> int:
+    """Nanoseconds since the epoch of a (naive, UTC) date."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.as_unit("ns").value
+
+
+def _frame(
+    dates: np.ndarray, bars: np.ndarray, columns: Sequence[str] = COLUMNS
+) -> pd.DataFrame:
+    index = pd.DatetimeIndex(dates.view("datetime64[ns]"), name="date")
+    return pd.DataFrame(bars, index=index, columns=list(columns), copy=False)
+
+
+def align(
+    columns: Sequence[str], series: Sequence[Tuple[np.ndarray, np.ndarray]]
+) -> pd.DataFrame:
+    """Lay (int64 dates, values) series side by side on the union of their dates."""
+    index = np.unique(np.concatenate([dates for dates, _ in series] or [[]]))
+    index = index.astype(DATE_DTYPE)
+    dtype = np.result_type(*[values.dtype for _, values in series] or [BAR_DTYPE])
+    matrix = np.full((len(index), len(columns)), np.nan, dtype=dtype)
+    for j, (dates, values) in enumerate(series):
+        matrix[np.searchsorted(index, dates), j] = values
+    return pd.DataFrame(
+        matrix,
+        index=pd.DatetimeIndex(index.view("datetime64[ns]"), name="date"),
+        columns=list(columns),
+        copy=False,
+    )
+
+
+def _empty(columns: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, DATE_DTYPE), np.empty((0, len(columns)), BAR_DTYPE)
+
+
+class PriceStore:
+    """Append-only columnar files of daily bars, keyed by ticker."""
+
+    def __init__(
+        self,
+        root: str,
+        tail_rows: int = 300,
+        tail_tickers: int = 1000,
+        columns: Sequence[str] = COLUMNS,
+    ):
+        self.root = root
+        self.columns = tuple(columns)
+        self.row_bytes = len(self.columns) * BAR_DTYPE.itemsize
+        self.tail_rows = tail_rows
+        self.tail_tickers = tail_tickers
+        # ticker -> (_stat() when cached, dates, bars)
+        self._tails: "OrderedDict[str, Tuple[Tuple[int, int], np.ndarray, np.ndarray]]"
+        self._tails = OrderedDict()
+
+    def _paths(self, ticker: str) -> Tuple[str, str]:
+        name = quote(ticker.upper(), safe="")
+        partition = hashlib.blake2b(name.encode(), digest_size=1).hexdigest()
+        directory = os.path.join(self.root, partition)
+        return (
+            os.path.join(directory, f"{name}.dates"),
+            os.path.join(directory, f"{name}.bars"),
+        )
+
+    def _stat(self, ticker: str) -> Tuple[int, int]:
+        """Complete rows on disk, and when the bars were last written."""
+        dates_path, bars_path = self._paths(ticker)
+        try:
+            dates_size = os.stat(dates_path).st_size
+            bars = os.stat(bars_path)
+        except FileNotFoundError:
+            return 0, 0
+        # The dates file is written last
+        rows = min(dates_size // DATE_DTYPE.itemsize, bars.st_size // self.row_bytes)
+        return rows, bars.st_mtime_ns
+
+    def version(self, ticker: str) -> Tuple[int, int]:
+        """Changes whenever bars of the ticker are written."""
+        return self._stat(ticker)
+
+    def _map(self, ticker: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-map a ticker's complete rows (copy-on-write, never flushed)."""
+        rows, _ = self._stat(ticker)
+        if not rows:
+            return _empty(self.columns)
+        dates_path, bars_path = self._paths(ticker)
+        dates = np.memmap(dates_path, dtype=DATE_DTYPE, mode="c", shape=(rows,))
+        bars = np.memmap(
+            bars_path, dtype=BAR_DTYPE, mode="c", shape=(rows, len(self.columns))
+        )
+        return dates, bars
+
+    # Reads
+
+    def read(
+        self,
+        ticker: str,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None,
+    ) -> pd.DataFrame:
+        """Bars of a ticker between start and end (inclusive), without copying."""
+        began = time.perf_counter()
+        dates, bars = self._map(ticker)
+        low = 0 if start is None else np.searchsorted(dates, epoch_ns(start), "left")
+        high = (
+            len(dates)
+            if end is None
+            else np.searchsorted(dates, epoch_ns(end), "right")
+        )
+        frame = _frame(dates[low:high], bars[low:high], self.columns)
+        track_price_store_read("range", time.perf_counter() - began)
+        return frame
+
+    def tail(self, ticker: str, rows: int) -> pd.DataFrame:
+        """The last rows bars of a ticker, from memory when rows <= tail_rows."""
+        # Not [-rows:], which is every bar when rows is 0
+        rows = max(rows, 0)
+        if rows > self.tail_rows:
+            dates, bars = self._map(ticker)
+            low = max(len(dates) - rows, 0)
+            return _frame(dates[low:], bars[low:], self.columns)
+
+        began = time.perf_counter()
+        stat = self._stat(ticker)
+        cached = self._tails.get(ticker)
+        if cached is None or cached[0] != stat:
+            # Written since, here or by another worker
+            dates, bars = self._map(ticker)
+            cached = (
+                stat,
+                np.array(dates[-self.tail_rows :]),
+                np.array(bars[-self.tail_rows :]),
+            )
+            self._tails[ticker] = cached
+            while len(self._tails) > self.tail_tickers:
+                self._tails.popitem(last=False)
+        self._tails.move_to_end(ticker)
+        _, dates, bars = cached
+        low = max(len(dates) - rows, 0)
+        frame = _frame(dates[low:], bars[low:], self.columns)
+        track_price_store_read("tail", time.perf_counter() - began)
+        return frame
+
+    def last_date(self, ticker: str) -> Optional[pd.Timestamp]:
+        rows, _ = self._stat(ticker)
+        if not rows:
+            return None
+        dates_path, _ = self._paths(ticker)
+        with open(dates_path, "rb") as file:
+            file.seek((rows - 1) * DATE_DTYPE.itemsize)
+            return pd.Timestamp(int.from_bytes(file.read(8), "little", signed=True))
+
+    def read_many(
+        self,
+        tickers: Sequence[str],
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None,
+        column: str = "adj_close",
+    ) -> pd.DataFrame:
+        """One column of many tickers, aligned on the union of their dates."""
+        began = time.perf_counter()
+        position = self.columns.index(column)
+        start_ns = None if start is None else epoch_ns(start)
+        end_ns = None if end is None else epoch_ns(end)
+
+        slices = []
+        for ticker in tickers:
+            dates, bars = self._map(ticker)
+            low = 0 if start_ns is None else np.searchsorted(dates, start_ns, "left")
+            high = (
+                len(dates)
+                if end_ns is None
+                else np.searchsorted(dates, end_ns, "right")
+            )
+            slices.append((dates[low:high], bars[low:high, position]))
+
+        frame = align(tickers, slices)
+        track_price_store_read("many", time.perf_counter() - began)
+        return frame
+
+    # Writes
+
+    def append(self, ticker: str, bars: pd.DataFrame) -> int:
+        """
+        Append bars newer than the stored ones; returns the rows written.
+
+        bars is indexed by date with the store's columns (adj_close defaults
+        to close and missing values to NaN). Bars older than the last stored date are
+        ignored; one for the last stored date replaces it.
+        """
+        if bars.empty:
+            return 0
+        frame = bars.reindex(columns=list(self.columns))
+        if "adj_close" in self.columns:
+            frame["adj_close"] = frame["adj_close"].fillna(frame["close"])
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        new_dates = index.as_unit("ns").asi8.astype(DATE_DTYPE)
+        values = np.ascontiguousarray(frame.to_numpy(dtype=BAR_DTYPE))
+        order = np.argsort(new_dates, kind="stable")
+        new_dates, values = new_dates[order], values[order]
+        # Keep the last bar of each date
+        last_of_date = np.append(new_dates[1:] != new_dates[:-1], True)
+        new_dates, values = new_dates[last_of_date], values[last_of_date]
+
+        dates_path, bars_path = self._paths(ticker)
+        os.makedirs(os.path.dirname(dates_path), exist_ok=True)
+        dates_fd = os.open(dates_path, os.O_RDWR | os.O_CREAT, 0o644)
+        bars_fd = os.open(bars_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(dates_fd, fcntl.LOCK_EX)
+            dates_size = os.fstat(dates_fd).st_size
+            bars_size = os.fstat(bars_fd).st_size
+            rows = min(dates_size // DATE_DTYPE.itemsize, bars_size // self.row_bytes)
+            # Trim a row left half-written by an interrupted append
+            if dates_size != rows * DATE_DTYPE.itemsize:
+                os.ftruncate(dates_fd, rows * DATE_DTYPE.itemsize)
+            if bars_size != rows * self.row_bytes:
+                os.ftruncate(bars_fd, rows * self.row_bytes)
+
+            written = 0
+            if rows:
+                last = int.from_bytes(
+                    os.pread(dates_fd, 8, (rows - 1) * DATE_DTYPE.itemsize),
+                    "little",
+                    signed=True,
+                )
+                same = np.searchsorted(new_dates, last)
+                if same < len(new_dates) and new_dates[same] == last:
+                    os.pwrite(
+                        bars_fd, values[same].tobytes(), (rows - 1) * self.row_bytes
+                    )
+                    written += 1
+                newer = new_dates > last
+                new_dates, values = new_dates[newer], values[newer]
+
+            if len(new_dates):
+                # Bars first: readers only count rows whose date is written
+                os.pwrite(bars_fd, values.tobytes(), rows * self.row_bytes)
+                os.pwrite(dates_fd, new_dates.tobytes(), rows * DATE_DTYPE.itemsize)
+                written += len(new_dates)
+        finally:
+            os.close(bars_fd)
+            os.close(dates_fd)
+
+        self._tails.pop(ticker, None)
+        track_price_store_append(written)
+        return written
+
+
+price_store: Optional[PriceStore] = None
+
+
+def get_price_store() -> PriceStore:
+    """The process-wide store at PRICE_STORE_PATH."""
+    global price_store
+    if price_store is None:
+        price_store = PriceStore(
+            settings.PRICE_STORE_PATH,
+            settings.PRICE_STORE_TAIL_ROWS,
+            settings.PRICE_STORE_TAIL_TICKERS,
+        )
+    return price_store
@@ -0,0 +1,300 @@
+"""
+Rebalance module.
+
+This module suggests trades bringing portfolios back to target allocations:
+- Targets are weights by asset type; tickers are classified by the request,
+  and held tickers it does not classify (or without a price) are left
+  untouched and out of the rebalanced value
+- In "target" mode a type's weight is split over its tickers in the
+  proportions the portfolio already holds them (evenly when it holds none);
+  in "mean_variance" mode the split maximizes expected return less
+  risk_aversion / 2 times variance, from one return model (see
+  app.services.simulation) shared by every portfolio of the batch
+- Trades are computed on portfolios x tickers arrays, REBALANCE_BATCH_PORTFOLIOS
+  portfolios at a time: trades worth less than the minimum are dropped,
+  sells round up to lot sizes (within the quantity held) and buys round down
+  once scaled to the cash the sells raise, so no portfolio needs new cash
+"""
+
+import asyncio
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, status
+from sqlalchemy import true
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.asset_type import AssetType
+from app.models.current_position import CurrentPosition
+from app.models.rebalance import RebalanceRequest
+from app.services.price_cache import load_prices
+from app.services.simulation import MONTHS_PER_YEAR, ticker_model
+
+# Weights within this of the constraints count as met
+WEIGHT_TOLERANCE = 1e-6
+
+
+class Rebalance:
+    """Suggested trades of a batch of portfolios."""
+
+    __slots__ = ("trades", "cash", "drift", "weights", "expected_return", "volatility")
+
+    def __init__(
+        self,
+        trades: pd.DataFrame,
+        cash: pd.Series,
+        drift: pd.Series,
+        weights: Optional[pd.Series] = None,
+        expected_return: Optional[float] = None,
+        volatility: Optional[float] = None,
+    ):
+        # portfolio_id, ticker, quantity (< 0 sells), price, value
+        self.trades = trades
+        # Cash left over after the trades, by portfolio
+        self.cash = cash
+        # Largest gap between an asset type's weight and its target, before
+        self.drift = drift
+        # Mean-variance mode: target weight by ticker, annual return and volatility
+        self.weights = weights
+        self.expected_return = expected_return
+        self.volatility = volatility
+
+
+def type_membership(type_index: np.ndarray, n_types: int) -> np.ndarray:
+    """Types x tickers indicator of each ticker's asset type."""
+    membership = np.zeros((n_types, len(type_index)))
+    membership[type_index, np.arange(len(type_index))] = 1.0
+    return membership
+
+
+def split_targets(
+    values: np.ndarray, type_index: np.ndarray, targets: np.ndarray
+) -> np.ndarray:
+    """
+    Target weights (portfolios x tickers) splitting each type's target over
+    its tickers in proportion to values, evenly where a type is not held.
+    """
+    membership = type_membership(type_index, len(targets))
+    type_values = (values @ membership.T)[:, type_index]
+    even = 1.0 / membership.sum(axis=1)[type_index]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(type_values > 0, values / type_values, even)
+    return targets[type_index] * share
+
+
+def mean_variance_weights(
+    mean: np.ndarray,
+    covariance: np.ndarray,
+    type_index: np.ndarray,
+    targets: np.ndarray,
+    risk_aversion: float,
+) -> np.ndarray:
+    """
+    Long-only weights maximizing mean @ w - risk_aversion / 2 * w @ cov @ w
+    with the weights of each type summing to its target.
+
+    Each pass solves the KKT system of the equality constrained problem over
+    the tickers still free, then drops those with negative weights. A type
+    never runs out of tickers: the weights of its tickers sum to its target.
+    """
+    free = np.ones(len(mean), dtype=bool)
+    weights = np.zeros(len(mean))
+    while True:
+        index = np.flatnonzero(free)
+        membership = type_membership(type_index[index], len(targets))
+        size = len(index)
+        kkt = np.zeros((size + len(targets), size + len(targets)))
+        kkt[:size, :size] = risk_aversion * covariance[np.ix_(index, index)]
+        kkt[:size, size:] = membership.T
+        kkt[size:, :size] = membership
+        rhs = np.concatenate([mean[index], targets])
+        solution = np.linalg.lstsq(kkt, rhs, rcond=None)[0][:size]
+        negative = solution < -WEIGHT_TOLERANCE
+        if not negative.any():
+            weights[index] = np.clip(solution, 0.0, None)
+            return weights
+        free[index[negative]] = False
+
+
+def rebalance_trades(
+    quantities: np.ndarray,
+    prices: np.ndarray,
+    weights: np.ndarray,
+    lots: np.ndarray,
+    min_trade: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trade quantities (portfolios x tickers) towards weights, and the cash
+    each portfolio has left after them.
+    """
+    values = quantities * prices
+    wanted = values.sum(axis=1, keepdims=True) * weights - values
+    wanted[np.abs(wanted) < min_trade] = 0.0
+
+    # Sell whole lots, at least what the target needs and at most what is held
+    # Lot counts are rounded first so that 4.9999999 lots is 5
+    sell_lots = np.ceil(np.round(np.maximum(-wanted, 0.0) / prices / lots, 9))
+    sells = np.minimum(sell_lots * lots, np.maximum(quantities, 0.0))
+    raised = (sells * prices).sum(axis=1)
+
+    # Buy what the sells pay for, in whole lots
+    buying = np.maximum(wanted, 0.0)
+    needed = buying.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(needed > raised, raised / needed, 1.0)
+    buys = np.floor(np.round(buying * scale[:, None] / prices / lots, 9)) * lots
+    buys[buys * prices < min_trade] = 0.0
+
+    cash = raised - (buys * prices).sum(axis=1)
+    return buys - sells, cash
+
+
+async def load_positions(
+    db: AsyncSession, portfolio_ids: Optional[Sequence[UUID]] = None
+) -> pd.DataFrame:
+    """Open positions (portfolio_id, ticker, quantity) of portfolios, or of all."""
+    statement = select(
+        CurrentPosition.portfolio_id, CurrentPosition.ticker, CurrentPosition.quantity
+    ).where(CurrentPosition.quantity != 0)
+    if portfolio_ids is not None:
+        statement = statement.where(CurrentPosition.portfolio_id.in_(portfolio_ids))
+    result = await db.exec(statement)
+    return pd.DataFrame(
+        result.all(), columns=["portfolio_id", "ticker", "quantity"]
+    ).astype({"quantity": float})
+
+
+async def validate_asset_types(db: AsyncSession, names: Sequence[str]) -> None:
+    """Raise 422 for names that are not active asset types."""
+    statement = select(AssetType.name).where(
+        AssetType.name.in_(list(names)), AssetType.is_active == true()
+    )
+    known = set((await db.exec(statement)).all())
+    unknown = sorted(set(names) - known)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown asset types: {', '.join(unknown)}",
+        )
+
+
+def _targets(request: RebalanceRequest) -> Tuple[List[str], np.ndarray]:
+    names = sorted(request.targets)
+    targets = np.array([request.targets[name] for name in names])
+    if (targets < 0).any() or abs(targets.sum() - 1) > WEIGHT_TOLERANCE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Target weights must be non-negative and sum to 1",
+        )
+    return names, targets
+
+
+def compute_rebalance(
+    positions: pd.DataFrame, request: RebalanceRequest, prices: pd.Series
+) -> Rebalance:
+    """Rebalance of positions at prices (last price by ticker), as requested."""
+    type_names, targets = _targets(request)
+    classified = {
+        ticker.upper(): name
+        for ticker, name in request.asset_types.items()
+        if name in request.targets
+    }
+    tickers = sorted(t for t in classified if np.isfinite(prices.get(t, np.nan)))
+    type_index = np.array([type_names.index(classified[t]) for t in tickers], int)
+    missing = sorted(set(type_names) - {classified[t] for t in tickers})
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No priced tickers for asset types: {', '.join(missing)}",
+        )
+    lot_sizes = {ticker.upper(): size for ticker, size in request.lot_sizes.items()}
+    lots = np.array([lot_sizes.get(t, settings.REBALANCE_LOT_SIZE) for t in tickers])
+    price = prices.reindex(tickers).to_numpy()
+    min_trade = (
+        settings.REBALANCE_MIN_TRADE if request.min_trade is None else request.min_trade
+    )
+
+    result = Rebalance(trades=None, cash=None, drift=None)
+    if request.mode == "mean_variance":
+        model, _ = ticker_model(tickers)
+        mean = model.mean * MONTHS_PER_YEAR
+        covariance = model.factor @ model.factor.T * MONTHS_PER_YEAR
+        best = mean_variance_weights(
+            mean, covariance, type_index, targets, request.risk_aversion
+        )
+        result.weights = pd.Series(best, index=tickers)
+        result.expected_return = float(mean @ best)
+        result.volatility = float(np.sqrt(best @ covariance @ best))
+
+    held = positions[positions["ticker"].isin(tickers)]
+    portfolios = pd.Index(positions["portfolio_id"].unique(), name="portfolio_id")
+    matrix = held.pivot_table(
+        index="portfolio_id", columns="ticker", values="quantity", aggfunc="sum"
+    )
+    matrix = matrix.reindex(index=portfolios, columns=tickers, fill_value=0.0)
+    matrix = matrix.fillna(0.0).to_numpy()
+    membership = type_membership(type_index, len(targets))
+
+    trades, cash, drift = [], [], []
+    batch = settings.REBALANCE_BATCH_PORTFOLIOS
+    for low in range(0, len(portfolios), batch):
+        quantities = matrix[low : low + batch]
+        values = quantities * price
+        total = values.sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drift.append(np.abs((values @ membership.T) / total - targets).max(axis=1))
+        if result.weights is None:
+            weights = split_targets(values, type_index, targets)
+        else:
+            weights = np.broadcast_to(best, values.shape)
+        # Portfolios with nothing to rebalance hold nothing tradable
+        weights = np.where(total > 0, weights, 0.0)
+        change, left = rebalance_trades(quantities, price, weights, lots, min_trade)
+        rows, columns = np.nonzero(change)
+        trades.append(
+            pd.DataFrame(
+                {
+                    "portfolio_id": portfolios[low + rows],
+                    "ticker": np.asarray(tickers, dtype=object)[columns],
+                    "quantity": change[rows, columns],
+                    "price": price[columns],
+                    "value": change[rows, columns] * price[columns],
+                }
+            )
+        )
+        cash.append(left)
+
+    empty = pd.DataFrame(
+        columns=["portfolio_id", "ticker", "quantity", "price", "value"]
+    )
+    result.trades = pd.concat(trades, ignore_index=True) if trades else empty
+    result.cash = pd.Series(np.concatenate(cash or [[]]), index=portfolios)
+    result.drift = pd.Series(np.concatenate(drift or [[]]), index=portfolios)
+    return result
+
+
+async def rebalance_portfolios(
+    db: AsyncSession, request: RebalanceRequest
+) -> Rebalance:
+    """Rebalance of the requested portfolios' current positions at last prices."""
+    await validate_asset_types(db, list(request.targets))
+    positions = await load_positions(db, request.portfolio_ids)
+    if positions.empty:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No open positions in these portfolios",
+        )
+
+    def compute() -> Rebalance:
+        tickers = sorted(
+            {t.upper() for t in request.asset_types} | set(positions["ticker"])
+        )
+        prices = load_prices(tickers).ffill()
+        last = prices.iloc[-1] if len(prices) else pd.Series(dtype=float)
+        return compute_rebalance(positions, request, last)
+
+    return await asyncio.to_thread(compute)
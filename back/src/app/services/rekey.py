@@ -0,0 +1,116 @@
+"""
+UUIDv7 re-keying module.
+
+This module migrates rows created with random (uuid4) ids to UUIDv7:
+- Each row gets a UUIDv7 carrying its created_at, so id order matches
+  creation order for old and new rows alike
+- Columns holding ids of other rows (audit log targets) are rewritten in
+  the same transaction
+- Users keep their ids: access tokens carry them as subject and clients
+  hold them, neither of which a migration can rewrite
+- Rows that already have UUIDv7 ids are left alone, so it can be re-run
+
+Usage:
+    poetry run python -m app.services.rekey
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple, Type
+from uuid import UUID
+
+from sqlalchemy import Column, bindparam, select
+from sqlalchemy.engine import Connection
+from sqlmodel.main import default_registry
+
+from app.models import GenericModel
+from app.models.audit_log import AuditLog
+from app.services.fulltext import install_fulltext
+from app.utils.ids import uuid7_from_datetime
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Tables whose ids are referenced outside the database
+EXCLUDED_TABLES = ("user",)
+
+
+def _references(model: Type[Any]) -> List[Tuple[Column, Any]]:
+    """Columns holding ids of model rows, with the condition selecting them."""
+    table_name = model.__tablename__
+    audit = AuditLog.__table__
+    return [(audit.c.target_id, audit.c.target_type == table_name)]
+
+
+def _new_ids(conn: Connection, model: Type[Any]) -> Dict[UUID, UUID]:
+    """Assign a UUIDv7 to every row of model that doesn't have one yet."""
+    table = model.__table__
+    rows = conn.execute(
+        select(table.c.id, table.c.created_at).order_by(table.c.created_at, table.c.id)
+    )
+    mapping = {}
+    previous_ms, counter = None, 0
+    for row_id, created_at in rows:
+        if row_id.version == 7:
+            continue
+        # Rows created in the same millisecond keep their relative order
+        ms = int(created_at.timestamp() * 1000)
+        counter = counter + 1 if ms == previous_ms else 0
+        previous_ms = ms
+        mapping[row_id] = uuid7_from_datetime(created_at, counter)
+    return mapping
+
+
+def _rewrite(conn: Connection, column: Column, condition, mapping) -> None:
+    statement = column.table.update().where(column == bindparam("old_id"))
+    if condition is not None:
+        statement = statement.where(condition)
+    statement = statement.values({column.name: bindparam("new_id")})
+
+    pairs = [{"old_id": old, "new_id": new} for old, new in mapping.items()]
+    for start in range(0, len(pairs), BATCH_SIZE):
+        conn.execute(statement, pairs[start : start + BATCH_SIZE])
+
+
+def rekey_model(conn: Connection, model: Type[Any]) -> int:
+    """Re-key one model's rows to UUIDv7 and return how many changed."""
+    mapping = _new_ids(conn, model)
+    if not mapping:
+        return 0
+
+    table = model.__table__
+    _rewrite(conn, table.c.id, None, mapping)
+    for column, condition in _references(model):
+        _rewrite(conn, column, condition, mapping)
+
+    logger.info(f"Re-keyed {len(mapping)} {model.__tablename__} rows to UUIDv7")
+    return len(mapping)
+
+
+def rekey_all(conn: Connection) -> Dict[str, int]:
+    """Re-key every GenericModel table (run through AsyncConnection.run_sync)."""
+    # Full-text triggers must follow id changes before the ids are rewritten
+    install_fulltext(conn)
+    models = [
+        mapper.class_
+        for mapper in default_registry.mappers
+        if issubclass(mapper.class_, GenericModel)
+        and mapper.class_.__tablename__ not in EXCLUDED_TABLES
+    ]
+    return {model.__tablename__: rekey_model(conn, model) for model in models}
+
+
+async def main() -> None:
+    from app.db.session import engine
+
+    # Import the table models so they are registered
+    import app.models.asset_type  # noqa: F401
+
+    async with engine.begin() as conn:
+        counts = await conn.run_sync(rekey_all)
+    for table_name, count in counts.items():
+        print(f"{table_name}: {count} rows re-keyed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
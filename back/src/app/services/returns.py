@@ -0,0 +1,223 @@
+"""
+Returns module.
+
+This module computes portfolio performance over reporting windows:
+- Daily returns come from valuations (app.services.valuation): the P&L of a
+  day over the value held at its start, trades counting as end of day cash
+  flows; a day opening empty earns its P&L over the cash traded in it
+- Time-weighted returns of every window are differences of the cumulative
+  sum of log(1 + daily return), i.e. ratios of the cumulative product
+- Money-weighted returns (XIRR) discount the window's opening value, the
+  cash traded in it and its closing value; the rates of all portfolios and
+  windows are solved at once by a safeguarded Newton iteration that falls
+  back to bisection, on padded (problem x cash flow) arrays
+"""
+
+import asyncio
+from datetime import date
+from typing import Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.services.price_store import DateLike
+from app.services.valuation import Valuation, value_ledger
+
+WINDOWS = ("1M", "3M", "YTD", "1Y", "ITD")
+# Trailing windows, by how far back from the end date they start
+OFFSETS = {
+    "1M": pd.DateOffset(months=1),
+    "3M": pd.DateOffset(months=3),
+    "1Y": pd.DateOffset(years=1),
+}
+DAYS_PER_YEAR = 365.0
+# Bracket of log(1 + rate): annual rates from -100% to e^20 times the capital
+LOG_RATE_BOUNDS = (-20.0, 20.0)
+
+
+class Returns:
+    """Time- and money-weighted returns, portfolios x windows."""
+
+    __slots__ = ("twr", "xirr")
+
+    def __init__(self, twr: pd.DataFrame, xirr: pd.DataFrame):
+        self.twr = twr
+        # Annualized; NaN where the cash flows have no single sign change
+        self.xirr = xirr
+
+
+def daily_returns(valuation: Valuation) -> pd.DataFrame:
+    """Daily returns, dates x portfolios; 0 on days with nothing invested."""
+    market_value = valuation.market_value.to_numpy()
+    flows = valuation.flows.to_numpy()
+    opening = np.vstack([np.zeros_like(market_value[:1]), market_value[:-1]])
+    invested = np.where(opening != 0, opening, flows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(invested != 0, valuation.pnl.to_numpy() / invested, 0.0)
+    return pd.DataFrame(
+        returns,
+        index=valuation.market_value.index,
+        columns=valuation.market_value.columns,
+    )
+
+
+def window_bases(
+    dates: pd.DatetimeIndex, end: pd.Timestamp, windows: Sequence[str]
+) -> np.ndarray:
+    """
+    Index of the base day of each window: its last close before the window.
+
+    -1 stands for "before the first date", where nothing is held yet.
+    """
+    bases = []
+    for name in windows:
+        if name == "ITD":
+            bases.append(-1)
+        elif name == "YTD":
+            bases.append(dates.searchsorted(pd.Timestamp(date(end.year, 1, 1))) - 1)
+        else:
+            bases.append(dates.searchsorted(end - OFFSETS[name], "right") - 1)
+    return np.asarray(bases)
+
+
+def time_weighted(returns: np.ndarray, bases: np.ndarray, end_index: int) -> np.ndarray:
+    """TWR (portfolios x windows) from daily returns (dates x portfolios)."""
+    with np.errstate(divide="ignore"):
+        growth = np.cumsum(np.log1p(returns), axis=0)
+    # Row 0 is the growth before the first date
+    growth = np.vstack([np.zeros_like(growth[:1]), growth])
+    return np.expm1(growth[end_index + 1][:, None] - growth[bases + 1].T)
+
+
+def solve_xirr(
+    amounts: np.ndarray,
+    years: np.ndarray,
+    tolerance: float = 1e-10,
+    max_iterations: int = 100,
+) -> np.ndarray:
+    """
+    Annual rates zeroing sum(amounts * (1 + rate) ** -years) for each row.
+
+    The iteration runs on g = log(1 + rate), where the present value is a
+    sum of exponentials. Rows converge independently; each keeps a bracket
+    [low, high] with a sign change and takes the Newton step when it stays
+    inside, the bracket's midpoint otherwise. Rows without a sign change
+    over LOG_RATE_BOUNDS are NaN.
+    """
+
+    def present_value(g, rows):
+        discounted = amounts[rows] * np.exp(-years[rows] * g[:, None])
+        return discounted.sum(axis=1), -(years[rows] * discounted).sum(axis=1)
+
+    count = len(amounts)
+    every = np.arange(count)
+    low = np.full(count, LOG_RATE_BOUNDS[0])
+    high = np.full(count, LOG_RATE_BOUNDS[1])
+    with np.errstate(over="ignore", invalid="ignore"):
+        value_low, _ = present_value(low, every)
+        value_high, _ = present_value(high, every)
+    sign_low = np.sign(value_low)
+    bracketed = sign_low * np.sign(value_high) < 0
+
+    g = np.where(bracketed, 0.1, np.nan)
+    active = np.flatnonzero(bracketed)
+    for _ in range(max_iterations):
+        if not len(active):
+            break
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            value, slope = present_value(g[active], active)
+            # Shrink the bracket around the root
+            below = np.sign(value) == sign_low[active]
+            low[active] = np.where(below, g[active], low[active])
+            high[active] = np.where(below, high[active], g[active])
+            step = g[active] - value / slope
+        inside = np.isfinite(step) & (step > low[active]) & (step < high[active])
+        guess = np.where(inside, step, (low[active] + high[active]) / 2)
+        done = (np.abs(guess - g[active]) <= tolerance) | (value == 0)
+        g[active] = guess
+        active = active[~done]
+    return np.expm1(g)
+
+
+def money_weighted(
+    valuation: Valuation, bases: np.ndarray, end_index: int
+) -> np.ndarray:
+    """XIRR of windows (portfolios x windows), all solved together."""
+    market_value = valuation.market_value.to_numpy()
+    flows = valuation.flows.to_numpy()
+    dates = valuation.market_value.index
+    n_portfolios, n_windows = market_value.shape[1], len(bases)
+    # Days since the first date, with the day before it for base -1
+    days = np.concatenate([[-1], (dates - dates[0]).days.to_numpy()])
+
+    # Cash flows as (problem, day, amount) triplets, problem = portfolio x window
+    flow_day, flow_portfolio = np.nonzero(flows[: end_index + 1])
+    problem, day, amount = [], [], []
+    for window, base in enumerate(bases):
+        inside = flow_day > base
+        problem.append(flow_portfolio[inside] * n_windows + window)
+        day.append(flow_day[inside])
+        # Investing in the portfolio is a payment from the investor
+        amount.append(-flows[flow_day[inside], flow_portfolio[inside]])
+        if base >= 0:
+            problem.append(np.arange(n_portfolios) * n_windows + window)
+            day.append(np.full(n_portfolios, base))
+            amount.append(-market_value[base])
+        problem.append(np.arange(n_portfolios) * n_windows + window)
+        day.append(np.full(n_portfolios, end_index))
+        amount.append(market_value[end_index])
+    problem, day, amount = map(np.concatenate, (problem, day, amount))
+
+    # Pad each problem's flows into one row, discounted from its window's base
+    order = np.argsort(problem, kind="stable")
+    problem, day, amount = problem[order], day[order], amount[order]
+    count = np.bincount(problem, minlength=n_portfolios * n_windows)
+    first = np.concatenate([[0], np.cumsum(count)[:-1]])
+    column = np.arange(len(problem)) - first[problem]
+    amounts = np.zeros((n_portfolios * n_windows, count.max()))
+    years = np.zeros_like(amounts)
+    amounts[problem, column] = amount
+    base_day = days[bases + 1][problem % n_windows]
+    years[problem, column] = (days[day + 1] - base_day) / DAYS_PER_YEAR
+
+    return solve_xirr(amounts, years).reshape(n_portfolios, n_windows)
+
+
+def compute_returns(
+    valuation: Valuation,
+    end: Optional[DateLike] = None,
+    windows: Sequence[str] = WINDOWS,
+) -> Returns:
+    """TWR and XIRR of every portfolio of valuation over windows ending at end."""
+    dates = valuation.market_value.index
+    end = dates[-1] if end is None else pd.Timestamp(end)
+    end_index = dates.searchsorted(end, "right") - 1
+    bases = window_bases(dates, end, windows)
+    portfolios = valuation.market_value.columns
+
+    returns = daily_returns(valuation).to_numpy()
+    twr = time_weighted(returns, bases, end_index)
+    xirr = money_weighted(valuation, bases, end_index)
+    return Returns(
+        twr=pd.DataFrame(twr, index=portfolios, columns=list(windows)),
+        xirr=pd.DataFrame(xirr, index=portfolios, columns=list(windows)),
+    )
+
+
+async def portfolio_returns(
+    db: AsyncSession,
+    portfolio_ids: Optional[Sequence[UUID]] = None,
+    end: Optional[DateLike] = None,
+    windows: Sequence[str] = WINDOWS,
+) -> Returns:
+    """Returns of portfolios from their ledger and the price store."""
+    valuation = await value_ledger(db, portfolio_ids, end=end)
+    if valuation.market_value.empty:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No priced trades recorded for these portfolios",
+        )
+    return await asyncio.to_thread(compute_returns, valuation, end, windows)
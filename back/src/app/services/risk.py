@@ -0,0 +1,359 @@
+"""
+Risk module.
+
+This module computes rolling risk metrics of tickers and portfolios:
+- Annualized volatility, beta and tracking error against a benchmark
+  ticker, max drawdown, and historical and parametric VaR and CVaR, over
+  windows of a fixed number of daily returns
+- Moments come from differences of cumulative sums (x, x^2, x*b, ...), one
+  pass whatever the window. Drawdowns merge (peak, trough, drawdown)
+  summaries of spans doubling in length, log2(window) passes. Historical
+  VaR and CVaR take the smallest returns of each window from running
+  minima of window-aligned blocks, a chunk of series at a time so memory
+  stays within RISK_CHUNK_CELLS
+- Ticker metrics are kept in a PriceStore with RISK_COLUMNS under
+  RISK_STORE_PATH, one series per (ticker, benchmark, window, confidence);
+  an update only recomputes the days after the last stored one
+- Portfolio metrics follow the ledger, so they are computed on request
+
+Losses (drawdown, VaR, CVaR) are positive fractions of the value at risk;
+VaR and CVaR are one-day figures. Tickers are sampled on the benchmark's
+trading days, carrying their last price over their own gaps.
+"""
+
+import asyncio
+import logging
+from statistics import NormalDist
+from typing import Dict, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.services.price_cache import load_prices
+from app.services.price_store import DateLike, PriceStore, get_price_store
+from app.services.returns import daily_returns
+from app.services.valuation import value_ledger
+
+logger = logging.getLogger(__name__)
+
+RISK_COLUMNS = (
+    "volatility",
+    "beta",
+    "tracking_error",
+    "max_drawdown",
+    "var_historical",
+    "cvar_historical",
+    "var_parametric",
+    "cvar_parametric",
+)
+TRADING_DAYS = 252
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over the window ending at each row; NaN until it is full."""
+    total = np.cumsum(values, axis=0)
+    sums = np.full_like(total, np.nan)
+    sums[window - 1] = total[window - 1]
+    sums[window:] = total[window:] - total[:-window]
+    return sums
+
+
+def _merge(left, right):
+    """Summary of two adjacent spans from theirs: (peak, trough, drawdown)."""
+    peak, trough, drawdown = left
+    return (
+        np.maximum(peak, right[0]),
+        np.minimum(trough, right[1]),
+        np.minimum(np.minimum(drawdown, right[2]), right[1] - peak),
+    )
+
+
+def _rolling_drawdown(path: np.ndarray, length: int) -> np.ndarray:
+    """
+    Largest fall of path (rows x series) within each run of length rows.
+
+    Summaries of spans of 1, 2, 4, ... rows are built by merging pairs; the
+    spans whose length is a bit of `length` are merged, left to right, into
+    the summaries of the runs.
+    """
+    count = len(path) - length + 1
+    level = (path, path, np.zeros_like(path))
+    runs = None
+    span, offset = 1, 0
+    while True:
+        if length & span:
+            piece = tuple(part[offset : offset + count] for part in level)
+            runs = piece if runs is None else _merge(runs, piece)
+            offset += span
+        if span * 2 > length:
+            return runs[2]
+        size = len(level[0]) - span
+        level = _merge(
+            tuple(part[:size] for part in level),
+            tuple(part[span : span + size] for part in level),
+        )
+        span *= 2
+
+
+def _insert(smallest: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """The smallest values (sorted on the last axis) once values join them."""
+    before = np.concatenate(
+        [np.full_like(smallest[..., :1], -np.inf), smallest[..., :-1]], axis=-1
+    )
+    return np.minimum(smallest, np.maximum(before, values[..., None]))
+
+
+def _rolling_smallest(
+    values: np.ndarray, window: int, count: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The count-th smallest value of each window, and the mean of the count
+    smallest; (rows - window + 1) x series.
+
+    Rows are cut into blocks of window rows: a window is a suffix of one
+    block and a prefix of the next. The count smallest values of every
+    prefix and suffix come from one running pass over each block, then the
+    two sorted lists of a window are merged.
+    """
+    rows, n_series = values.shape
+    blocks = rows // window + 1
+    padded = np.full((blocks * window, n_series), np.inf)
+    padded[:rows] = values
+    padded = padded.reshape(blocks, window, n_series)
+
+    shape = (blocks, window, n_series, count)
+    prefix, suffix = np.empty(shape), np.empty(shape)
+    smallest = np.full((blocks, n_series, count), np.inf)
+    for j in range(window):
+        prefix[:, j] = smallest
+        smallest = _insert(smallest, padded[:, j])
+    smallest = np.full((blocks, n_series, count), np.inf)
+    for j in reversed(range(window)):
+        smallest = _insert(smallest, padded[:, j])
+        suffix[:, j] = smallest
+
+    starts = np.arange(rows - window + 1)
+    left = suffix.reshape(-1, n_series, count)[starts]
+    right = prefix.reshape(-1, n_series, count)[starts + window]
+    # count-th smallest of two sorted lists: i from the left, count - i from the right
+    edge = np.full_like(left[..., :1], -np.inf)
+    left_below = np.concatenate([edge, left], axis=-1)
+    right_below = np.concatenate([edge, right], axis=-1)[..., ::-1]
+    kth = np.maximum(left_below, right_below).min(axis=-1)
+
+    below = kth[..., None]
+    total = np.where(left < below, left, 0.0).sum(-1)
+    total += np.where(right < below, right, 0.0).sum(-1)
+    under = (left < below).sum(-1) + (right < below).sum(-1)
+    return kth, (total + (count - under) * kth) / count
+
+
+def rolling_risk(
+    returns: np.ndarray,
+    benchmark: np.ndarray,
+    window: int,
+    confidence: float = 0.95,
+    chunk_cells: Optional[int] = None,
+) -> np.ndarray:
+    """
+    RISK_COLUMNS x dates x series from daily returns (dates x series).
+
+    The metrics of a row use the window of returns ending on it; rows whose
+    window is not full of returns (before listing, say) are NaN.
+    """
+    chunk_cells = chunk_cells or settings.RISK_CHUNK_CELLS
+    n_dates, n_series = returns.shape
+    result = np.full((len(RISK_COLUMNS), n_dates, n_series), np.nan)
+    if n_dates < window:
+        return result
+
+    valid = np.isfinite(returns) & np.isfinite(benchmark)[:, None]
+    x = np.where(valid, returns, 0.0)
+    b = np.where(valid, benchmark[:, None], 0.0)
+    full = _window_sums(valid.astype(np.float64), window) == window
+
+    # Moments from cumulative sums
+    s_x, s_b = _window_sums(x, window), _window_sums(b, window)
+    s_xx, s_bb = _window_sums(x * x, window), _window_sums(b * b, window)
+    s_xb = _window_sums(x * b, window)
+    scale = 1.0 / (window - 1)
+    var_x = np.maximum((s_xx - s_x * s_x / window) * scale, 0.0)
+    var_b = (s_bb - s_b * s_b / window) * scale
+    cov = (s_xb - s_x * s_b / window) * scale
+    var_d = np.maximum(var_x + var_b - 2 * cov, 0.0)
+    mean, std = s_x / window, np.sqrt(var_x)
+    tail = 1.0 - confidence
+    z = NormalDist().inv_cdf(tail)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[0] = np.sqrt(var_x * TRADING_DAYS)
+        result[1] = np.where(var_b > 0, cov / var_b, np.nan)
+        result[2] = np.sqrt(var_d * TRADING_DAYS)
+    result[6] = -(mean + z * std)
+    result[7] = -(mean - std * NormalDist().pdf(z) / tail)
+
+    # Log wealth before the first day and after each day
+    growth = np.vstack([np.zeros((1, n_series)), np.cumsum(np.log1p(x), axis=0)])
+    result[3, window - 1 :] = -np.expm1(_rolling_drawdown(growth, window + 1))
+
+    # Historical VaR and CVaR: the worst returns of each window
+    count = max(1, int(np.ceil(tail * window)))
+    step = max(1, chunk_cells // (4 * n_dates * count))
+    for low in range(0, n_series, step):
+        high = min(low + step, n_series)
+        kth, mean_tail = _rolling_smallest(x[:, low:high], window, count)
+        result[4, window - 1 :, low:high] = -kth
+        result[5, window - 1 :, low:high] = -mean_tail
+
+    result[:, ~full] = np.nan
+    return result
+
+
+def price_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """Daily returns of prices, NaN until each series starts."""
+    return prices.ffill().pct_change(fill_method=None)
+
+
+def risk_key(
+    ticker: str, benchmark: str, window: int, confidence: Optional[float] = None
+) -> str:
+    """The risk store series of a ticker's metrics."""
+    confidence = confidence or settings.RISK_CONFIDENCE
+    return f"{ticker}~{benchmark}~{window}d~{confidence:g}"
+
+
+risk_store: Optional[PriceStore] = None
+
+
+def get_risk_store() -> PriceStore:
+    """The process-wide store of ticker risk metrics at RISK_STORE_PATH."""
+    global risk_store
+    if risk_store is None:
+        risk_store = PriceStore(
+            settings.RISK_STORE_PATH,
+            settings.PRICE_STORE_TAIL_ROWS,
+            settings.PRICE_STORE_TAIL_TICKERS,
+            columns=RISK_COLUMNS,
+        )
+    return risk_store
+
+
+def update_risk(
+    tickers: Sequence[str],
+    benchmark: Optional[str] = None,
+    window: Optional[int] = None,
+    prices: Optional[PriceStore] = None,
+    store: Optional[PriceStore] = None,
+) -> int:
+    """
+    Bring the stored risk metrics of tickers up to date; returns rows written.
+
+    Tickers are processed RISK_BATCH_TICKERS at a time, each batch from the
+    earliest day one of its tickers is missing (less a window of returns).
+    """
+    benchmark = benchmark or settings.RISK_BENCHMARK
+    window = window or settings.RISK_WINDOW
+    prices = prices or get_price_store()
+    store = store or get_risk_store()
+    confidence = settings.RISK_CONFIDENCE
+    batch_size = settings.RISK_BATCH_TICKERS
+
+    written = 0
+    for low in range(0, len(tickers), batch_size):
+        batch = list(tickers[low : low + batch_size])
+        keys = [risk_key(ticker, benchmark, window, confidence) for ticker in batch]
+        last = [store.last_date(key) for key in keys]
+        frame = prices.read_many([*batch, benchmark])
+        # Sampled on the benchmark's calendar
+        frame = frame.ffill()[frame.iloc[:, -1].notna()]
+        if len(frame) <= window:
+            continue
+
+        start = 0
+        if all(date is not None for date in last):
+            start = max(0, frame.index.searchsorted(min(last)) - window - 1)
+        frame = frame.iloc[start:]
+        returns = frame.pct_change(fill_method=None).to_numpy()
+        metrics = rolling_risk(returns[:, :-1], returns[:, -1], window, confidence)
+
+        for j, key in enumerate(keys):
+            series = pd.DataFrame(
+                metrics[:, :, j].T, index=frame.index, columns=list(RISK_COLUMNS)
+            )
+            if last[j] is None:
+                series = series[series["volatility"].notna().cummax()]
+            written += store.append(key, series)
+    return written
+
+
+def _stale(ticker: str, benchmark: str, key: str, store: PriceStore) -> bool:
+    """Whether prices were written after the stored metrics."""
+    rows, written_at = store.version(key)
+    if not rows:
+        return True
+    prices = get_price_store()
+    return any(prices.version(name)[1] > written_at for name in (ticker, benchmark))
+
+
+def load_risk(
+    ticker: str,
+    benchmark: Optional[str] = None,
+    window: Optional[int] = None,
+    start: Optional[DateLike] = None,
+    end: Optional[DateLike] = None,
+) -> pd.DataFrame:
+    """Rolling risk metrics of a ticker, updated first if prices moved since."""
+    benchmark = benchmark or settings.RISK_BENCHMARK
+    window = window or settings.RISK_WINDOW
+    store = get_risk_store()
+    key = risk_key(ticker, benchmark, window)
+    if _stale(ticker, benchmark, key, store):
+        update_risk([ticker], benchmark, window, store=store)
+    return store.read(key, start, end)
+
+
+async def portfolio_risk(
+    db: AsyncSession,
+    portfolio_ids: Optional[Sequence[UUID]] = None,
+    benchmark: Optional[str] = None,
+    window: Optional[int] = None,
+    start: Optional[DateLike] = None,
+    end: Optional[DateLike] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Rolling risk metrics of portfolios from their ledger, by portfolio."""
+    benchmark = benchmark or settings.RISK_BENCHMARK
+    window = window or settings.RISK_WINDOW
+    valuation = await value_ledger(db, portfolio_ids, end=end)
+    if valuation.market_value.empty:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No priced trades recorded for these portfolios",
+        )
+
+    def compute() -> Dict[str, pd.DataFrame]:
+        dates = valuation.market_value.index
+        returns = daily_returns(valuation)
+        # Nothing to measure before a portfolio holds anything
+        held = (valuation.market_value != 0).cummax()
+        returns = returns.where(held)
+        reference = price_returns(load_prices([benchmark], end=end))[benchmark]
+        reference = reference.reindex(dates).fillna(0.0).to_numpy()
+        metrics = rolling_risk(
+            returns.to_numpy(), reference, window, settings.RISK_CONFIDENCE
+        )
+        lower = 0 if start is None else dates.searchsorted(pd.Timestamp(start))
+        risk = {}
+        for j, portfolio in enumerate(returns.columns):
+            frame = pd.DataFrame(
+                metrics[:, lower:, j].T,
+                index=dates[lower:],
+                columns=list(RISK_COLUMNS),
+            )
+            risk[portfolio] = frame[frame["volatility"].notna().cummax()]
+        return risk
+
+    return await asyncio.to_thread(compute)
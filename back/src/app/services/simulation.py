@@ -0,0 +1,342 @@
+"""
+Simulation module.
+
+This module projects portfolio values by Monte Carlo simulation:
+- Monthly log returns of the held tickers are drawn from a multivariate
+  normal fitted on SIMULATION_HISTORY_YEARS of month-end prices from the
+  price store: standard normals from a seeded NumPy Generator times the
+  Cholesky factor of the covariance
+- The portfolio is rebalanced to its current weights every month and
+  receives a fixed contribution (a withdrawal when negative); a path that
+  runs out stays out until contributions refill it
+- Paths run in chunks of SIMULATION_CHUNK_PATHS, each with its own stream
+  spawned from the request's seed, so results only depend on the seed and
+  the chunk size; chunks are spread over a pool of SIMULATION_WORKERS
+  processes
+- A chunk reduces the yearly values of its paths to a quantile sketch;
+  sketches merge as chunks complete, so memory is bounded by one chunk
+  whatever the number of paths
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.services.positions import current_positions
+from app.services.price_cache import load_prices
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+MONTHS_PER_YEAR = 12
+# Fewest monthly returns a return model is fitted on
+MIN_MONTHS = 24
+
+
+class ReturnModel:
+    """Monthly log returns of tickers: mean and Cholesky factor of the covariance."""
+
+    __slots__ = ("tickers", "mean", "factor")
+
+    def __init__(self, tickers: List[str], mean: np.ndarray, factor: np.ndarray):
+        self.tickers = tickers
+        self.mean = mean
+        self.factor = factor
+
+
+class Projection:
+    """Percentile bands of simulated values by year, and path outcomes."""
+
+    __slots__ = ("percentiles", "goal_probability", "depleted_probability", "seed")
+
+    def __init__(
+        self,
+        percentiles: pd.DataFrame,
+        goal_probability: Optional[float],
+        depleted_probability: float,
+        seed: int,
+    ):
+        # years x PERCENTILES; year 0 is the initial value
+        self.percentiles = percentiles
+        # Share of paths ending at or above the goal
+        self.goal_probability = goal_probability
+        # Share of paths running out at some point
+        self.depleted_probability = depleted_probability
+        self.seed = seed
+
+
+class QuantileSketch:
+    """
+    Mergeable summary of the distribution of each row of values.
+
+    A sketch keeps the quantiles of each row at evenly spaced levels, i.e.
+    a piecewise linear CDF, and the number of values it stands for. Two
+    sketches merge by weighting their CDFs, exact at the union of their
+    points, then keeping the quantiles of the result again.
+    """
+
+    __slots__ = ("points", "weight")
+
+    def __init__(self, points: np.ndarray, weight: int):
+        self.points = points
+        self.weight = weight
+
+    @classmethod
+    def of(cls, values: np.ndarray, size: int) -> "QuantileSketch":
+        """Sketch of rows x values, keeping size quantiles per row."""
+        points = np.quantile(values, np.linspace(0, 1, size), axis=1).T
+        return cls(np.ascontiguousarray(points), values.shape[1])
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        size = self.points.shape[1]
+        levels = np.linspace(0, 1, size)
+        total = self.weight + other.weight
+        merged = np.empty_like(self.points)
+        for row, (left, right) in enumerate(zip(self.points, other.points)):
+            knots = np.sort(np.concatenate([left, right]))
+            cdf = (
+                self.weight * _cdf(left, knots) + other.weight * _cdf(right, knots)
+            ) / total
+            merged[row] = _inverse(knots, cdf, levels)
+        return QuantileSketch(merged, total)
+
+    def quantiles(self, levels: Sequence[float]) -> np.ndarray:
+        """Rows x levels, levels in [0, 1]."""
+        size = self.points.shape[1]
+        positions = np.asarray(levels) * (size - 1)
+        return np.stack(
+            [np.interp(positions, np.arange(size), row) for row in self.points]
+        )
+
+
+def _cdf(points: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """The share of values at or below x, for quantiles at evenly spaced levels."""
+    size = len(points)
+    above = np.searchsorted(points, x, "right")
+    lower = np.clip(above - 1, 0, size - 1)
+    upper = np.clip(above, 0, size - 1)
+    gap = points[upper] - points[lower]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(gap > 0, (x - points[lower]) / gap, 0.0)
+    position = np.where(above == size, size - 1, lower + fraction)
+    return np.where(above == 0, 0.0, position / (size - 1))
+
+
+def _inverse(knots: np.ndarray, cdf: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """The smallest x where the piecewise linear CDF reaches each level."""
+    upper = np.clip(np.searchsorted(cdf, levels, "left"), 0, len(knots) - 1)
+    lower = np.maximum(upper - 1, 0)
+    rise = cdf[upper] - cdf[lower]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(rise > 0, (levels - cdf[lower]) / rise, 1.0)
+    return knots[lower] + np.clip(fraction, 0.0, 1.0) * (knots[upper] - knots[lower])
+
+
+def cholesky_factor(covariance: np.ndarray) -> np.ndarray:
+    """
+    Lower triangular L with L @ L.T == covariance.
+
+    A covariance estimated from fewer months than tickers, or of tickers
+    moving together, is singular; its factor then comes from the
+    eigendecomposition, negative rounding errors set to 0.
+    """
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(covariance)
+        return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+def fit_returns(prices: pd.DataFrame) -> ReturnModel:
+    """Return model of dates x tickers prices, from their month-end closes."""
+    monthly = prices.ffill().resample("ME").last()
+    returns = np.log(monthly).diff().dropna(how="any")
+    if len(returns) < MIN_MONTHS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Not enough price history for {', '.join(prices.columns)}",
+        )
+    covariance = np.atleast_2d(np.cov(returns.to_numpy(), rowvar=False))
+    return ReturnModel(
+        list(prices.columns), returns.mean().to_numpy(), cholesky_factor(covariance)
+    )
+
+
+def ticker_model(tickers: Sequence[str]) -> Tuple[ReturnModel, np.ndarray]:
+    """
+    Return model of tickers over SIMULATION_HISTORY_YEARS of the price
+    store, and their last prices.
+    """
+    prices = load_prices(tickers)
+    if not prices.empty:
+        start = prices.index[-1] - pd.DateOffset(
+            years=settings.SIMULATION_HISTORY_YEARS
+        )
+        prices = prices[prices.index > start]
+    return fit_returns(prices), prices.ffill().iloc[-1].to_numpy()
+
+
+def simulate_chunk(
+    seed: np.random.SeedSequence,
+    paths: int,
+    model: ReturnModel,
+    weights: np.ndarray,
+    initial: float,
+    contribution: float,
+    years: int,
+    goal: Optional[float],
+    sketch_points: int,
+) -> Tuple[QuantileSketch, int, int]:
+    """
+    Simulate paths month by month; returns the sketch of their yearly
+    values, how many reach the goal and how many run out.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.full(paths, float(initial))
+    yearly = np.empty((years + 1, paths))
+    yearly[0] = values
+    depleted = np.zeros(paths, dtype=bool)
+    for month in range(1, years * MONTHS_PER_YEAR + 1):
+        draws = rng.standard_normal((paths, len(weights))) @ model.factor.T
+        growth = np.exp(draws + model.mean) @ weights
+        values = np.maximum(values * growth + contribution, 0.0)
+        depleted |= values == 0
+        if month % MONTHS_PER_YEAR == 0:
+            yearly[month // MONTHS_PER_YEAR] = values
+    reached = int((values >= goal).sum()) if goal is not None else 0
+    return QuantileSketch.of(yearly, sketch_points), reached, int(depleted.sum())
+
+
+simulation_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_simulation_pool() -> Optional[Executor]:
+    """
+    The process-wide pool of SIMULATION_WORKERS processes, None (threads)
+    when it is 0.
+
+    Workers are spawned rather than forked: the API process runs threads
+    (event loop, scheduler) that a fork would copy mid-flight.
+    """
+    global simulation_pool
+    if simulation_pool is None and settings.SIMULATION_WORKERS:
+        simulation_pool = ProcessPoolExecutor(
+            settings.SIMULATION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return simulation_pool
+
+
+def close_simulation_pool():
+    global simulation_pool
+    if simulation_pool is not None:
+        simulation_pool.shutdown(wait=False, cancel_futures=True)
+        simulation_pool = None
+
+
+async def simulate(
+    model: ReturnModel,
+    weights: np.ndarray,
+    initial: float,
+    contribution: float = 0.0,
+    years: int = 30,
+    paths: int = 10_000,
+    goal: Optional[float] = None,
+    seed: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Projection:
+    """
+    Project a portfolio over years with paths simulated in chunks.
+
+    Chunks run on executor (the simulation pool by default) and their
+    sketches are merged in chunk order, so a seed gives the same bands
+    whatever the order chunks complete in.
+    """
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    executor = executor or get_simulation_pool()
+    chunk = settings.SIMULATION_CHUNK_PATHS
+    sizes = [min(chunk, paths - low) for low in range(0, paths, chunk)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    loop = asyncio.get_running_loop()
+    run = partial(
+        simulate_chunk,
+        model=model,
+        weights=weights,
+        initial=initial,
+        contribution=contribution,
+        years=years,
+        goal=goal,
+        sketch_points=settings.SIMULATION_SKETCH_POINTS,
+    )
+    futures = [
+        loop.run_in_executor(executor, partial(run, stream, size))
+        for stream, size in zip(streams, sizes)
+    ]
+    sketch, reached, depleted = None, 0, 0
+    try:
+        for future in futures:
+            part, part_reached, part_depleted = await future
+            sketch = part if sketch is None else sketch.merge(part)
+            reached += part_reached
+            depleted += part_depleted
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory): start a new pool next time
+        if executor is simulation_pool:
+            close_simulation_pool()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+    percentiles = pd.DataFrame(
+        sketch.quantiles([p / 100 for p in PERCENTILES]),
+        index=pd.RangeIndex(years + 1, name="year"),
+        columns=[f"p{p}" for p in PERCENTILES],
+    )
+    return Projection(
+        percentiles=percentiles,
+        goal_probability=reached / paths if goal is not None else None,
+        depleted_probability=depleted / paths,
+        seed=seed,
+    )
+
+
+async def portfolio_projection(
+    db: AsyncSession,
+    portfolio_id: UUID,
+    contribution: float = 0.0,
+    years: int = 30,
+    paths: int = 10_000,
+    goal: Optional[float] = None,
+    seed: Optional[int] = None,
+) -> Projection:
+    """Projection of a portfolio's current positions at their last prices."""
+    positions = await current_positions(db, portfolio_id)
+    if not positions:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No open positions in this portfolio",
+        )
+
+    tickers = [position.ticker for position in positions]
+    model, last = await asyncio.to_thread(ticker_model, tickers)
+    values = np.array([position.quantity for position in positions]) * last
+    initial = float(values.sum())
+    if initial <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Portfolio has no positive market value to project",
+        )
+    return await simulate(
+        model, values / initial, initial, contribution, years, paths, goal, seed
+    )
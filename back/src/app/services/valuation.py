@@ -0,0 +1,222 @@
+"""
+Valuation module.
+
+This module values portfolios from their ledger against the price store:
+- Trades are ledger entries with change_type "trade" and details
+  {"ticker": str, "quantity": float, "price": float (optional)}; quantity
+  is signed (negative sells) and price defaults to the day's close
+- Holdings form a dates x positions array, a position being a (portfolio,
+  ticker) pair the ledger trades: quantities are scattered onto their
+  trading day and accumulated along the dates axis. Only traded pairs are
+  materialized, not the full portfolios x tickers grid
+- Position values are holdings times the gathered price columns, summed
+  into portfolios; daily P&L is the change in market value less the cash
+  paid in trades
+- Positions are processed in chunks of at most VALUATION_CHUNK_CELLS
+  holdings cells, so memory stays bounded whatever the number of portfolios
+"""
+
+import asyncio
+import logging
+from typing import Iterable, List, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.portfolio_ledger import TRADE, PortfolioLedger
+from app.services.price_cache import load_prices
+from app.services.price_store import DateLike
+
+logger = logging.getLogger(__name__)
+
+TRADE_COLUMNS = ["portfolio_id", "date", "ticker", "quantity", "price"]
+
+
+class Valuation:
+    """Daily market value and P&L per portfolio, and weights on the last day."""
+
+    __slots__ = ("market_value", "pnl", "flows", "weights")
+
+    def __init__(
+        self,
+        market_value: pd.DataFrame,
+        pnl: pd.DataFrame,
+        flows: pd.DataFrame,
+        weights: pd.DataFrame,
+    ):
+        # dates x portfolios
+        self.market_value = market_value
+        self.pnl = pnl
+        self.flows = flows
+        # portfolios x tickers
+        self.weights = weights
+
+
+def trades_frame(entries: Iterable[PortfolioLedger]) -> pd.DataFrame:
+    """Trades of ledger entries as a frame with TRADE_COLUMNS."""
+    rows = []
+    for entry in entries:
+        if entry.change_type != TRADE:
+            continue
+        details = entry.details or {}
+        rows.append(
+            (
+                entry.portfolio_id,
+                entry.timestamp,
+                str(details["ticker"]).upper(),
+                float(details["quantity"]),
+                float(details.get("price", np.nan)),
+            )
+        )
+    return pd.DataFrame(rows, columns=TRADE_COLUMNS)
+
+
+def value_portfolios(
+    trades: pd.DataFrame,
+    prices: pd.DataFrame,
+    portfolios: Optional[Sequence] = None,
+    chunk_cells: Optional[int] = None,
+) -> Valuation:
+    """
+    Value portfolios over the dates of prices (dates x tickers).
+
+    Trades dated before the first price date are part of the opening
+    holdings, valued at the first prices; trades on non-trading days count
+    on the next trading day; trades after the last date are ignored.
+    """
+    chunk_cells = chunk_cells or settings.VALUATION_CHUNK_CELLS
+    if portfolios is None:
+        portfolios = pd.unique(trades["portfolio_id"])
+    portfolios = list(portfolios)
+    tickers = list(prices.columns)
+    dates = prices.index
+    n_dates, n_tickers = len(dates), len(tickers)
+
+    if not n_dates:
+        empty = pd.DataFrame(0.0, index=dates, columns=portfolios)
+        return Valuation(
+            market_value=empty,
+            pnl=empty.copy(),
+            flows=empty.copy(),
+            weights=pd.DataFrame(0.0, index=portfolios, columns=tickers),
+        )
+
+    # Carry the last price over gaps; nothing is worth anything before its first
+    values = prices.ffill().fillna(0.0).to_numpy(dtype=np.float64)
+
+    ticker_index = pd.Index(tickers).get_indexer(trades["ticker"])
+    portfolio_index = pd.Index(portfolios).get_indexer(trades["portfolio_id"])
+    date_ns = pd.DatetimeIndex(trades["date"])
+    if date_ns.tz is not None:
+        date_ns = date_ns.tz_convert(None)
+    date_index = dates.searchsorted(date_ns.normalize())
+    known = (ticker_index >= 0) & (portfolio_index >= 0) & (date_index < n_dates)
+    if (ticker_index < 0).any():
+        missing = sorted(set(trades["ticker"][ticker_index < 0]))
+        logger.warning(f"No prices for traded tickers, ignored: {missing[:20]}")
+
+    ticker_index = ticker_index[known]
+    portfolio_index = portfolio_index[known]
+    date_index = date_index[known]
+    quantity = trades["quantity"].to_numpy(dtype=np.float64)[known]
+    price = trades["price"].to_numpy(dtype=np.float64)[known]
+    # Opening holdings and unpriced trades are bought at the close
+    before = pd.DatetimeIndex(date_ns[known]).normalize() < dates[0]
+    close = values[date_index, ticker_index]
+    price = np.where(before | np.isnan(price), close, price)
+
+    n_portfolios = len(portfolios)
+    cash = quantity * price
+    flows = np.bincount(
+        date_index * n_portfolios + portfolio_index,
+        weights=cash,
+        minlength=n_dates * n_portfolios,
+    ).reshape(n_dates, n_portfolios)
+
+    # Positions: the (portfolio, ticker) pairs the trades touch, in that order
+    pairs, pair_of_trade = np.unique(
+        portfolio_index * n_tickers + ticker_index, return_inverse=True
+    )
+    pair_portfolio, pair_ticker = np.divmod(pairs, n_tickers)
+    order = np.argsort(pair_of_trade, kind="stable")
+    pair_of_trade, date_index, quantity = (
+        pair_of_trade[order],
+        date_index[order],
+        quantity[order],
+    )
+
+    market_value = np.zeros((n_dates, n_portfolios))
+    last_value = np.empty(len(pairs))
+    chunk = max(1, chunk_cells // max(1, n_dates))
+    for low in range(0, len(pairs), chunk):
+        high = min(low + chunk, len(pairs))
+        size = high - low
+        first, last = np.searchsorted(pair_of_trade, [low, high])
+
+        # Scatter quantities onto (date, position), then accumulate over dates
+        holdings = np.bincount(
+            date_index[first:last] * size + pair_of_trade[first:last] - low,
+            weights=quantity[first:last],
+            minlength=n_dates * size,
+        ).reshape(n_dates, size)
+        np.cumsum(holdings, axis=0, out=holdings)
+        holdings *= values[:, pair_ticker[low:high]]
+        last_value[low:high] = holdings[-1]
+
+        # Sum positions into their portfolios (contiguous runs of columns)
+        owners = pair_portfolio[low:high]
+        starts = np.flatnonzero(np.diff(owners, prepend=-1))
+        market_value[:, owners[starts]] += np.add.reduceat(holdings, starts, axis=1)
+
+    weights = np.zeros((n_portfolios, n_tickers))
+    total = market_value[-1, pair_portfolio]
+    # Portfolios worth nothing (closed, or hedged to zero) have no weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights[pair_portfolio, pair_ticker] = np.where(
+            total != 0, last_value / total, 0.0
+        )
+
+    pnl = np.diff(market_value, axis=0, prepend=0.0) - flows
+    return Valuation(
+        market_value=pd.DataFrame(market_value, index=dates, columns=portfolios),
+        pnl=pd.DataFrame(pnl, index=dates, columns=portfolios),
+        flows=pd.DataFrame(flows, index=dates, columns=portfolios),
+        weights=pd.DataFrame(weights, index=portfolios, columns=tickers),
+    )
+
+
+async def load_trades(
+    db: AsyncSession,
+    portfolio_ids: Optional[Sequence[UUID]] = None,
+    end: Optional[DateLike] = None,
+) -> pd.DataFrame:
+    """Trades recorded in the ledger, optionally for some portfolios only."""
+    statement = select(PortfolioLedger).where(PortfolioLedger.change_type == TRADE)
+    if portfolio_ids is not None:
+        statement = statement.where(PortfolioLedger.portfolio_id.in_(portfolio_ids))
+    if end is not None:
+        statement = statement.where(PortfolioLedger.timestamp <= pd.Timestamp(end))
+    result = await db.exec(statement)
+    return trades_frame(result.all())
+
+
+async def value_ledger(
+    db: AsyncSession,
+    portfolio_ids: Optional[Sequence[UUID]] = None,
+    start: Optional[DateLike] = None,
+    end: Optional[DateLike] = None,
+) -> Valuation:
+    """Value portfolios from the ledger against the cached price history."""
+    trades = await load_trades(db, portfolio_ids, end)
+    tickers: List[str] = sorted(trades["ticker"].unique())
+
+    def value() -> Valuation:
+        prices = load_prices(tickers, start, end)
+        return value_portfolios(trades, prices, portfolio_ids)
+
+    # Reading files and crunching arrays: keep it off the event loop
+    return await asyncio.to_thread(value)
@@ -0,0 +1,180 @@
+"""
+Admission control module.
+
+This module sheds load in front of GenericRouter before a request reaches
+get_session:
+- Requests are grouped in route classes (read, write, export), each with
+  its own concurrency limit
+- Limits adapt to observed latency with a gradient rule: they grow while
+  latency stays near its long-term baseline and shrink as it rises
+- Pool pressure (the share of connections checked out) and pool checkout
+  timeouts cut the limit multiplicatively (AIMD's decrease step)
+- Requests over the limit are rejected at once with 503 and Retry-After
+  instead of queueing until DB_POOL_TIMEOUT
+- Streamed exports hold their slot until the last chunk is sent
+"""
+
+import math
+import time
+from typing import Dict
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.metrics.admission import track_admission, track_admission_state
+
+# Multiplicative decrease on overload signals
+BACKOFF = 0.9
+# Latency may exceed the baseline by this factor before limits shrink
+TOLERANCE = 1.5
+# Samples averaged into the long-term latency baseline
+LONG_WINDOW = 600
+# Weight of each new limit estimate
+SMOOTHING = 0.2
+
+
+def route_class(request: Request) -> str:
+    """The class of a GenericRouter route: export, read or write."""
+    if request.url.path.endswith("/export"):
+        return "export"
+    if request.method in ("GET", "HEAD") or request.url.path.endswith("/search"):
+        return "read"
+    return "write"
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit for one route class.
+
+    A gradient limiter in the style of Netflix's concurrency-limits: the
+    ratio of the long-term latency baseline to the latest sample scales the
+    limit down under queueing, and a sqrt(limit) allowance lets it probe
+    upwards while latency holds.
+    """
+
+    def __init__(self, name: str, initial: float, minimum: float, maximum: float):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.in_flight = 0
+        self.baseline = 0.0
+
+    def try_acquire(self) -> bool:
+        admitted = self.in_flight < int(self.limit)
+        if admitted:
+            self.in_flight += 1
+        track_admission(self.name, admitted)
+        track_admission_state(self.name, self.limit, self.in_flight)
+        return admitted
+
+    def release(self, latency: float, pool_pressure: float, dropped: bool) -> None:
+        """Return a slot and feed the request's outcome to the limit."""
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        if dropped or pool_pressure >= settings.ADMISSION_POOL_PRESSURE:
+            self.limit = max(self.minimum, self.limit * BACKOFF)
+        elif latency > 0:
+            self._update(latency, in_flight)
+        track_admission_state(self.name, self.limit, self.in_flight)
+
+    def _update(self, latency: float, in_flight: int) -> None:
+        if not self.baseline:
+            self.baseline = latency
+        self.baseline += (latency - self.baseline) / LONG_WINDOW
+        # Let the baseline follow a lasting drop in latency
+        if self.baseline / latency > 2:
+            self.baseline *= 0.95
+
+        # An idle class tells us nothing about how much it could take
+        if in_flight < self.limit / 2:
+            return
+        gradient = max(0.5, min(1.0, TOLERANCE * self.baseline / latency))
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - SMOOTHING) + estimate * SMOOTHING
+        self.limit = max(self.minimum, min(self.maximum, limit))
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: roughly one drain of the queue."""
+        seconds = self.baseline * self.in_flight / max(self.limit, 1.0)
+        return max(1, min(settings.ADMISSION_RETRY_AFTER_MAX, math.ceil(seconds)))
+
+
+class AdmissionController:
+    """Adaptive limits per route class, applied as a router dependency."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.limits: Dict[str, AdaptiveLimit] = {}
+
+    def limit_for(self, route_class: str) -> AdaptiveLimit:
+        limit = self.limits.get(route_class)
+        if limit is None:
+            limit = self.limits[route_class] = AdaptiveLimit(
+                route_class,
+                settings.ADMISSION_INITIAL_LIMIT,
+                settings.ADMISSION_MIN_LIMIT,
+                settings.ADMISSION_MAX_LIMIT,
+            )
+        return limit
+
+    def pool_pressure(self) -> float:
+        """Share of the pool's connections currently checked out."""
+        pool = self.engine.sync_engine.pool
+        if not hasattr(pool, "checkedout"):
+            return 0.0
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        return pool.checkedout() / capacity if capacity else 0.0
+
+    def acquire(self, route_class: str) -> "Slot":
+        """Take a slot of a route class, or reject the request with 503."""
+        limit = self.limit_for(route_class)
+        if not limit.try_acquire():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, retry later",
+                headers={"Retry-After": str(limit.retry_after())},
+            )
+        return Slot(self, limit)
+
+    async def __call__(self, request: Request):
+        request_class = route_class(request)
+        # A dependency exits before a streamed body is sent, so exports take
+        # their slot in the route and release it when the stream ends
+        if not settings.ADMISSION_ENABLED or request_class == "export":
+            yield
+            return
+
+        slot = self.acquire(request_class)
+        dropped = False
+        try:
+            yield
+        except PoolTimeoutError:
+            # Waited DB_POOL_TIMEOUT for a connection: the clearest overload signal
+            dropped = True
+            raise
+        finally:
+            slot.release(dropped)
+
+
+class Slot:
+    """An admitted request's share of its route class limit."""
+
+    __slots__ = ("controller", "limit", "start", "released")
+
+    def __init__(self, controller: AdmissionController, limit: AdaptiveLimit):
+        self.controller = controller
+        self.limit = limit
+        self.start = time.perf_counter()
+        self.released = False
+
+    def release(self, dropped: bool = False) -> None:
+        """Return the slot; only the first call counts."""
+        if self.released:
+            return
+        self.released = True
+        self.limit.release(
+            time.perf_counter() - self.start, self.controller.pool_pressure(), dropped
+        )
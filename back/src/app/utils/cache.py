@@ -0,0 +1,239 @@
+"""
+Response cache module.
+
+This module provides in-process caching for GenericRouter reads:
+- Per-table version counters, bumped by every GenericService write
+- An LRU response cache whose keys embed the table version, so a write
+  invalidates every cached page of the table at once
+- A single-flight helper so concurrent misses on a key share one build,
+  also used to coalesce identical concurrent GETs
+- Lazily rendered item pages, whose validators are known before the body
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.metrics.cache import (
+    track_cache_entries,
+    track_cache_request,
+    track_single_flight_call,
+    track_single_flight_wait,
+    track_version_bump,
+)
+from app.utils.shared_cache import invalidate_shared
+
+
+class TableVersions:
+    """
+    Monotonic per-table version counters.
+
+    Tokens combine a per-process epoch with the counter, so versions handed
+    out before a restart are never mistaken for current ones.
+    """
+
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self._versions: Dict[str, int] = {}
+
+    def get(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def token(self, table: str) -> str:
+        """Opaque version token for a table, usable in cache keys and ETags."""
+        return f"{self.epoch}.{self._versions.get(table, 0)}"
+
+    def bump(self, table: str) -> int:
+        """Record a write to a table and return its new version."""
+        version = self._versions.get(table, 0) + 1
+        self._versions[table] = version
+        track_version_bump(table)
+        return version
+
+    def bump_all(self) -> None:
+        """Invalidate every table, e.g. after invalidation events were lost."""
+        # A new epoch changes every token, including tables never written here
+        self.epoch = os.urandom(4).hex()
+
+
+class CachedPage:
+    """A rendered list page with its validators."""
+
+    __slots__ = ("body", "etag", "last_modified", "total")
+
+    def __init__(
+        self,
+        body: bytes,
+        etag: str,
+        last_modified: Optional[datetime] = None,
+        total: Optional[int] = None,
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.total = total
+
+
+class LazyPage:
+    """
+    A row's validators, with its body rendered on first use.
+
+    Requests answered 304 never pay for serialization; requests sharing the
+    page through a SingleFlight render the body at most once between them.
+    """
+
+    __slots__ = ("etag", "last_modified", "_render", "_body")
+
+    def __init__(
+        self,
+        etag: str,
+        last_modified: Optional[datetime],
+        render: Callable[[], bytes],
+    ):
+        self.etag = etag
+        self.last_modified = last_modified
+        self._render = render
+        self._body: Optional[bytes] = None
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = self._render()
+            self._render = None
+        return self._body
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered pages, keyed by (table, version, request key).
+
+    While max_age is set (the invalidation bus is down), entries older than
+    max_age seconds are treated as misses.
+    """
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_age: Optional[float] = None
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], Tuple[float, CachedPage]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, table: str, version: str, key: Hashable) -> Optional[CachedPage]:
+        item = self._entries.get((table, version, key))
+        if item is not None and self.max_age is not None:
+            if time.monotonic() - item[0] > self.max_age:
+                del self._entries[(table, version, key)]
+                item = None
+        if item is None:
+            track_cache_request(self.name, table, "miss")
+            return None
+        self._entries.move_to_end((table, version, key))
+        track_cache_request(self.name, table, "hit")
+        return item[1]
+
+    def set(self, table: str, version: str, key: Hashable, entry: CachedPage) -> None:
+        self._entries[(table, version, key)] = (time.monotonic(), entry)
+        self._entries.move_to_end((table, version, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        track_cache_entries(self.name, len(self._entries))
+
+    def invalidate(self, table: str) -> int:
+        """Drop every entry of a table (old versions would otherwise age out)."""
+        stale = [key for key in self._entries if key[0] == table]
+        for key in stale:
+            del self._entries[key]
+        track_cache_entries(self.name, len(self._entries))
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        track_cache_entries(self.name, 0)
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+
+    The first caller runs the function; callers arriving while it is in
+    flight await the same result (or exception) instead of repeating it. If
+    the first caller is cancelled, one of the waiters takes over the call.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    @property
+    def coalesce_ratio(self) -> float:
+        """Share of calls that were answered by another call's computation."""
+        total = self.executed + self.shared
+        return self.shared / total if total else 0.0
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            track_single_flight_wait(self.name)
+            track_single_flight_call(self.name, True, self.coalesce_ratio)
+            try:
+                # shield: a cancelled waiter must not cancel the shared call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            # The caller running it was cancelled: the first waiter back runs
+            # the function, the others wait for it
+            return await self.do(key, fn)
+
+        self.executed += 1
+        track_single_flight_call(self.name, False, self.coalesce_ratio)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+table_versions = TableVersions()
+list_cache = ResponseCache("list", settings.CACHE_MAX_ENTRIES)
+list_flights = SingleFlight("list")
+
+
+def evict(table: Optional[str], keys: Sequence[str] = ()) -> None:
+    """Invalidation bus handler: drop cached data for a table written elsewhere."""
+    invalidate_shared(table, keys)
+    if table is None:
+        table_versions.bump_all()
+        list_cache.clear()
+        return
+    table_versions.bump(table)
+    list_cache.invalidate(table)
+
+
+def set_fallback_ttl(connected: bool) -> None:
+    """Invalidation bus state handler: expire entries by age while it is down."""
+    list_cache.max_age = None if connected else settings.CACHE_FALLBACK_TTL
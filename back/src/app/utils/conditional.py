@@ -0,0 +1,108 @@
+"""
+Conditional request module.
+
+This module provides HTTP validators for GenericRouter reads:
+- Strong ETags for single rows (id + modified_at) and for list pages
+  (a table version token + the request's query string)
+- Last-Modified headers
+- If-None-Match / If-Modified-Since evaluation and 304 responses; list
+  pages are evaluated on their ETag alone, since deleting rows can leave
+  their Last-Modified unchanged
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from urllib.parse import urlencode
+from uuid import UUID
+
+from fastapi import Request, Response, status
+
+# Authenticated data may be stored by the client but must be revalidated
+CACHE_CONTROL = "private, no-cache"
+
+
+def _digest(*parts: Any) -> str:
+    payload = "|".join(str(part) for part in parts).encode()
+    return '"' + hashlib.blake2b(payload, digest_size=16).hexdigest() + '"'
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # SQLite hands timestamps back naive; they are stored in UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def item_etag(obj_id: UUID, modified_at: datetime) -> str:
+    """Strong ETag for a single row."""
+    return _digest(obj_id, _as_utc(modified_at).isoformat())
+
+
+def list_etag(version: Any, query: str) -> str:
+    """Strong ETag for a list page: the table version plus the request query."""
+    return _digest(version, query)
+
+
+def normalized_query(request: Request) -> str:
+    """The request's query parameters in a canonical order."""
+    return urlencode(sorted(request.query_params.multi_items()))
+
+
+def http_date(moment: datetime) -> str:
+    """Format a timestamp as an HTTP date."""
+    return format_datetime(_as_utc(moment), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison function (RFC 9110, 13.1.2)
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """Evaluate the request's conditional headers against the validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def set_validators(
+    response: Response, etag: str, last_modified: Optional[datetime] = None
+) -> Response:
+    """Attach ETag, Last-Modified and Cache-Control headers to a response."""
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+def not_modified_response(
+    etag: str, last_modified: Optional[datetime] = None
+) -> Response:
+    """Build an empty 304 response carrying the validators."""
+    return set_validators(
+        Response(status_code=status.HTTP_304_NOT_MODIFIED), etag, last_modified
+    )
@@ -0,0 +1,225 @@
+"""
+Idempotency module.
+
+This module makes GenericRouter writes safe to retry:
+- The first request with a given Idempotency-Key claims the key in the
+  idempotency_record table and runs; its successful response is stored
+- Retries with the same key are answered from the stored response without
+  running the write again (no duplicate rows or audit entries)
+- Duplicates arriving while the first request is still running wait for it:
+  on the same worker through a shared future, on other workers by polling
+- A key reused for a different request is rejected with 422
+- Failed executions release the key so the client can retry; stored
+  responses expire after IDEMPOTENCY_TTL seconds
+- An in-flight claim only holds its key for IDEMPOTENCY_LOCK_TTL seconds,
+  so a key claimed by a worker that crashed (or could not store the
+  response) frees up quickly instead of blocking retries for a day
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.metrics.idempotency import track_idempotency_wait, track_idempotent_request
+from app.models.idempotency import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+async def fingerprint(request: Request) -> str:
+    """Hash of what makes a request the same request."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(request.method.encode())
+    digest.update(request.url.path.encode())
+    digest.update(request.url.query.encode())
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Stores first responses per (user, key) and coordinates duplicates."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self._in_flight: Dict[Tuple[UUID, str], asyncio.Future] = {}
+
+    async def _lookup(self, user_id: UUID, key: str) -> Optional[IdempotencyRecord]:
+        """The live record holding a key, if any; expired records are dropped."""
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            record = await db.get(IdempotencyRecord, (user_id, key))
+            if record is None or record.expires_at >= time.time():
+                return record
+
+            # End the read first, so SQLite can take the write lock
+            await db.rollback()
+            await db.exec(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.user_id == user_id,
+                    IdempotencyRecord.key == key,
+                    IdempotencyRecord.expires_at < time.time(),
+                )
+            )
+            await db.commit()
+            return None
+
+    async def _claim(self, user_id: UUID, key: str, request_hash: str) -> bool:
+        """Insert the in-flight record for a key; False if another request won."""
+        async with AsyncSession(self.engine) as db:
+            db.add(
+                IdempotencyRecord(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=request_hash,
+                    expires_at=time.time() + settings.IDEMPOTENCY_LOCK_TTL,
+                )
+            )
+            try:
+                await db.commit()
+                return True
+            except IntegrityError:
+                await db.rollback()
+                return False
+
+    async def _complete(self, user_id: UUID, key: str, response: Response) -> None:
+        async with AsyncSession(self.engine) as db:
+            # A single UPDATE: no read transaction to upgrade under contention
+            await db.exec(
+                update(IdempotencyRecord)
+                .where(
+                    IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key
+                )
+                .values(
+                    status_code=response.status_code,
+                    media_type=response.media_type,
+                    body=bytes(response.body),
+                    expires_at=time.time() + settings.IDEMPOTENCY_TTL,
+                )
+            )
+            await db.commit()
+
+    async def _release(self, user_id: UUID, key: str) -> None:
+        try:
+            async with AsyncSession(self.engine) as db:
+                await db.exec(
+                    delete(IdempotencyRecord).where(
+                        IdempotencyRecord.user_id == user_id,
+                        IdempotencyRecord.key == key,
+                        IdempotencyRecord.status_code.is_(None),
+                    )
+                )
+                await db.commit()
+        except Exception as e:
+            # The claim expires after IDEMPOTENCY_LOCK_TTL; until then retries
+            # wait and time out
+            logger.warning(f"Could not release idempotency key {key}: {e}")
+
+    async def _wait(self, user_id: UUID, key: str, timeout: float) -> None:
+        """Wait a little for the execution holding a key."""
+        future = self._in_flight.get((user_id, key))
+        if future is None:
+            # Running on another worker: poll the table
+            await asyncio.sleep(min(settings.IDEMPOTENCY_POLL_INTERVAL, timeout))
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(
+        self,
+        request: Request,
+        user_id: UUID,
+        key: str,
+        target_type: str,
+        execute: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """Run a write once per key and answer every retry with its response."""
+        if not key or len(key) > settings.IDEMPOTENCY_MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    "Idempotency-Key must be 1 to "
+                    f"{settings.IDEMPOTENCY_MAX_KEY_LENGTH} characters"
+                ),
+            )
+        request_hash = await fingerprint(request)
+        started = time.monotonic()
+        deadline = started + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        waited = False
+        while True:
+            # Read first: retries of finished requests never take a write lock
+            record = await self._lookup(user_id, key)
+            if record is None:
+                if await self._claim(user_id, key, request_hash):
+                    break
+                # Another request claimed it first: look again
+                continue
+            if record.fingerprint != request_hash:
+                track_idempotent_request(target_type, "mismatch")
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used for a different request",
+                )
+            if record.status_code is not None:
+                if waited:
+                    track_idempotency_wait(target_type, time.monotonic() - started)
+                track_idempotent_request(target_type, "replayed")
+                return Response(
+                    record.body,
+                    status_code=record.status_code,
+                    media_type=record.media_type,
+                    headers={REPLAYED_HEADER: "true"},
+                )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                track_idempotent_request(target_type, "conflict")
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                )
+            if not waited:
+                waited = True
+                track_idempotent_request(target_type, "waited")
+            await self._wait(user_id, key, remaining)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[(user_id, key)] = future
+        try:
+            try:
+                response = await execute()
+            except BaseException:
+                await self._release(user_id, key)
+                raise
+            if 200 <= response.status_code < 300:
+                await self._complete(user_id, key, response)
+            else:
+                await self._release(user_id, key)
+            track_idempotent_request(target_type, "executed")
+            return response
+        finally:
+            # Wake local duplicates; they read the outcome from the table
+            del self._in_flight[(user_id, key)]
+            future.set_result(None)
+
+
+async def purge_expired(engine: AsyncEngine) -> int:
+    """Delete expired idempotency records."""
+    async with AsyncSession(engine) as db:
+        result = await db.exec(
+            delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < time.time())
+        )
+        await db.commit()
+        return result.rowcount
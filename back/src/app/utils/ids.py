@@ -0,0 +1,62 @@
+"""
+Identifier module.
+
+This module provides time-ordered UUIDv7 identifiers (RFC 9562):
+- 48-bit Unix millisecond timestamp, so ids sort by creation time
+- A 12-bit counter keeping ids monotonic within a millisecond
+- 62 random bits, so ids stay unguessable across processes
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from uuid import UUID
+
+_VERSION = 0x7 << 76
+_VARIANT = 0b10 << 62
+_COUNTER_MAX = 0xFFF
+_RANDOM_MASK = (1 << 62) - 1
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def _build(ms: int, counter: int) -> UUID:
+    rand_b = int.from_bytes(os.urandom(8), "big") & _RANDOM_MASK
+    return UUID(int=(ms << 80) | _VERSION | (counter << 64) | _VARIANT | rand_b)
+
+
+def uuid7() -> UUID:
+    """Generate a UUIDv7, strictly increasing within this process."""
+    global _last_ms, _counter
+    ms = time.time_ns() // 1_000_000
+    with _lock:
+        if ms > _last_ms:
+            _last_ms = ms
+            # Start low in the counter range to leave room for a burst
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        elif _counter < _COUNTER_MAX:
+            _counter += 1
+        else:
+            # Counter exhausted (or the clock went back): borrow the next tick
+            _last_ms += 1
+            _counter = 0
+        ms, counter = _last_ms, _counter
+    return _build(ms, counter)
+
+
+def uuid7_from_datetime(moment: datetime, counter: int = 0) -> UUID:
+    """Generate a UUIDv7 carrying the given timestamp, e.g. to re-key old rows."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    ms = int(moment.timestamp() * 1000)
+    return _build(ms, counter & _COUNTER_MAX)
+
+
+def uuid7_datetime(value: UUID) -> datetime:
+    """Extract the creation time embedded in a UUIDv7."""
+    if value.version != 7:
+        raise ValueError(f"{value} is not a UUIDv7")
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
@@ -0,0 +1,313 @@
+"""
+Cache invalidation bus module.
+
+This module relays cache invalidations between workers and nodes:
+- GenericService writes publish (table, row ids) after they commit
+- PostgreSQL: events travel over LISTEN/NOTIFY on a dedicated connection
+- Other databases: events are written to the cache_event table, which every
+  worker polls
+- Each worker hands events from other workers to its subscribers, which
+  evict the affected cache entries
+- Propagation delay, lost events and connection state are metered; while
+  the bus is disconnected subscribers fall back to TTL expiry, and every
+  cache is flushed when it reconnects
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.metrics.cache import (
+    track_bus_connected,
+    track_invalidation_missed,
+    track_invalidation_published,
+    track_invalidation_received,
+)
+from app.models.cache_event import CacheEvent
+
+logger = logging.getLogger(__name__)
+
+# Handlers receive (table, keys); table None means "everything may be stale"
+InvalidationHandler = Callable[[Optional[str], Sequence[str]], None]
+StateHandler = Callable[[bool], None]
+
+RECONNECT_DELAY = 1.0
+RECONNECT_DELAY_MAX = 30.0
+
+
+class InvalidationBus:
+    """Base class: subscriber bookkeeping, delivery and loss accounting."""
+
+    backend = "none"
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{os.urandom(3).hex()}"
+        self.connected = False
+        self._handlers: List[InvalidationHandler] = []
+        self._state_handlers: List[StateHandler] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def subscribe(
+        self, handler: InvalidationHandler, on_state: Optional[StateHandler] = None
+    ) -> None:
+        """Register a handler for events and, optionally, connection changes."""
+        self._handlers.append(handler)
+        if on_state is not None:
+            self._state_handlers.append(on_state)
+            on_state(self.connected)
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._set_connected(False)
+
+    async def publish(self, db: AsyncSession, table: str, keys: Sequence[str]):
+        """Tell the other workers that rows of table changed."""
+        try:
+            await self._send(db, table, [str(key) for key in keys])
+            track_invalidation_published(table, self.backend)
+        except Exception as e:
+            # The write itself succeeded; peers catch up through the TTL. The
+            # caller keeps using the session, so drop the failed transaction
+            await db.rollback()
+            logger.warning(f"Could not publish invalidation for {table}: {e}")
+            track_invalidation_missed(self.backend, "publish")
+
+    async def _send(self, db: AsyncSession, table: str, keys: List[str]) -> None:
+        raise NotImplementedError
+
+    async def _run(self) -> None:
+        raise NotImplementedError
+
+    def _deliver(
+        self, origin: str, table: str, keys: Sequence[str], sent_at: float
+    ) -> None:
+        if origin == self.origin:
+            return
+        track_invalidation_received(table, self.backend, time.time() - sent_at)
+        self._notify(table, keys)
+
+    def _notify(self, table: Optional[str], keys: Sequence[str]) -> None:
+        for handler in self._handlers:
+            try:
+                handler(table, keys)
+            except Exception:
+                logger.exception(f"Invalidation handler failed for {table}")
+
+    def _set_connected(self, connected: bool) -> None:
+        if connected == self.connected:
+            return
+        self.connected = connected
+        track_bus_connected(self.backend, connected)
+        for handler in self._state_handlers:
+            handler(connected)
+        if connected:
+            # Events sent while we were away are gone: start from a clean slate
+            self._notify(None, ())
+        else:
+            logger.warning(
+                f"Cache invalidation bus ({self.backend}) disconnected; "
+                f"caches fall back to a {settings.CACHE_FALLBACK_TTL}s TTL"
+            )
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """Relay events with LISTEN/NOTIFY (requires the asyncpg driver)."""
+
+    backend = "postgresql"
+
+    def __init__(self, engine: AsyncEngine, channel: str):
+        super().__init__(engine)
+        self.channel = channel
+        self._sequence = 0
+        self._last_seen: Dict[str, int] = {}
+
+    async def _send(self, db: AsyncSession, table: str, keys: List[str]) -> None:
+        self._sequence += 1
+        payload = json.dumps(
+            {
+                "origin": self.origin,
+                "seq": self._sequence,
+                "table": table,
+                "keys": keys,
+                "sent_at": time.time(),
+            }
+        )
+        await db.exec(
+            text("SELECT pg_notify(:channel, :payload)").bindparams(
+                channel=self.channel, payload=payload
+            )
+        )
+        await db.commit()
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed invalidation event: {payload!r}")
+            return
+
+        origin, sequence = event["origin"], event["seq"]
+        last = self._last_seen.get(origin)
+        if last is not None and sequence > last + 1:
+            track_invalidation_missed(self.backend, "gap", sequence - last - 1)
+            self._notify(event["table"], ())
+        self._last_seen[origin] = max(sequence, last or 0)
+        self._deliver(origin, event["table"], event["keys"], event["sent_at"])
+
+    async def _run(self) -> None:
+        delay = RECONNECT_DELAY
+        while not self._stopping:
+            try:
+                async with self.engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    if not hasattr(driver, "add_listener"):
+                        logger.error(
+                            "LISTEN/NOTIFY needs the asyncpg driver; cache "
+                            "invalidation falls back to TTL expiry"
+                        )
+                        return
+                    await driver.add_listener(self.channel, self._on_notify)
+                    self._set_connected(True)
+                    delay = RECONNECT_DELAY
+                    try:
+                        while not driver.is_closed():
+                            await asyncio.sleep(settings.CACHE_BUS_POLL_INTERVAL)
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(self.channel, self._on_notify)
+                    track_invalidation_missed(self.backend, "disconnect")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Invalidation listener failed: {e}")
+            self._set_connected(False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+
+class PollingInvalidationBus(InvalidationBus):
+    """Relay events through the cache_event table, polled by every worker."""
+
+    backend = "polling"
+
+    # Prune expired events every this many polls
+    PRUNE_EVERY = 60
+
+    def __init__(self, engine: AsyncEngine, interval: float, retention: int):
+        super().__init__(engine)
+        self.interval = interval
+        self.retention = retention
+        self._last_id: Optional[int] = None
+
+    async def _send(self, db: AsyncSession, table: str, keys: List[str]) -> None:
+        db.add(
+            CacheEvent(
+                origin=self.origin, table_name=table, keys=keys, sent_at=time.time()
+            )
+        )
+        await db.commit()
+
+    async def _poll(self) -> None:
+        async with AsyncSession(self.engine) as db:
+            result = await db.exec(select(func.max(CacheEvent.id)))
+            last_id = result.one()[0] or 0
+            if self._last_id is None:
+                # Start from the current end of the log
+                self._last_id = last_id
+                return
+            if last_id < self._last_id:
+                # The log restarted below us (table recreated, ids reused):
+                # resume from its end and drop whatever we may have missed
+                logger.warning(
+                    f"Cache event log went back from id {self._last_id} to "
+                    f"{last_id}; flushing caches"
+                )
+                track_invalidation_missed(self.backend, "reset")
+                self._last_id = last_id
+                self._notify(None, ())
+                return
+            if last_id == self._last_id:
+                return
+
+            result = await db.exec(
+                select(CacheEvent)
+                .where(CacheEvent.id > self._last_id)
+                .order_by(CacheEvent.id)
+            )
+            for (event,) in result.all():
+                # Ids are consecutive; a gap means events were pruned unseen
+                if event.id > self._last_id + 1:
+                    track_invalidation_missed(
+                        self.backend, "gap", event.id - self._last_id - 1
+                    )
+                    self._notify(event.table_name, ())
+                self._last_id = event.id
+                self._deliver(event.origin, event.table_name, event.keys, event.sent_at)
+
+    async def _prune(self) -> None:
+        async with AsyncSession(self.engine) as db:
+            cutoff = time.time() - self.retention
+            await db.exec(delete(CacheEvent).where(CacheEvent.sent_at < cutoff))
+            await db.commit()
+
+    async def _run(self) -> None:
+        polls = 0
+        while not self._stopping:
+            try:
+                await self._poll()
+                if polls % self.PRUNE_EVERY == 0:
+                    await self._prune()
+                self._set_connected(True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Invalidation poll failed: {e}")
+                self._set_connected(False)
+            polls += 1
+            await asyncio.sleep(self.interval)
+
+
+invalidation_bus: Optional[InvalidationBus] = None
+
+
+def create_invalidation_bus(engine: AsyncEngine) -> InvalidationBus:
+    """Create the bus for the engine's database and make it the active one."""
+    global invalidation_bus
+    if engine.dialect.name == "postgresql":
+        invalidation_bus = PostgresInvalidationBus(engine, settings.CACHE_BUS_CHANNEL)
+    else:
+        invalidation_bus = PollingInvalidationBus(
+            engine, settings.CACHE_BUS_POLL_INTERVAL, settings.CACHE_BUS_RETENTION
+        )
+    return invalidation_bus
+
+
+async def publish_invalidation(
+    db: AsyncSession, table: str, keys: Sequence[Any] = ()
+) -> None:
+    """Publish a write to the other workers, if a bus is running."""
+    if invalidation_bus is not None:
+        await invalidation_bus.publish(db, table, keys)
@@ -4,13 +4,19 @@ import os
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from uuid import UUID
-from typing import Any, Dict, Literal
+from typing import Any, Dict, Literal, Sequence, Tuple
 
+from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession  # type: ignore
 
 from app.config import settings
 from app.models.audit_log import AuditLog
 from app.models.portfolio_ledger import PortfolioLedger
+from app.services.positions import (
+    lock_ledger,
+    update_current_positions,
+    update_snapshots,
+)
 from app.utils.tracing import get_correlation_id, get_transaction_id
 
 
@@ -215,24 +221,55 @@ async def record_portfolio_change(
     details: dict,
 ) -> None:
     """Log a portfolio change with correlation ID."""
-    ledger_entry = PortfolioLedger(
-        portfolio_id=portfolio_id,
-        change_type=change_type,
-        details=details,
-        timestamp=datetime.utcnow(),
-    )
+    await record_portfolio_changes(session, [(portfolio_id, change_type, details)])
+
+
+async def record_portfolio_changes(
+    session: AsyncSession,
+    changes: Sequence[Tuple[UUID, str, dict]],
+) -> None:
+    """
+    Log a batch of (portfolio_id, change_type, details) portfolio changes.
 
-    # Commit the ledger entry
-    session.add(ledger_entry)
+    The entries and their updates to current_positions are committed
+    together, with their portfolios locked so they commit in id order, then
+    the position snapshots they make due are written (see
+    app.services.positions).
+    """
+    timestamp = datetime.utcnow()
+    entries = [
+        PortfolioLedger(
+            portfolio_id=portfolio_id,
+            change_type=change_type,
+            details=details,
+            timestamp=timestamp,
+        )
+        for portfolio_id, change_type, details in changes
+    ]
+    await lock_ledger(session, [change[0] for change in changes])
+    session.add_all(entries)
+    # Entry ids are needed for current_positions
+    await session.flush()
+    await update_current_positions(session, entries)
+
+    # Commit the ledger entries and positions
     await session.commit()
 
-    # Create a log message
-    log_message = {
-        "type": "portfolio_change",
-        "portfolio_id": str(portfolio_id),
-        "change_type": change_type,
-        "details": details,
-    }
+    # Snapshots only speed up replays: losing a race to write one is harmless
+    try:
+        await update_snapshots(session, [change[0] for change in changes])
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+
+    for portfolio_id, change_type, details in changes:
+        # Create a log message
+        log_message = {
+            "type": "portfolio_change",
+            "portfolio_id": str(portfolio_id),
+            "change_type": change_type,
+            "details": details,
+        }
 
-    # Log the portfolio change
-    await log_activity(message=log_message, level="info", component="portfolio")
+        # Log the portfolio change
+        await log_activity(message=log_message, level="info", component="portfolio")
@@ -0,0 +1,297 @@
+"""
+Rate limit module.
+
+This module provides per-client request quotas:
+- Token buckets: each client key holds a token count and the time it was
+  last refilled, so checking a request is O(1) whatever the quota
+- Clients are keyed by user ID behind get_current_user, and by client IP on
+  the unauthenticated auth routes
+- Quotas come from settings per route class ("read", "write", "export",
+  "auth"), optionally overridden per router ("asset_type.write")
+- A local backend keeps buckets in a size-bounded, expiring LRU map; the
+  shared backend keeps them in an mmap'd table so every worker of a host
+  draws from the same budget. Other backends subclass RateLimitBackend
+- Limited requests are rejected with 429 and Retry-After; every response
+  carries RateLimit-Limit, RateLimit-Remaining, RateLimit-Reset and
+  RateLimit-Policy headers
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.auth.security import get_current_user
+from app.config import settings
+from app.metrics.rate_limit import track_rate_limit, track_rate_limit_keys
+from app.models.user import User
+from app.utils.admission import route_class
+from app.utils.shared_cache import SharedCache, default_path
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Expired buckets dropped per request by the local backend
+EXPIRE_BATCH = 4
+# Slot size of the shared bucket table: a key and two floats
+SHARED_SLOT_SIZE = 192
+
+# tokens, refilled at, full at
+BucketState = Tuple[float, float, float]
+
+
+class Quota:
+    """A bucket of limit tokens that refills completely over period seconds."""
+
+    __slots__ = ("limit", "period")
+
+    def __init__(self, limit: int, period: float):
+        if limit < 1 or period <= 0:
+            raise ValueError("A quota needs at least one request per period")
+        self.limit = limit
+        self.period = period
+
+    @classmethod
+    def parse(cls, value: str) -> "Quota":
+        """Parse "<requests>/<second|minute|hour|day>", e.g. "100/minute"."""
+        try:
+            limit, period = value.split("/", 1)
+            return cls(int(limit), PERIODS[period.strip().lower()])
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit quota: {value!r}") from None
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+
+class RateLimitDecision:
+    """The outcome of taking a token, with what the headers report."""
+
+    __slots__ = ("allowed", "quota", "remaining", "reset", "retry_after")
+
+    def __init__(
+        self,
+        allowed: bool,
+        quota: Quota,
+        remaining: int,
+        reset: float,
+        retry_after: float,
+    ):
+        self.allowed = allowed
+        self.quota = quota
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.quota.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{self.quota.limit};w={int(self.quota.period)}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def take_token(
+    state: Optional[BucketState], quota: Quota, now: float
+) -> Tuple[BucketState, RateLimitDecision]:
+    """Refill a bucket for the time elapsed and take one token from it."""
+    if state is None:
+        tokens = float(quota.limit)
+    else:
+        tokens, refilled_at, _ = state
+        tokens = min(float(quota.limit), tokens + (now - refilled_at) * quota.rate)
+
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    to_full = (quota.limit - tokens) / quota.rate
+    decision = RateLimitDecision(
+        allowed=allowed,
+        quota=quota,
+        remaining=int(tokens),
+        reset=to_full,
+        retry_after=0.0 if allowed else (1 - tokens) / quota.rate,
+    )
+    return (tokens, now, now + to_full), decision
+
+
+class RateLimitBackend:
+    """Where buckets live; take() must refill and take atomically per key."""
+
+    name = "base"
+
+    async def take(self, key: str, quota: Quota, now: float) -> RateLimitDecision:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    Buckets of this worker in an LRU map of at most max_keys entries.
+
+    A bucket that has refilled completely is the same as no bucket, so
+    entries are dropped once full; the least recently used entry goes
+    first when the map is at capacity.
+    """
+
+    name = "local"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, BucketState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, quota: Quota, now: float) -> RateLimitDecision:
+        state, decision = take_token(self._buckets.pop(key, None), quota, now)
+        self._buckets[key] = state
+        self._expire(now)
+        track_rate_limit_keys(self.name, len(self._buckets))
+        return decision
+
+    def _expire(self, now: float) -> None:
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        for _ in range(EXPIRE_BATCH):
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now:
+                break
+            del self._buckets[key]
+
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by every worker of the host through a SharedCache file.
+
+    Refill and take run under the file's writer lock, so concurrent workers
+    never spend the same token twice. The table is fixed-size: when it is
+    full the oldest bucket is dropped, which resets that client's budget.
+    """
+
+    name = "shared"
+
+    def __init__(self, cache: SharedCache):
+        self.cache = cache
+
+    async def take(self, key: str, quota: Quota, now: float) -> RateLimitDecision:
+        decisions = []
+
+        def take(state: Optional[BucketState]) -> BucketState:
+            state, decision = take_token(state, quota, now)
+            decisions.append(decision)
+            return state
+
+        self.cache.update(f"ratelimit:{key}", take)
+        return decisions[0]
+
+    def close(self) -> None:
+        self.cache.close()
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    """The backend selected by RATE_LIMIT_BACKEND."""
+    if settings.RATE_LIMIT_BACKEND == "shared":
+        return SharedRateLimitBackend(
+            SharedCache(
+                default_path(settings.RATE_LIMIT_MAX_KEYS, SHARED_SLOT_SIZE)
+                + "-ratelimit",
+                settings.RATE_LIMIT_MAX_KEYS,
+                SHARED_SLOT_SIZE,
+                name="ratelimit",
+            )
+        )
+    return LocalRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+class RateLimiter:
+    """Quota lookup and enforcement over a backend, exposed as dependencies."""
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None):
+        self._backend = backend
+        self._quotas: Dict[str, Quota] = {}
+
+    @property
+    def backend(self) -> RateLimitBackend:
+        # Created on first use, so the shared file is only mapped when needed
+        if self._backend is None:
+            self._backend = create_rate_limit_backend()
+        return self._backend
+
+    def quota(self, scope: str, route_class: str) -> Quota:
+        name = f"{scope}.{route_class}"
+        quota = self._quotas.get(name)
+        if quota is None:
+            quotas = settings.RATE_LIMIT_QUOTAS
+            value = quotas.get(name) or quotas.get(route_class)
+            quota = self._quotas[name] = Quota.parse(
+                value or settings.RATE_LIMIT_DEFAULT
+            )
+        return quota
+
+    async def check(
+        self, request: Request, scope: str, route_class: str, client: str
+    ) -> RateLimitDecision:
+        """Take a token for client, or raise 429 when its bucket is empty."""
+        decision = await self.backend.take(
+            f"{scope}:{route_class}:{client}",
+            self.quota(scope, route_class),
+            time.time(),
+        )
+        track_rate_limit(route_class, decision.allowed)
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, retry later",
+                headers=decision.headers(),
+            )
+        # Routes build their own responses; the middleware adds the headers
+        request.state.rate_limit = decision
+        return decision
+
+    def per_user(self, scope: str):
+        """Dependency limiting the authenticated user, per route class."""
+
+        async def limit_user(request: Request, user: User = Depends(get_current_user)):
+            if settings.RATE_LIMIT_ENABLED:
+                await self.check(request, scope, route_class(request), str(user.id))
+
+        return limit_user
+
+    def per_client(self, scope: str, route_class: str = "auth"):
+        """Dependency limiting the client IP, for routes without a user."""
+
+        async def limit_client(request: Request):
+            if settings.RATE_LIMIT_ENABLED:
+                client = request.client.host if request.client else "unknown"
+                await self.check(request, scope, route_class, client)
+
+        return limit_client
+
+    def close(self) -> None:
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimitHeadersMiddleware(BaseHTTPMiddleware):
+    """Adds the RateLimit-* headers of the request's decision to its response."""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        decision = getattr(request.state, "rate_limit", None)
+        if decision is not None:
+            response.headers.update(decision.headers())
+        return response
@@ -1,21 +1,175 @@
+"""
+Scheduler module.
+
+This module runs the periodic jobs of the API:
+- Market data refreshes, price history syncs and position checks
+- Every worker starts the scheduler, but only the one holding the host's
+  scheduler lock (a non-blocking flock, released when its process exits)
+  registers the jobs; the others retry every SCHEDULER_ELECTION_INTERVAL
+  and take over when the holder is gone
+- The lock is per host: a deployment over several hosts sets
+  SCHEDULER_ENABLED on one of them only
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from app.utils.logging import logger
 
+from app.config import settings
+from app.db.session import engine
+from app.services.market_data import (
+    create_provider,
+    refresh_quotes,
+    sync_history,
+    tracked_tickers,
+)
+from app.services.positions import check_positions
+from app.services.price_store import get_price_store
+from app.services.risk import update_risk
+
+logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
+provider = None
+# Descriptor of the scheduler lock, while this process holds it
+scheduler_lock: Optional[int] = None
+
+
+def default_lock_path() -> str:
+    """A per-database lock file name: apps on other databases elect their own."""
+    digest = hashlib.blake2b(settings.DB_URL.encode(), digest_size=6).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"pwb-scheduler-{digest}")
+
+
+def try_lock(path: str) -> Optional[int]:
+    """Take an exclusive flock of path without waiting; its descriptor, or None."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def elect() -> bool:
+    """Try to become the host's job runner; True if this process is."""
+    global scheduler_lock
+    if scheduler_lock is None:
+        scheduler_lock = try_lock(settings.SCHEDULER_LOCK_PATH or default_lock_path())
+    return scheduler_lock is not None
 
 
 def start_scheduler():
-    scheduler.start()
+    if not settings.SCHEDULER_ENABLED:
+        return
+    if elect():
+        add_jobs()
+    else:
+        interval = settings.SCHEDULER_ELECTION_INTERVAL
+        scheduler.add_job(
+            func=take_over,
+            trigger=IntervalTrigger(seconds=interval),
+            id="elect_scheduler",
+            name=f"Try to take over the scheduled jobs every {interval}s",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+    if scheduler.get_jobs():
+        scheduler.start()
+
+
+async def take_over():
+    if elect():
+        logger.info("Scheduler lock acquired: running the scheduled jobs")
+        scheduler.remove_job("elect_scheduler")
+        add_jobs()
+
+
+def add_jobs():
+    if settings.MARKET_DATA_ENABLED:
+        add_market_data_jobs()
+    check_interval = settings.POSITIONS_CHECK_INTERVAL
+    if check_interval:
+        scheduler.add_job(
+            func=check_current_positions,
+            trigger=IntervalTrigger(seconds=check_interval),
+            id="check_current_positions",
+            name=f"Check current positions every {check_interval}s",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+
+def add_market_data_jobs():
+    interval = settings.MARKET_DATA_REFRESH_INTERVAL
     scheduler.add_job(
         func=refresh_market_data,
-        trigger=IntervalTrigger(seconds=30),
+        trigger=IntervalTrigger(seconds=interval),
         id="refresh_market_data",
-        name="Refresh market data every 30s",
+        name=f"Refresh market data every {interval}s",
         replace_existing=True,
+        # A slow refresh delays the next one instead of overlapping it
+        max_instances=1,
+        coalesce=True,
     )
+    history_interval = settings.PRICE_STORE_SYNC_INTERVAL
+    scheduler.add_job(
+        func=sync_price_history,
+        trigger=IntervalTrigger(seconds=history_interval),
+        id="sync_price_history",
+        name=f"Sync price history every {history_interval}s",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        # Backfill new tickers at startup rather than an interval later
+        next_run_time=datetime.now(),
+    )
+
+
+def stop_scheduler():
+    global scheduler_lock
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    if scheduler_lock is not None:
+        os.close(scheduler_lock)
+        scheduler_lock = None
+
+
+def get_provider():
+    global provider
+    if provider is None:
+        provider = create_provider()
+    return provider
+
+
+async def refresh_market_data():
+    logger.info("Scheduled job: Refreshing market data")
+    written, failed = await refresh_quotes(engine, get_provider())
+    logger.info(f"Market data refreshed: {written} quotes, {len(failed)} failed")
+
+
+async def sync_price_history():
+    logger.info("Scheduled job: Syncing price history")
+    symbols = await tracked_tickers(engine)
+    written, failed = await sync_history(get_provider(), get_price_store(), symbols)
+    logger.info(f"Price history synced: {written} bars, {len(failed)} failed")
+    # Precompute the default risk metrics of the synced tickers
+    rows = await asyncio.to_thread(update_risk, symbols)
+    logger.info(f"Risk metrics updated: {rows} rows")
 
 
-def refresh_market_data():
-    log_activity("Scheduled job: Refreshing market data", level="info")
+async def check_current_positions():
+    logger.info("Scheduled job: Checking current positions against the ledger")
+    drifts = await check_positions(engine, repair=settings.POSITIONS_CHECK_REPAIR)
+    logger.info(f"Current positions checked: {len(drifts)} drifted")
@@ -0,0 +1,124 @@
+"""
+Response serialization module.
+
+This module provides a fast path for turning ORM rows into API responses:
+- Row serializers built once per read schema
+- Payload builders matching GenericResponse and GenericListResponse
+- An orjson-backed response class
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect
+from sqlmodel import SQLModel
+
+# orjson options matching the JSON pydantic produces for our schemas
+# (UUIDs as strings, ISO 8601 datetimes with a "Z" suffix for UTC)
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+DEFAULT_MESSAGE = "Success"
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes with orjson."""
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """
+    Serialize trusted ORM rows into plain dicts shaped like a read schema.
+
+    The field plan is computed once per schema, so serializing a row is a
+    single attribute read per field with no pydantic validation involved.
+    Schemas declaring validators, serializers or computed fields transform
+    values on the way out; their rows go through the schema instead.
+    """
+
+    def __init__(self, schema: Type[SQLModel]):
+        self.schema = schema
+        self.fields = tuple(
+            (name, None if field.is_required() else field.get_default())
+            for name, field in schema.model_fields.items()
+        )
+        self.names = tuple(name for name, _ in self.fields)
+        decorators = schema.__pydantic_decorators__
+        self.validated = any(
+            (
+                decorators.validators,
+                decorators.field_validators,
+                decorators.root_validators,
+                decorators.model_validators,
+                decorators.field_serializers,
+                decorators.model_serializers,
+                decorators.computed_fields,
+            )
+        )
+
+    def dump(self, obj: Any) -> Optional[Dict[str, Any]]:
+        """Serialize a single row."""
+        if obj is None:
+            return None
+        if self.validated:
+            return self.schema.model_validate(obj).model_dump(mode="json")
+        # Loaded column values live in the instance __dict__
+        values = obj.__dict__
+        try:
+            return {name: values[name] for name in self.names}
+        except KeyError:
+            return self._dump_partial(obj)
+
+    def _dump_partial(self, obj: Any) -> Dict[str, Any]:
+        # Reading an expired or unloaded column would emit a query, which an
+        # async session refuses with MissingGreenlet: name the column instead.
+        # Attributes not mapped to the row keep their schema default.
+        state = inspect(obj, raiseerr=False)
+        mapped = state.mapper.attrs.keys() if state is not None else ()
+        values = obj.__dict__
+        row = {}
+        for name, default in self.fields:
+            if name in values:
+                row[name] = values[name]
+            elif name in mapped:
+                raise RuntimeError(
+                    f"{type(obj).__name__}.{name} is not loaded; refresh the row "
+                    "before serializing it"
+                )
+            else:
+                row[name] = getattr(obj, name, default)
+        return row
+
+    def dump_many(self, objs: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Serialize a list of rows."""
+        dump = self.dump
+        return [dump(obj) for obj in objs]
+
+
+def item_payload(data: Any, message: str = DEFAULT_MESSAGE) -> Dict[str, Any]:
+    """Build a payload shaped like GenericResponse."""
+    return {"data": data, "message": message}
+
+
+def list_payload(
+    items: List[Any],
+    total: int,
+    page: int,
+    page_size: int,
+    message: str = DEFAULT_MESSAGE,
+) -> Dict[str, Any]:
+    """Build a payload shaped like GenericListResponse."""
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "message": message,
+    }
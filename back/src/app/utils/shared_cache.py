@@ -0,0 +1,456 @@
+"""
+Shared-memory cache module.
+
+This module provides a host-local cache shared by every worker process:
+- A fixed-size hash table in an mmap'd file (in /dev/shm when available),
+  so memory stays flat however many workers are started
+- Lock-free reads: every slot carries a sequence number that writers make
+  odd while they rewrite it (a seqlock); readers retry or miss on a torn read
+- Writers serialize on an flock of the file
+- Per-table write counters: a value read from the database before a
+  concurrent write committed is refused instead of cached
+- A generation number in the header flushes the whole table at once
+- The file name carries the table layout; a file formatted with another
+  layout is refused rather than reformatted under the workers mapping it
+- Files live in a directory only the service user can enter, and are
+  refused unless that user owns them; values are JSON (with UUIDs, dates
+  and decimals tagged), never pickles, so a planted file cannot run code
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import json
+import stat
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from struct import Struct
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+from uuid import UUID
+
+from app.config import settings
+from app.metrics.cache import (
+    track_cache_request,
+    track_cache_size,
+    track_cache_store,
+)
+
+MAGIC = b"PWBSHM02"
+
+# magic, slots, slot size, generation
+HEADER = Struct("<8sIIQ")
+# Per-table write counters live after the header, indexed by a table hash
+TABLE_COUNTERS = 256
+COUNTER = Struct("<Q")
+# seq, key hash, generation, table version, stored at, key length, value length
+SLOT = Struct("<QQQQdHI6x")
+
+# Slots probed from a key's home slot before giving up
+PROBE = 8
+# Attempts at a consistent read of a slot being rewritten
+READ_RETRIES = 4
+
+
+def _hash(data: bytes) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little") or 1
+
+
+def _table(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def row_values(obj: Any) -> Dict[str, Any]:
+    """Column values of a table model instance, the form rows are cached in."""
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+# Tagged JSON for the values JSON has no type for
+TAGS = {
+    "$uuid": UUID,
+    "$datetime": datetime.fromisoformat,
+    "$date": date.fromisoformat,
+    "$decimal": Decimal,
+}
+
+
+def _tag(value: Any) -> Dict[str, str]:
+    if isinstance(value, UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+
+def _untag(value: Dict[str, Any]) -> Any:
+    if len(value) == 1:
+        tag, text = next(iter(value.items()))
+        if tag in TAGS:
+            return TAGS[tag](text)
+    return value
+
+
+def encode(value: Any) -> bytes:
+    """Cached form of a value (tuples come back as lists)."""
+    return json.dumps(value, default=_tag, separators=(",", ":")).encode()
+
+
+def decode(data: bytes) -> Any:
+    return json.loads(data, object_hook=_untag)
+
+
+def _check_private(st: os.stat_result, path: str, kind: str) -> None:
+    """Refuse files another user could have planted or can write."""
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(
+            f"Shared cache {kind} {path} must be owned by uid {os.getuid()} "
+            "and not accessible to other users"
+        )
+
+
+def private_directory() -> str:
+    """This user's directory for shared files, on tmpfs when the host has one."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    directory = os.path.join(base, f"pwb-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    # lstat: a symlink planted in the shared base is not a directory
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise RuntimeError(f"Shared cache directory {directory} is not a directory")
+    _check_private(st, directory, "directory")
+    return directory
+
+
+def default_path(slots: int, slot_size: int) -> str:
+    """
+    A per-database and per-layout file name in the private directory.
+
+    Workers started with another layout (e.g. during a rolling restart) map
+    a file of their own rather than reformatting one still in use.
+    """
+    digest = hashlib.blake2b(settings.DB_URL.encode(), digest_size=6).hexdigest()
+    layout = f"{MAGIC.decode()}-{slots}x{slot_size}".lower()
+    return os.path.join(private_directory(), f"cache-{digest}-{layout}")
+
+
+class SharedCache:
+    """
+    Fixed-size hash table of JSON values shared through an mmap'd file.
+
+    Keys are "<table>:<id>" strings. A full probe window evicts its oldest
+    entry, so the cache never grows past slots * slot_size bytes.
+    """
+
+    def __init__(self, path: str, slots: int, slot_size: int, name: str = "shared"):
+        self.name = name
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.capacity = slot_size - SLOT.size
+        self._slots_offset = HEADER.size + TABLE_COUNTERS * COUNTER.size
+        self.size = self._slots_offset + slots * slot_size
+
+        self._fd = os.open(
+            path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600
+        )
+        try:
+            st = os.fstat(self._fd)
+            if not stat.S_ISREG(st.st_mode):
+                raise RuntimeError(f"Shared cache {path} is not a regular file")
+            _check_private(st, path, "file")
+            with self._locked():
+                self._initialize()
+        except RuntimeError:
+            os.close(self._fd)
+            raise
+        self._mm = mmap.mmap(self._fd, self.size)
+        track_cache_size(self.name, self.size)
+
+    def _initialize(self) -> None:
+        # The first worker formats the file; the header is written last, so
+        # a file without one has never been mapped by anyone
+        header = os.pread(self._fd, HEADER.size, 0)
+        if len(header) == HEADER.size and header[: len(MAGIC)] != bytes(len(MAGIC)):
+            if (
+                HEADER.unpack(header)[:3] != (MAGIC, self.slots, self.slot_size)
+                or os.fstat(self._fd).st_size != self.size
+            ):
+                # Shrinking or rewriting a file other workers have mapped
+                # would crash them (SIGBUS) or corrupt their reads
+                raise RuntimeError(
+                    f"Shared cache {self.path} has another layout; remove it or "
+                    "use another SHARED_CACHE_PATH"
+                )
+            return
+        # Nobody maps the file before its header is written
+        os.ftruncate(self._fd, self.size)
+        os.pwrite(self._fd, HEADER.pack(MAGIC, self.slots, self.slot_size, 1), 0)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # Header fields
+
+    @property
+    def generation(self) -> int:
+        return COUNTER.unpack_from(self._mm, 16)[0]
+
+    def _counter_offset(self, table: str) -> int:
+        index = _hash(table.encode()) % TABLE_COUNTERS
+        return HEADER.size + index * COUNTER.size
+
+    def version(self, table: str) -> int:
+        """Write counter of a table; pass it back to set()."""
+        return COUNTER.unpack_from(self._mm, self._counter_offset(table))[0]
+
+    # Slots
+
+    def _offsets(self, key_hash: int) -> Iterator[int]:
+        home = key_hash % self.slots
+        for i in range(min(PROBE, self.slots)):
+            yield self._slots_offset + ((home + i) % self.slots) * self.slot_size
+
+    def _read(self, offset: int) -> Optional[bytes]:
+        """Copy a slot without locking; None if it kept changing under us."""
+        for _ in range(READ_RETRIES):
+            seq = COUNTER.unpack_from(self._mm, offset)[0]
+            if seq & 1:
+                continue
+            raw = self._mm[offset : offset + self.slot_size]
+            if COUNTER.unpack_from(self._mm, offset)[0] == seq:
+                return raw
+        return None
+
+    def _write(self, offset: int, fields: tuple, payload: bytes = b"") -> None:
+        # Callers hold the lock; readers see an odd seq while we write
+        seq = COUNTER.unpack_from(self._mm, offset)[0]
+        COUNTER.pack_into(self._mm, offset, seq + 1)
+        SLOT.pack_into(self._mm, offset, seq + 1, *fields)
+        self._mm[offset + SLOT.size : offset + SLOT.size + len(payload)] = payload
+        COUNTER.pack_into(self._mm, offset, seq + 2)
+
+    def _clear_slot(self, offset: int) -> None:
+        self._write(offset, (0, 0, 0, 0.0, 0, 0))
+
+    def _find(self, key: bytes, key_hash: int, generation: int) -> Optional[int]:
+        for offset in self._offsets(key_hash):
+            _, slot_hash, slot_generation, _, _, length, _ = SLOT.unpack_from(
+                self._mm, offset
+            )
+            if slot_hash == key_hash and slot_generation == generation:
+                start = offset + SLOT.size
+                if self._mm[start : start + length] == key:
+                    return offset
+        return None
+
+    def _store(
+        self, key: bytes, key_hash: int, table: str, version: int, payload: bytes
+    ) -> None:
+        # Callers hold the lock
+        generation = self.generation
+        target = self._find(key, key_hash, generation)
+        if target is None:
+            # First free (or flushed) slot, else the oldest one
+            oldest = None
+            for offset in self._offsets(key_hash):
+                _, slot_hash, slot_generation, _, stored_at, *_ = SLOT.unpack_from(
+                    self._mm, offset
+                )
+                if slot_hash == 0 or slot_generation != generation:
+                    target = offset
+                    break
+                if oldest is None or stored_at < oldest[0]:
+                    oldest = (stored_at, offset)
+            else:
+                target = oldest[1]
+                track_cache_store(self.name, table, "evicted")
+        self._write(
+            target,
+            (
+                key_hash,
+                generation,
+                version,
+                time.time(),
+                len(key),
+                len(payload) - len(key),
+            ),
+            payload,
+        )
+
+    # Public API
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """Look a key up without locking; None on a miss."""
+        encoded = key.encode()
+        key_hash = _hash(encoded)
+        generation = self.generation
+        for offset in self._offsets(key_hash):
+            raw = self._read(offset)
+            if raw is None:
+                break
+            _, slot_hash, slot_generation, _, stored_at, key_length, value_length = (
+                SLOT.unpack_from(raw)
+            )
+            if slot_hash != key_hash or slot_generation != generation:
+                continue
+            if raw[SLOT.size : SLOT.size + key_length] != encoded:
+                continue
+            if max_age is not None and time.time() - stored_at > max_age:
+                break
+            start = SLOT.size + key_length
+            track_cache_request(self.name, _table(key), "hit")
+            return decode(raw[start : start + value_length])
+        track_cache_request(self.name, _table(key), "miss")
+        return None
+
+    def set(self, key: str, value: Any, version: int) -> bool:
+        """
+        Store a value read while the table's write counter was version.
+
+        The value is refused if the table has been written since, because it
+        may predate that write.
+        """
+        table = _table(key)
+        encoded = key.encode()
+        try:
+            payload = encoded + encode(value)
+        except TypeError:
+            track_cache_store(self.name, table, "unencodable")
+            return False
+        if len(payload) > self.capacity:
+            track_cache_store(self.name, table, "too_large")
+            return False
+
+        key_hash = _hash(encoded)
+        with self._locked():
+            if self.version(table) != version:
+                track_cache_store(self.name, table, "stale")
+                return False
+            self._store(encoded, key_hash, table, version, payload)
+        track_cache_store(self.name, table, "stored")
+        return True
+
+    def update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        """
+        Replace a key's value with fn(current value, None on a miss).
+
+        The read and the write happen under the writers' lock, so concurrent
+        updates from any worker never lose each other's changes. Returns the
+        new value, which is not stored if it does not fit a slot.
+        """
+        table = _table(key)
+        encoded = key.encode()
+        key_hash = _hash(encoded)
+        with self._locked():
+            current = None
+            slot = self._find(encoded, key_hash, self.generation)
+            if slot is not None:
+                _, _, _, _, _, key_length, value_length = SLOT.unpack_from(
+                    self._mm, slot
+                )
+                start = slot + SLOT.size + key_length
+                current = decode(self._mm[start : start + value_length])
+            value = fn(current)
+            payload = encoded + encode(value)
+            if len(payload) > self.capacity:
+                track_cache_store(self.name, table, "too_large")
+                return value
+            self._store(encoded, key_hash, table, self.version(table), payload)
+        return value
+
+    def invalidate(self, table: str, ids: Iterable[Any] = ()) -> None:
+        """
+        Record a write to table and drop its cached rows.
+
+        Without ids every entry of the table is dropped.
+        """
+        ids = [str(value) for value in ids]
+        with self._locked():
+            offset = self._counter_offset(table)
+            COUNTER.pack_into(
+                self._mm, offset, COUNTER.unpack_from(self._mm, offset)[0] + 1
+            )
+            generation = self.generation
+            if ids:
+                for value in ids:
+                    encoded = f"{table}:{value}".encode()
+                    slot = self._find(encoded, _hash(encoded), generation)
+                    if slot is not None:
+                        self._clear_slot(slot)
+                return
+
+            prefix = f"{table}:".encode()
+            for index in range(self.slots):
+                slot = self._slots_offset + index * self.slot_size
+                start = slot + SLOT.size
+                if self._mm[start : start + len(prefix)] == prefix:
+                    self._clear_slot(slot)
+
+    def clear(self) -> None:
+        """Drop every entry by moving to a new generation."""
+        with self._locked():
+            COUNTER.pack_into(self._mm, 16, self.generation + 1)
+            # Also refuse values read before the flush
+            for index in range(TABLE_COUNTERS):
+                offset = HEADER.size + index * COUNTER.size
+                COUNTER.pack_into(
+                    self._mm, offset, COUNTER.unpack_from(self._mm, offset)[0] + 1
+                )
+
+
+shared_cache: Optional[SharedCache] = None
+
+
+def open_shared_cache() -> Optional[SharedCache]:
+    """Map the host's shared cache and make it the active one."""
+    global shared_cache
+    if settings.SHARED_CACHE_ENABLED and shared_cache is None:
+        slots, slot_size = settings.SHARED_CACHE_SLOTS, settings.SHARED_CACHE_SLOT_SIZE
+        shared_cache = SharedCache(
+            settings.SHARED_CACHE_PATH or default_path(slots, slot_size),
+            slots,
+            slot_size,
+        )
+    return shared_cache
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """The active shared cache, None unless it was opened."""
+    return shared_cache
+
+
+def invalidate_shared(table: Optional[str], keys: Sequence[Any] = ()) -> None:
+    """Drop cached rows of a written table (table None drops everything)."""
+    if shared_cache is None:
+        return
+    if table is None:
+        shared_cache.clear()
+    else:
+        shared_cache.invalidate(table, keys)
+
+
+def close_shared_cache() -> None:
+    global shared_cache
+    if shared_cache is not None:
+        shared_cache.close()
+        shared_cache = None
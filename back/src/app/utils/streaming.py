@@ -0,0 +1,100 @@
+"""
+Streaming export module.
+
+This module provides incremental encoders for streaming table exports:
+- NDJSON and CSV encoders that turn row batches into bytes
+- Optional gzip framing applied chunk by chunk
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from app.utils.serialization import dumps
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class NDJSONEncoder:
+    """Encode row batches as newline-delimited JSON."""
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = fields
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _csv_value(value: Any) -> Any:
+    """Render a value the way the JSON representation does."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class CSVEncoder:
+    """Encode row batches as CSV with a header line."""
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = fields
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _flush(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer.writerow(self.fields)
+        return self._flush()
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        fields = self.fields
+        self._writer.writerows(
+            [_csv_value(row[name]) for name in fields] for row in rows
+        )
+        return self._flush()
+
+
+ENCODERS = {
+    "ndjson": NDJSONEncoder,
+    "csv": CSVEncoder,
+}
+
+
+async def encode_stream(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    export_format: str,
+    fields: Sequence[str],
+    gzip: bool = False,
+) -> AsyncIterator[bytes]:
+    """Encode row batches into export chunks, optionally gzip-compressed."""
+    encoder = ENCODERS[export_format](fields)
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+
+    def frame(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    chunk = frame(encoder.header())
+    if chunk:
+        yield chunk
+
+    async for rows in batches:
+        chunk = frame(encoder.encode(rows))
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
@@ -3,6 +3,7 @@ import os
 from typing import AsyncGenerator
 
 import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi.testclient import TestClient
@@ -53,3 +54,24 @@ async def db_session(test_db: AsyncSession) -> AsyncSession:
 def client() -> TestClient:
     """Create a test client."""
     return TestClient(app)
+
+
+@pytest.fixture
+def engine(request, tmp_path):
+    """
+    A SQLite engine on a fresh database file, disposed after the test.
+
+    The tables of the models given as the fixture's parameter are created
+    (parametrize with indirect=True), every table by default.
+    """
+    models = getattr(request, "param", None)
+    tables = None if models is None else [model.__table__ for model in models]
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all, tables=tables)
+
+    asyncio.run(setup())
+    yield engine
+    asyncio.run(engine.dispose())
@@ -0,0 +1,46 @@
+from app.utils.admission import AdaptiveLimit
+
+
+def saturate(limit: AdaptiveLimit, latency: float, rounds: int = 50):
+    """Run rounds of requests that fill the limit, each taking latency."""
+    for _ in range(rounds):
+        admitted = 0
+        while limit.try_acquire():
+            admitted += 1
+        for _ in range(admitted):
+            limit.release(latency, pool_pressure=0.0, dropped=False)
+
+
+def test_requests_over_the_limit_are_shed():
+    limit = AdaptiveLimit("test", initial=2, minimum=1, maximum=10)
+    assert limit.try_acquire()
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+    limit.release(0.01, pool_pressure=0.0, dropped=False)
+    assert limit.try_acquire()
+
+
+def test_limit_grows_while_latency_holds():
+    limit = AdaptiveLimit("test", initial=10, minimum=1, maximum=100)
+    saturate(limit, 0.01)
+    assert limit.limit > 10
+
+
+def test_limit_shrinks_when_latency_rises():
+    limit = AdaptiveLimit("test", initial=50, minimum=1, maximum=100)
+    saturate(limit, 0.01, rounds=5)
+    before = limit.limit
+    saturate(limit, 0.2, rounds=5)
+    assert limit.limit < before
+
+
+def test_pool_pressure_and_timeouts_back_off():
+    limit = AdaptiveLimit("test", initial=20, minimum=2, maximum=100)
+    limit.try_acquire()
+    limit.release(0.01, pool_pressure=1.0, dropped=False)
+    assert limit.limit < 20
+    before = limit.limit
+    limit.try_acquire()
+    limit.release(0.01, pool_pressure=0.0, dropped=True)
+    assert limit.limit < before
+    assert limit.in_flight == 0
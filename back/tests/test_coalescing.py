@@ -0,0 +1,71 @@
+import asyncio
+
+from app.utils.cache import LazyPage, SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("key", compute) for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [b"body"] * 10
+    assert len(calls) == 1
+    assert flights.coalesce_ratio == 0.9
+
+
+def test_sequential_calls_are_not_coalesced():
+    flights = SingleFlight("test")
+
+    async def compute():
+        return 1
+
+    async def scenario():
+        for _ in range(3):
+            await flights.do("key", compute)
+
+    asyncio.run(scenario())
+    assert flights.coalesce_ratio == 0.0
+
+
+def test_a_waiter_takes_over_when_the_leader_is_cancelled():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    async def scenario():
+        leader = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flights.do("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await asyncio.gather(*waiters), leader.cancelled()
+
+    assert asyncio.run(scenario()) == ([b"body"] * 3, True)
+    # The leader's call and one more
+    assert len(calls) == 2
+    assert flights.in_flight() == 0
+
+
+def test_lazy_page_renders_once_and_only_on_use():
+    renders = []
+
+    def render():
+        renders.append(1)
+        return b"body"
+
+    page = LazyPage("etag", None, render)
+    assert page.etag == "etag" and renders == []
+    assert page.body == b"body"
+    assert page.body == b"body"
+    assert len(renders) == 1
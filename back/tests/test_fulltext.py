@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.asset_type import AssetType, AssetTypeFilter
+from app.services import GenericService
+from app.services.fulltext import install_fulltext
+
+ROWS = [
+    ("equity", "Listed stocks and ETFs"),
+    ("crypto", "Crypto coins and crypto tokens"),
+    ("bond", "Government and corporate debt"),
+    ("crypto fund", "Funds holding digital assets"),
+]
+
+service = GenericService(AssetType)
+
+
+@pytest.fixture
+def engine(engine):
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(install_fulltext)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            db.add_all(
+                AssetType(name=name, description=description)
+                for name, description in ROWS
+            )
+            await db.commit()
+
+    asyncio.run(setup())
+    return engine
+
+
+def search(engine, query, **kwargs):
+    async def run():
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            filters = AssetTypeFilter(q=query)
+            items = await service.get_all(db, filters=filters, **kwargs)
+            total = await service.count(db, filters=filters)
+            return [item.name for item in items], total
+
+    return asyncio.run(run())
+
+
+def test_substring_match_is_case_insensitive(engine):
+    names, total = search(engine, "CRYPTO")
+    assert sorted(names) == ["crypto", "crypto fund"]
+    assert total == 2
+
+
+def test_results_ranked_by_relevance(engine):
+    # "crypto" appears three times in the first row and once in the second
+    names, _ = search(engine, "crypto")
+    assert names[0] == "crypto"
+
+    names, _ = search(engine, "crypto", sort_by="name", sort_order="desc")
+    assert names == ["crypto fund", "crypto"]
+
+
+def test_short_queries_fall_back_to_substring_scan(engine):
+    names, total = search(engine, "FU")
+    assert names == ["crypto fund"]
+    assert total == 1
+
+
+def test_index_follows_updates_and_deletes(engine):
+    async def mutate():
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            items = await service.get_all(db)
+            by_name = {item.name: item for item in items}
+            await service.update(db, by_name["bond"].id, {"name": "treasury"})
+            await service.delete(db, by_name["equity"].id, hard_delete=True)
+
+    asyncio.run(mutate())
+
+    assert search(engine, "bond") == ([], 0)
+    assert search(engine, "debt") == (["treasury"], 1)
+    assert search(engine, "treas") == (["treasury"], 1)
+    assert search(engine, "stocks") == ([], 0)
+
+
+def test_soft_deleted_rows_are_excluded(engine):
+    async def soft_delete():
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            items = await service.get_all(db, filters=AssetTypeFilter(name="crypto"))
+            await service.delete(db, items[0].id)
+
+    asyncio.run(soft_delete())
+
+    assert search(engine, "crypto") == (["crypto fund"], 1)
+
+
+def test_install_backfills_existing_rows(engine):
+    async def reinstall():
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("DROP TABLE asset_type_fts")
+            await conn.run_sync(install_fulltext)
+
+    asyncio.run(reinstall())
+
+    assert search(engine, "coins") == (["crypto"], 1)
@@ -0,0 +1,237 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api import v1
+from app.api.v1.asset_type import router
+from app.auth.security import get_current_user
+from app.config import settings
+from app.db.session import get_session
+from app.models.asset_type import AssetType, AssetTypeRead
+from app.models.audit_log import AuditLog
+from app.models.user import User
+from app.utils import logging as action_logging
+from app.utils.cache import table_versions
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'api.db'}")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                SQLModel.metadata.create_all,
+                tables=[AssetType.__table__, AuditLog.__table__],
+            )
+        await engine.dispose()
+
+    asyncio.run(setup())
+
+    async def quiet(**kwargs):
+        pass
+
+    async def session():
+        async with AsyncSession(engine) as db:
+            yield db
+
+    # Exports stream on a session of their own
+    monkeypatch.setattr(v1, "engine", engine)
+    monkeypatch.setattr(action_logging, "log_activity", quiet)
+    # Pages cached by earlier tests must not match this database
+    table_versions.bump_all()
+
+    user = User(id=uuid4(), username="alice", email="alice@example.com")
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_session] = session
+    app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(app) as client:
+        yield client
+
+
+def create(client, name, description=None):
+    response = client.post(
+        "/asset_type/", json={"name": name, "description": description}
+    )
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+def test_writes_evict_cached_list_pages(client):
+    assert client.get("/asset_type/").json()["items"] == []
+    version = table_versions.get("asset_type")
+
+    create(client, "stock")
+    assert table_versions.get("asset_type") == version + 1
+    page = client.get("/asset_type/").json()
+    assert [item["name"] for item in page["items"]] == ["stock"]
+    assert page["total"] == 1
+
+    # The item routes take the id as a query parameter
+    item_id = page["items"][0]["id"]
+    response = client.put(f"/asset_type/x?item_id={item_id}", json={"name": "equity"})
+    assert response.status_code == 200
+    names = [item["name"] for item in client.get("/asset_type/").json()["items"]]
+    assert names == ["equity"]
+
+
+def test_list_etags_answer_304_until_a_write(client):
+    create(client, "stock")
+    first = client.get("/asset_type/")
+    etag = first.headers["ETag"]
+
+    again = client.get("/asset_type/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    # The query is part of the validator
+    other = client.get("/asset_type/?page_size=5", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    create(client, "bond")
+    changed = client.get("/asset_type/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["total"] == 2
+
+
+@pytest.mark.parametrize(
+    "cache_lists, coalesce", [(True, False), (False, True), (False, False)]
+)
+def test_list_pages_ignore_if_modified_since(
+    client, monkeypatch, cache_lists, coalesce
+):
+    monkeypatch.setattr(router, "cache_lists", cache_lists)
+    monkeypatch.setattr(router, "coalesce_reads", coalesce)
+    create(client, "stock")
+    bond = create(client, "bond")
+    last_modified = client.get("/asset_type/").headers["Last-Modified"]
+
+    # A hard delete of the newest row takes max(modified_at) back in time
+    response = client.delete(
+        "/asset_type/x", params={"item_id": bond["id"], "hard_delete": True}
+    )
+    assert response.status_code == 200
+    response = client.get("/asset_type/", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert response.json()["total"] == 1
+
+
+@pytest.fixture
+def exported(client, monkeypatch):
+    # Several batches per export
+    monkeypatch.setattr(settings, "EXPORT_YIELD_PER", 2)
+    for name in ["bond", "crypto", "etf", "stock", "stablecoin"]:
+        create(client, name, f"{name} desc")
+    return client
+
+
+def test_ndjson_export(exported):
+    response = exported.get("/asset_type/export?sort_by=name")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "asset_type.ndjson" in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    names = [row["name"] for row in rows]
+    assert names == ["bond", "crypto", "etf", "stablecoin", "stock"]
+    assert rows[0]["description"] == "bond desc"
+    assert list(rows[0]) == list(AssetTypeRead.model_fields)
+
+
+def test_csv_export(exported):
+    response = exported.get("/asset_type/export?format=csv&sort_by=name")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    reader = csv.DictReader(io.StringIO(response.text))
+    rows = list(reader)
+    assert reader.fieldnames == list(AssetTypeRead.model_fields)
+    names = [row["name"] for row in rows]
+    assert names == ["bond", "crypto", "etf", "stablecoin", "stock"]
+    assert rows[0]["description"] == "bond desc"
+
+
+def test_gzip_export(exported):
+    plain = exported.get("/asset_type/export?format=csv&sort_by=name").content
+    with exported.stream(
+        "GET", "/asset_type/export?format=csv&sort_by=name&gzip=true"
+    ) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == plain
+
+
+def test_exports_apply_filters(exported):
+    response = exported.get("/asset_type/export?name__prefix=st&sort_by=name")
+    names = [json.loads(line)["name"] for line in response.text.splitlines()]
+    assert names == ["stablecoin", "stock"]
+
+    response = exported.get("/asset_type/export?format=csv&description__contains=bo")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["name"] for row in rows] == ["bond"]
+
+
+def test_fields_are_trimmed_and_checked(client):
+    create(client, "stock", "stock desc")
+    response = client.get("/asset_type/", params={"fields": " name , ,name,id "})
+    assert response.status_code == 200
+    assert list(response.json()["items"][0]) == ["name", "id"]
+
+    response = client.get("/asset_type/", params={"fields": "name,secret"})
+    assert response.status_code == 400
+    assert "secret" in response.json()["detail"]
+    # Searches share the parser
+    response = client.post("/asset_type/search", params={"fields": "hashed_password"})
+    assert response.status_code == 400
+
+
+def test_blank_fields_select_every_field():
+    assert router._parse_fields(None) is None
+    assert router._parse_fields(" , ,") is None
+    assert router._parse_fields("name, description") == ["name", "description"]
+
+
+@pytest.mark.parametrize("coalesce", [True, False])
+def test_items_render_before_the_audit_log_commits(client, monkeypatch, coalesce):
+    # Logging reads commits the request session, which expires loaded rows
+    monkeypatch.setattr(settings, "LOG_USER_ACTIONS", "all")
+    monkeypatch.setattr(router, "coalesce_reads", coalesce)
+    item = create(client, "stock", "stock desc")
+
+    response = client.get("/asset_type/x", params={"item_id": item["id"]})
+    assert response.status_code == 200
+    assert response.json()["data"] == item
+    etag = response.headers["ETag"]
+
+    response = client.get(
+        "/asset_type/x", params={"item_id": item["id"]}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+def test_exports_hold_their_admission_slot_while_streaming(exported, monkeypatch):
+    limit = v1.admission.limit_for("export")
+    stream = router.service.stream
+    in_flight = []
+
+    async def watched(*args, **kwargs):
+        async for rows in stream(*args, **kwargs):
+            in_flight.append(limit.in_flight)
+            yield rows
+
+    monkeypatch.setattr(router.service, "stream", watched)
+    response = exported.get("/asset_type/export")
+    assert response.status_code == 200
+    # Held through every batch of the cursor, returned once the body is sent
+    assert in_flight == [1, 1, 1]
+    assert limit.in_flight == 0
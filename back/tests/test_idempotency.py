@@ -0,0 +1,112 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException, Request
+
+from app.config import settings
+from app.models.idempotency import IdempotencyRecord
+from app.utils.idempotency import IdempotencyStore, fingerprint
+from app.utils.serialization import ORJSONResponse
+
+USER_ID = uuid.uuid4()
+
+pytestmark = pytest.mark.parametrize("engine", [[IdempotencyRecord]], indirect=True)
+
+
+def make_request(body: bytes) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/asset_type/",
+        "query_string": b"",
+        "headers": [],
+    }
+    return Request(scope, receive)
+
+
+def test_concurrent_duplicates_execute_once(engine):
+    store = IdempotencyStore(engine)
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ORJSONResponse({"n": len(calls)})
+
+    async def scenario():
+        return await asyncio.gather(
+            *(
+                store.run(make_request(b"{}"), USER_ID, "key", "asset_type", execute)
+                for _ in range(5)
+            )
+        )
+
+    responses = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert {bytes(response.body) for response in responses} == {b'{"n":1}'}
+    replayed = [r for r in responses if r.headers.get("idempotent-replayed")]
+    assert len(replayed) == 4
+
+
+def test_key_reused_for_another_request_is_rejected(engine):
+    store = IdempotencyStore(engine)
+
+    async def execute():
+        return ORJSONResponse({})
+
+    async def scenario():
+        await store.run(make_request(b"a"), USER_ID, "key", "asset_type", execute)
+        await store.run(make_request(b"b"), USER_ID, "key", "asset_type", execute)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+
+
+def test_failed_execution_releases_the_key(engine):
+    store = IdempotencyStore(engine)
+
+    async def fail():
+        raise HTTPException(status_code=409, detail="conflict")
+
+    async def succeed():
+        return ORJSONResponse({"ok": True})
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await store.run(make_request(b"{}"), USER_ID, "key", "asset_type", fail)
+        return await store.run(
+            make_request(b"{}"), USER_ID, "key", "asset_type", succeed
+        )
+
+    response = asyncio.run(scenario())
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_abandoned_claim_frees_the_key(engine, monkeypatch):
+    store = IdempotencyStore(engine)
+
+    async def succeed():
+        return ORJSONResponse({"ok": True})
+
+    async def scenario():
+        # A worker claimed the key, then died without completing or releasing it
+        monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TTL", -1)
+        await store._claim(USER_ID, "key", await fingerprint(make_request(b"{}")))
+        monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TTL", 120)
+        response = await store.run(
+            make_request(b"{}"), USER_ID, "key", "asset_type", succeed
+        )
+        record = await store._lookup(USER_ID, "key")
+        return response, record
+
+    response, record = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+    # Completed responses are kept for the full TTL
+    assert record.expires_at > time.time() + settings.IDEMPOTENCY_TTL - 60
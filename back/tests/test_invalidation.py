@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.asset_type import AssetType
+from app.models.cache_event import CacheEvent
+from app.utils.invalidation import PollingInvalidationBus
+
+
+pytestmark = pytest.mark.parametrize("engine", [[CacheEvent, AssetType]], indirect=True)
+
+
+def buses(engine):
+    sender = PollingInvalidationBus(engine, interval=1.0, retention=60)
+    receiver = PollingInvalidationBus(engine, interval=1.0, retention=60)
+    received = []
+    receiver.subscribe(lambda table, keys: received.append((table, list(keys))))
+    return sender, receiver, received
+
+
+async def publish(bus, engine, table, keys):
+    async with AsyncSession(engine) as db:
+        await bus.publish(db, table, keys)
+
+
+def test_events_after_a_full_prune_are_delivered(engine):
+    sender, receiver, received = buses(engine)
+
+    async def run():
+        await receiver._poll()
+        await publish(sender, engine, "asset_type", ["a"])
+        await receiver._poll()
+        # A quiet period longer than the retention prunes every event
+        async with AsyncSession(engine) as db:
+            await db.exec(update(CacheEvent).values(sent_at=time.time() - 3600))
+            await db.commit()
+        await receiver._prune()
+        await publish(sender, engine, "asset_type", ["b"])
+        await receiver._poll()
+
+    asyncio.run(run())
+    assert received == [("asset_type", ["a"]), ("asset_type", ["b"])]
+
+
+def test_log_restart_resyncs_and_flushes(engine):
+    sender, receiver, received = buses(engine)
+
+    async def run():
+        await receiver._poll()
+        for key in ("a", "b", "c"):
+            await publish(sender, engine, "asset_type", [key])
+        await receiver._poll()
+        # Recreated table: ids start again from 1
+        async with engine.begin() as conn:
+            await conn.run_sync(CacheEvent.__table__.drop)
+            await conn.run_sync(CacheEvent.__table__.create)
+        await publish(sender, engine, "asset_type", ["d"])
+        await receiver._poll()
+        await publish(sender, engine, "asset_type", ["e"])
+        await receiver._poll()
+
+    asyncio.run(run())
+    assert received[3] == (None, [])
+    assert received[-1] == ("asset_type", ["e"])
+
+
+def test_a_failed_publish_leaves_the_session_usable(engine):
+    sender, _, _ = buses(engine)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(CacheEvent.__table__.drop)
+        async with AsyncSession(engine) as db:
+            asset_type = AssetType(name="stock")
+            key = asset_type.id
+            db.add(asset_type)
+            await db.commit()
+            await sender.publish(db, "asset_type", [key])
+            # As the services do after a write
+            await db.refresh(asset_type)
+            return asset_type.name
+
+    assert asyncio.run(run()) == "stock"
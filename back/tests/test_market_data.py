@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.market_quote import MarketQuote
+from app.services.market_data import FakeMarketDataProvider, refresh_quotes
+
+TICKERS = [f"T{i:03d}" for i in range(120)]
+
+
+@pytest.fixture
+def engine(engine, monkeypatch):
+    monkeypatch.setattr(settings, "MARKET_DATA_TICKERS", TICKERS)
+    monkeypatch.setattr(settings, "MARKET_DATA_BATCH_SIZE", 50)
+    return engine
+
+
+async def stored(engine):
+    async with AsyncSession(engine) as db:
+        result = await db.exec(select(MarketQuote))
+        return {quote.ticker: quote for quote in result.all()}
+
+
+def test_refresh_fetches_in_batches_and_upserts(engine):
+    clock = iter([1_000.0, 1_000.0, 1_000.0, 5_000.0, 5_000.0, 5_000.0])
+    provider = FakeMarketDataProvider(failing={"T007"}, clock=lambda: next(clock))
+
+    async def scenario():
+        first = await refresh_quotes(engine, provider)
+        before = await stored(engine)
+        second = await refresh_quotes(engine, provider)
+        return first, before, second, await stored(engine)
+
+    first, before, second, after = asyncio.run(scenario())
+    assert first == (119, ["T007"])
+    assert second == (119, ["T007"])
+    assert [len(batch) for batch in provider.calls] == [50, 50, 20] * 2
+    assert len(after) == 119
+    assert after["T001"].price != before["T001"].price
+
+
+def test_failed_batches_are_reported_per_symbol(engine):
+    class Broken(FakeMarketDataProvider):
+        async def fetch(self, symbols):
+            if "T000" in symbols:
+                raise ConnectionError("provider down")
+            return await super().fetch(symbols)
+
+    written, failed = asyncio.run(refresh_quotes(engine, Broken()))
+    assert written == 70
+    assert failed == TICKERS[:50]
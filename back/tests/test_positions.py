@@ -0,0 +1,289 @@
+import asyncio
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.current_position import CurrentPosition
+from app.models.portfolio_ledger import PortfolioLedger
+from app.models.position_snapshot import PositionSnapshot
+from app.services.positions import (
+    PositionDrift,
+    apply_entries,
+    check_positions,
+    current_positions,
+    entries_after,
+    holdings_at,
+    latest_snapshot,
+    lock_ledger,
+    portfolio_lock_key,
+    repair_positions,
+    update_current_positions,
+)
+from app.utils import logging as ledger_logging
+from app.utils.logging import record_portfolio_changes
+
+
+@pytest.fixture
+def engine(engine, monkeypatch):
+    monkeypatch.setattr(settings, "LEDGER_SNAPSHOT_EVENTS", 10)
+
+    async def quiet(**kwargs):
+        pass
+
+    monkeypatch.setattr(ledger_logging, "log_activity", quiet)
+    return engine
+
+
+def trade(portfolio_id, ticker, quantity, price=None):
+    details = {"ticker": ticker, "quantity": quantity}
+    if price is not None:
+        details["price"] = price
+    return (portfolio_id, "trade", details)
+
+
+def test_holdings_are_a_snapshot_plus_a_short_replay(engine):
+    portfolio, other = uuid4(), uuid4()
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            for i in range(35):
+                await record_portfolio_changes(
+                    db,
+                    [
+                        trade(portfolio, "AAA", 1.0),
+                        trade(portfolio, "BBB", 2.0 if i % 2 else -2.0),
+                        (portfolio, "update", {"name": f"n{i}"}),
+                        trade(other, "AAA", 5.0),
+                    ],
+                )
+            holdings = await holdings_at(db, portfolio)
+            snapshot = await latest_snapshot(db, portfolio)
+            replayed = await entries_after(db, portfolio, snapshot)
+            everything = await entries_after(db, portfolio)
+            snapshots = await db.exec(
+                select(func.count()).where(PositionSnapshot.portfolio_id == portfolio)
+            )
+            return holdings, snapshot, replayed, everything, snapshots.one()
+
+    holdings, snapshot, replayed, everything, snapshots = asyncio.run(scenario())
+    assert holdings == {"AAA": 35.0, "BBB": -2.0}
+    assert holdings == apply_entries({}, everything)
+    # 105 entries: a snapshot every 10, the last 5 replayed
+    assert snapshots == 10
+    assert snapshot.events == 100
+    assert len(replayed) == 5
+
+
+def test_point_in_time_holdings(engine):
+    portfolio = uuid4()
+    start = datetime(2024, 1, 1, 12)
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            for day in range(4):
+                # Days with fewer entries than the snapshot cadence
+                for _ in range(3):
+                    db.add(
+                        PortfolioLedger(
+                            portfolio_id=portfolio,
+                            change_type="trade",
+                            details={"ticker": "aaa", "quantity": 1.0},
+                            timestamp=start + timedelta(days=day),
+                        )
+                    )
+            await db.commit()
+            await record_portfolio_changes(db, [trade(portfolio, "AAA", 100.0)])
+            snapshots = await db.exec(select(PositionSnapshot.events))
+            past = await holdings_at(db, portfolio, start + timedelta(days=1, hours=1))
+            before = await holdings_at(db, portfolio, start - timedelta(days=1))
+            return sorted(snapshots.all()), past, before
+
+    snapshots, past, before = asyncio.run(scenario())
+    # One snapshot at the close of each earlier day
+    assert snapshots == [3, 6, 9, 12]
+    assert past == {"AAA": 6.0}
+    assert before == {}
+
+
+def test_current_positions_follow_ledger_writes(engine):
+    portfolio = uuid4()
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            await record_portfolio_changes(
+                db,
+                [
+                    trade(portfolio, "AAA", 10.0, 5.0),
+                    trade(portfolio, "AAA", 10.0, 8.0),
+                    # Sells keep the average cost
+                    trade(portfolio, "AAA", -5.0, 20.0),
+                    trade(portfolio, "BBB", 4.0, 10.0),
+                ],
+            )
+            # Unpriced trades too; then BBB crosses zero at 12
+            await record_portfolio_changes(db, [trade(portfolio, "AAA", 3.0)])
+            await record_portfolio_changes(db, [trade(portfolio, "BBB", -6.0, 12.0)])
+            await record_portfolio_changes(db, [trade(portfolio, "CCC", 1.0, 1.0)])
+            await record_portfolio_changes(db, [trade(portfolio, "CCC", -1.0, 2.0)])
+            positions = await current_positions(db, portfolio)
+            holdings = await holdings_at(db, portfolio)
+            return positions, holdings
+
+    positions, holdings = asyncio.run(scenario())
+    assert [(p.ticker, p.quantity) for p in positions] == [("AAA", 18.0), ("BBB", -2.0)]
+    assert positions[0].cost_basis == pytest.approx(18 * 6.5)
+    assert positions[1].cost_basis == pytest.approx(-24.0)
+    assert positions[1].last_event_id == 6
+    assert holdings == {"AAA": 18.0, "BBB": -2.0}
+    assert asyncio.run(check_positions(engine)) == []
+
+
+def test_consistency_check_reports_and_repairs_drift(engine):
+    portfolio = uuid4()
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            await record_portfolio_changes(
+                db,
+                [trade(portfolio, "AAA", 10.0, 5.0), trade(portfolio, "BBB", 1.0, 1.0)],
+            )
+            position = await db.get(CurrentPosition, (portfolio, "AAA"))
+            position.quantity = 7.0
+            # A position the ledger knows nothing about
+            db.add(
+                CurrentPosition(
+                    portfolio_id=portfolio, ticker="ZZZ", quantity=2.0, last_event_id=1
+                )
+            )
+            await db.commit()
+
+        drifts = await check_positions(engine, repair=True)
+        async with AsyncSession(engine) as db:
+            return drifts, await current_positions(db, portfolio)
+
+    drifts, positions = asyncio.run(scenario())
+    assert sorted((d.ticker, d.expected, d.actual) for d in drifts) == [
+        ("AAA", (10.0, 50.0), (7.0, 50.0)),
+        ("ZZZ", (0.0, 0.0), (2.0, 0.0)),
+    ]
+    assert [(p.ticker, p.quantity, p.cost_basis) for p in positions] == [
+        ("AAA", 10.0, 50.0),
+        ("BBB", 1.0, 1.0),
+    ]
+    assert asyncio.run(check_positions(engine)) == []
+
+
+def test_repair_keeps_trades_recorded_during_the_check(engine):
+    portfolio = uuid4()
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            await record_portfolio_changes(
+                db,
+                [trade(portfolio, "AAA", 10.0, 5.0), trade(portfolio, "BBB", 1.0, 1.0)],
+            )
+            # Drifts found by a check that replayed the ledger through entry 2
+            drifts = [
+                PositionDrift(portfolio, "AAA", (10.0, 50.0), (7.0, 50.0)),
+                PositionDrift(portfolio, "BBB", (0.0, 0.0), (1.0, 1.0)),
+            ]
+            # ... while both positions were traded again
+            await record_portfolio_changes(
+                db,
+                [trade(portfolio, "AAA", 5.0, 6.0), trade(portfolio, "BBB", 1.0, 2.0)],
+            )
+            await repair_positions(db, drifts, through=2)
+            await db.commit()
+            return await current_positions(db, portfolio)
+
+    positions = asyncio.run(scenario())
+    assert [(p.ticker, p.quantity, p.last_event_id) for p in positions] == [
+        ("AAA", 15.0, 3),
+        ("BBB", 2.0, 4),
+    ]
+
+
+def test_a_lower_id_committing_last_is_neither_drift_nor_repaired(engine):
+    portfolio = uuid4()
+
+    async def scenario():
+        async with AsyncSession(engine) as writer:
+            # A writer holding entry 1, flushed but not yet committed
+            await lock_ledger(writer, [portfolio])
+            entry = PortfolioLedger(
+                portfolio_id=portfolio,
+                change_type="trade",
+                details={"ticker": "AAA", "quantity": 10.0, "price": 5.0},
+                timestamp=datetime.utcnow(),
+            )
+            writer.add(entry)
+            await writer.flush()
+            await update_current_positions(writer, [entry])
+            during = await check_positions(engine, repair=True)
+            await writer.commit()
+
+        after = await check_positions(engine, repair=True)
+        async with AsyncSession(engine) as db:
+            await record_portfolio_changes(db, [trade(portfolio, "AAA", 1.0, 5.0)])
+            return during, after, await current_positions(db, portfolio)
+
+    during, after, positions = asyncio.run(scenario())
+    assert during == [] and after == []
+    assert [(p.quantity, p.cost_basis, p.last_event_id) for p in positions] == [
+        (11.0, 55.0, 2)
+    ]
+
+
+class RecordingSession:
+    """Just enough of a PostgreSQL session to see the locks taken."""
+
+    def __init__(self):
+        self.locks = []
+
+    def get_bind(self):
+        class Dialect:
+            name = "postgresql"
+
+        class Bind:
+            dialect = Dialect
+
+        return Bind
+
+    async def exec(self, statement):
+        params = statement.compile().params
+        self.locks.append((str(statement).split("(")[0], params.get("key", 0)))
+
+
+def test_ledger_writers_lock_their_portfolios_in_key_order():
+    portfolios = [uuid4() for _ in range(3)]
+    db = RecordingSession()
+    asyncio.run(lock_ledger(db, portfolios + portfolios[:1]))
+
+    keys = sorted(portfolio_lock_key(p) for p in portfolios)
+    assert db.locks == [("SELECT pg_advisory_xact_lock_shared", 0)] + [
+        ("SELECT pg_advisory_xact_lock", key) for key in keys
+    ]
+
+
+def test_ledger_writers_lock_their_portfolios_before_taking_ids(engine, monkeypatch):
+    portfolio, other = uuid4(), uuid4()
+    locked = []
+
+    async def lock(db, portfolio_ids):
+        # Before the batch is added, let alone flushed and given ids
+        locked.append((list(portfolio_ids), list(db.new)))
+
+    monkeypatch.setattr(ledger_logging, "lock_ledger", lock)
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            await record_portfolio_changes(
+                db, [trade(portfolio, "AAA", 1.0), trade(other, "BBB", 1.0)]
+            )
+
+    asyncio.run(scenario())
+    assert locked == [([portfolio, other], [])]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from app.services.price_cache import PriceSeriesCache, compact, expand
+
+
+def bars(periods):
+    return pd.DataFrame(
+        {
+            "ticker": "AAPL",
+            "close": np.arange(periods, dtype=float),
+            "volume": 1e6,
+        },
+        index=pd.bdate_range("2024-01-01", periods=periods, name="date"),
+    )
+
+
+def test_compact_dtypes_round_trip():
+    frame = bars(10)
+    compacted = compact(frame)
+    assert compacted["close"].dtype == np.float32
+    assert compacted["volume"].dtype == np.float64
+    assert isinstance(compacted["ticker"].dtype, pd.CategoricalDtype)
+    assert compacted.index.dtype == np.int64
+    assert compacted.memory_usage(deep=True).sum() < frame.memory_usage(deep=True).sum()
+
+    restored = expand(compacted)
+    assert restored.index.equals(frame.index)
+    assert restored["close"].tolist() == frame["close"].tolist()
+
+
+def test_evicts_least_recently_used_within_budget():
+    size = int(compact(bars(100)).memory_usage(deep=True).sum())
+    cache = PriceSeriesCache(max_bytes=size * 3)
+    for key in "abc":
+        cache.put(key, bars(100))
+    cache.get("a")
+    cache.put("d", bars(100))
+
+    assert cache.bytes <= cache.max_bytes
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+
+
+def test_version_change_is_a_miss():
+    cache = PriceSeriesCache(max_bytes=1 << 20)
+    cache.put("a", bars(5), version=(5, 1))
+    assert cache.get("a", version=(5, 1)) is not None
+    assert cache.get("a", version=(6, 2)) is None
+
+
+def test_oversized_frames_are_not_stored():
+    cache = PriceSeriesCache(max_bytes=100)
+    cache.put("a", bars(100))
+    assert len(cache) == 0 and cache.bytes == 0
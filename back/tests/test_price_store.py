@@ -0,0 +1,104 @@
+import asyncio
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.market_data import FakeMarketDataProvider, sync_history
+from app.services.price_store import PriceStore
+
+
+def bars(start, periods, close=100.0):
+    days = pd.bdate_range(start, periods=periods)
+    closes = close + np.arange(periods, dtype=float)
+    return pd.DataFrame(
+        {
+            "open": closes,
+            "high": closes,
+            "low": closes,
+            "close": closes,
+            "volume": 1e6,
+        },
+        index=days,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / "prices"), tail_rows=5, tail_tickers=2)
+
+
+def test_append_is_incremental(store):
+    assert store.append("AAPL", bars("2024-01-01", 10)) == 10
+    # Overlapping bars: the last stored day is replaced, older ones ignored
+    update = bars("2024-01-01", 12, close=200.0)
+    assert store.append("AAPL", update) == 3
+
+    frame = store.read("AAPL")
+    assert len(frame) == 12
+    assert frame["close"].iloc[8] == 108.0
+    assert frame["close"].iloc[9] == 209.0
+    # adj_close defaults to close
+    assert frame["adj_close"].iloc[-1] == 211.0
+
+
+def test_range_reads_are_views_of_the_files(store):
+    store.append("AAPL", bars("2024-01-01", 30))
+    frame = store.read("AAPL", "2024-01-08", "2024-01-12")
+    assert list(frame.index.day) == [8, 9, 10, 11, 12]
+    # The column is a view of the memory-mapped file
+    array = frame["close"].to_numpy()
+    while not isinstance(array, np.memmap):
+        array = array.base
+    assert store.read("MSFT").empty
+
+
+def test_tail_follows_appends(store):
+    store.append("AAPL", bars("2024-01-01", 30))
+    assert store.tail("AAPL", 3)["close"].tolist() == [127.0, 128.0, 129.0]
+    store.append("AAPL", bars("2024-02-12", 1, close=500.0))
+    assert store.tail("AAPL", 2)["close"].tolist() == [129.0, 500.0]
+    assert len(store.tail("AAPL", 20)) == 20
+    assert len(store.tail("AAPL", 100)) == 31
+
+
+def test_tail_of_no_rows_is_empty(store):
+    store.append("AAPL", bars("2024-01-01", 30))
+    assert store.tail("AAPL", 0).empty
+    assert store.tail("AAPL", -1).empty
+
+
+def test_read_many_aligns_tickers(store):
+    store.append("AAPL", bars("2024-01-01", 5))
+    store.append("MSFT", bars("2024-01-03", 5))
+    frame = store.read_many(["AAPL", "MSFT"], column="close")
+    assert len(frame) == 7
+    assert frame["MSFT"].isna().sum() == 2
+    assert frame.loc["2024-01-03", "AAPL"] == 102.0
+
+
+def test_torn_append_is_trimmed(store):
+    store.append("AAPL", bars("2024-01-01", 5))
+    # An append interrupted after writing its bars but not its dates
+    _, bars_path = store._paths("AAPL")
+    with open(bars_path, "ab") as file:
+        file.write(b"\0" * 20)
+    assert len(store.read("AAPL")) == 5
+    assert store.append("AAPL", bars("2024-01-08", 2)) == 2
+    assert len(store.read("AAPL")) == 7
+
+
+def test_sync_history_only_fetches_missing_bars(store):
+    clock = pd.Timestamp("2024-03-01 12:00", tz="UTC").timestamp()
+    provider = FakeMarketDataProvider(clock=lambda: clock)
+
+    written, failed = asyncio.run(sync_history(provider, store, ["AAPL", "MSFT"]))
+    assert failed == []
+    assert written == 2 * len(store.read("AAPL"))
+    assert store.last_date("AAPL").date() == date(2024, 3, 1)
+
+    clock = pd.Timestamp("2024-03-05 12:00", tz="UTC").timestamp()
+    written, _ = asyncio.run(sync_history(provider, store, ["AAPL", "MSFT"]))
+    # Friday's bar is refreshed, Monday and Tuesday are new
+    assert written == 2 * 3
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.asset_type import AssetType, AssetTypeFilter
+from app.services.asset_type import AssetTypeService
+from app.services.filters import compile_filter
+
+service = AssetTypeService()
+
+
+@pytest.fixture
+def engine(engine):
+    async def setup():
+        async with AsyncSession(engine) as db:
+            db.add_all(
+                AssetType(name=f"type-{i}", is_active=i % 10 != 0) for i in range(500)
+            )
+            await db.commit()
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+
+    asyncio.run(setup())
+    return engine
+
+
+def query_plans(engine, operation):
+    """Run a service operation and return the query plan of each SELECT it ran."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    async def run():
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", capture)
+        try:
+            async with AsyncSession(engine) as db:
+                await operation(db)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", capture)
+
+        plans = []
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )
+                plans.append(" | ".join(row[3] for row in result))
+        return plans
+
+    return asyncio.run(run())
+
+
+def assert_indexed(plans, index_name):
+    """Every query reads asset_type through index_name and sorts nothing."""
+    assert plans
+    for plan in plans:
+        steps = [step for step in plan.split(" | ") if "asset_type" in step]
+        assert steps and all(index_name in step for step in steps), plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+def test_get_all_uses_active_id_index(engine):
+    plans = query_plans(engine, lambda db: service.get_all(db, limit=10))
+    assert_indexed(plans, "ix_asset_type_active_id")
+
+
+def test_get_all_sorted_by_modified_at_uses_index(engine):
+    plans = query_plans(
+        engine,
+        lambda db: service.get_all(
+            db, limit=10, sort_by="modified_at", sort_order="desc"
+        ),
+    )
+    assert_indexed(plans, "ix_asset_type_active_modified_at")
+
+
+def test_count_uses_index(engine):
+    plans = query_plans(engine, lambda db: service.count(db))
+    assert plans
+    for plan in plans:
+        assert "COVERING INDEX" in plan, plan
+
+
+def test_get_by_id_uses_primary_key(engine):
+    async def operation(db):
+        obj = (await service.get_all(db, limit=1))[0]
+        await service.get_by_id(db, obj.id)
+
+    plans = query_plans(engine, operation)
+    assert "sqlite_autoindex_asset_type_1" in plans[-1], plans[-1]
+
+
+def test_lookup_by_name_uses_unique_index(engine):
+    plans = query_plans(engine, lambda db: service.get_by_name("type-1", db=db))
+    assert_indexed(plans, "uq_asset_type_name_active")
+
+    plans = query_plans(
+        engine, lambda db: service.count(db, filters=AssetTypeFilter(name="type-1"))
+    )
+    assert_indexed(plans, "uq_asset_type_name_active")
+
+
+def test_prefix_filter_uses_the_name_index(engine):
+    filters = AssetTypeFilter(name__prefix="type-4")
+    plans = query_plans(engine, lambda db: service.count(db, filters=filters))
+    assert_indexed(plans, "uq_asset_type_name_active")
+
+
+def test_prefix_filter_is_a_like_pattern_on_postgresql(engine):
+    compiled = compile_filter(AssetType, AssetTypeFilter, "postgresql")
+    (clause,) = compiled.clauses(AssetTypeFilter(name__prefix="a_b%"))
+    sql = clause.compile(dialect=postgresql.dialect())
+    # No range: PostgreSQL collations need not sort by code point
+    assert str(sql) == "asset_type.name LIKE %(name_1)s ESCAPE '/'"
+    assert sql.params == {"name_1": "a/_b/%%"}
+
+    (index,) = [i for i in AssetType.__table__.indexes if i.name.endswith("prefix")]
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    assert "(name text_pattern_ops) WHERE is_active = true" in ddl
+
+    async def sqlite_indexes():
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+            return result.scalars().all()
+
+    assert index.name not in asyncio.run(sqlite_indexes())
+
+
+def test_name_unique_among_active_rows_only(engine):
+    async def operation():
+        async with AsyncSession(engine) as db:
+            obj = await service.get_by_name("type-1", db=db)
+            deleted = obj.id
+            await service.delete(db, deleted)
+            # The name of a soft-deleted row can be reused
+            db.add(AssetType(name="type-1"))
+            await db.commit()
+            reused = await service.get_by_name("type-1", db=db)
+            assert reused.id != deleted
+
+            db.add(AssetType(name="type-1"))
+            with pytest.raises(IntegrityError, match="UNIQUE constraint failed"):
+                await db.commit()
+
+    asyncio.run(operation())
+
+
+def test_version_reads_only_the_index(engine):
+    plans = query_plans(engine, lambda db: service.version(db))
+    assert plans
+    for plan in plans:
+        assert "COVERING INDEX ix_asset_type_active_modified_at" in plan, plan
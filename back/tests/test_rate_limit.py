@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.utils.rate_limit import (
+    LocalRateLimitBackend,
+    Quota,
+    SharedRateLimitBackend,
+    take_token,
+)
+from app.utils.shared_cache import SharedCache
+
+
+def test_parse_quota():
+    quota = Quota.parse("120/minute")
+    assert (quota.limit, quota.period) == (120, 60)
+    with pytest.raises(ValueError):
+        Quota.parse("120/fortnight")
+
+
+def test_bucket_refills_over_time():
+    quota = Quota(2, 10)
+    state, first = take_token(None, quota, 0.0)
+    state, second = take_token(state, quota, 0.0)
+    state, third = take_token(state, quota, 0.0)
+    assert (first.allowed, second.allowed, third.allowed) == (True, True, False)
+    assert third.retry_after == pytest.approx(5.0)
+    assert third.headers()["Retry-After"] == "5"
+
+    # One token back after 5 seconds
+    _, fourth = take_token(state, quota, 5.0)
+    assert fourth.allowed and fourth.remaining == 0
+
+
+def test_local_backend_is_bounded_and_expires_full_buckets():
+    backend = LocalRateLimitBackend(max_keys=10)
+    quota = Quota(5, 1)
+
+    async def scenario():
+        for i in range(100):
+            await backend.take(f"user:{i}", quota, 0.0)
+        assert len(backend) == 10
+        # All buckets have refilled: they are dropped as new requests arrive
+        for i in range(3):
+            await backend.take(f"late:{i}", quota, 10.0)
+
+    asyncio.run(scenario())
+    assert len(backend) < 10
+
+
+def test_shared_backend_spends_one_budget_across_workers(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    first = SharedRateLimitBackend(SharedCache(path, slots=64, slot_size=192))
+    second = SharedRateLimitBackend(SharedCache(path, slots=64, slot_size=192))
+    quota = Quota(3, 60)
+
+    async def scenario():
+        return [
+            (await backend.take("user:1", quota, 0.0)).allowed
+            for backend in (first, second, first, second)
+        ]
+
+    assert asyncio.run(scenario()) == [True, True, True, False]
+    first.close()
+    second.close()
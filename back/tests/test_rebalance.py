@@ -0,0 +1,130 @@
+import asyncio
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.asset_type import AssetType
+from app.models.current_position import CurrentPosition
+from app.models.rebalance import RebalanceRequest
+from app.services.rebalance import (
+    compute_rebalance,
+    mean_variance_weights,
+    rebalance_portfolios,
+    rebalance_trades,
+)
+
+
+def test_trades_respect_lots_minimum_and_cash():
+    rng = np.random.default_rng(2)
+    quantities = rng.integers(0, 200, (50, 6)).astype(float)
+    prices = rng.uniform(5, 300, 6)
+    weights = rng.dirichlet(np.ones(6), 50)
+    lots = np.array([1, 1, 10, 1, 0.5, 100.0])
+
+    trades, cash = rebalance_trades(quantities, prices, weights, lots, 100.0)
+    value = (trades * prices)[trades != 0]
+    assert (np.abs(value) >= 100.0 - 1e-9).all()
+    # Whole lots, or all of an odd holding
+    whole = np.isclose(trades / lots, np.round(trades / lots))
+    assert (whole | (quantities + trades == 0)).all()
+    assert (quantities + trades >= 0).all()
+    # Sells pay for buys, nothing is left uninvested beyond rounding
+    assert (cash >= -1e-9).all()
+    assert np.allclose(cash, -(trades * prices).sum(axis=1))
+    after = (quantities + trades) * prices
+    total = (quantities * prices).sum(axis=1, keepdims=True)
+    gap = np.abs(after / total - weights).sum(axis=1)
+    room = (np.maximum(lots * prices, 100.0).sum() + cash) / total[:, 0]
+    assert (gap <= 2 * room).all()
+
+
+def test_mean_variance_weights_are_best_feasible():
+    rng = np.random.default_rng(4)
+    loadings = rng.normal(0, 0.1, (5, 2))
+    covariance = loadings @ loadings.T + np.diag(rng.uniform(0.01, 0.04, 5))
+    mean = np.array([0.08, 0.02, 0.12, 0.04, 0.05])
+    type_index = np.array([0, 0, 0, 1, 1])
+    targets = np.array([0.7, 0.3])
+
+    best = mean_variance_weights(mean, covariance, type_index, targets, 4.0)
+    assert (best >= 0).all()
+    assert [best[:3].sum(), best[3:].sum()] == pytest.approx(targets)
+
+    def utility(w):
+        return mean @ w - 2.0 * w @ covariance @ w
+
+    # No feasible long-only mix does better
+    stocks = rng.dirichlet(np.ones(3), 20_000) * 0.7
+    bonds = rng.dirichlet(np.ones(2), 20_000) * 0.3
+    candidates = np.hstack([stocks, bonds])
+    utilities = candidates @ mean - 2.0 * np.einsum(
+        "ij,jk,ik->i", candidates, covariance, candidates
+    )
+    assert utility(best) >= utilities.max() - 1e-9
+
+
+def test_rebalance_reaches_type_targets():
+    a, b = uuid4(), uuid4()
+    positions = pd.DataFrame(
+        [
+            (a, "AAA", 100.0),
+            (a, "BBB", 10.0),
+            (a, "OLD", 5.0),  # Not classified: untouched
+            (b, "CCC", 40.0),
+        ],
+        columns=["portfolio_id", "ticker", "quantity"],
+    )
+    prices = pd.Series({"AAA": 50.0, "BBB": 100.0, "CCC": 20.0, "OLD": 10.0})
+    request = RebalanceRequest(
+        targets={"stock": 0.6, "fixed-income": 0.4},
+        asset_types={"aaa": "stock", "bbb": "stock", "CCC": "fixed-income"},
+        min_trade=0.0,
+    )
+
+    result = compute_rebalance(positions, request, prices)
+    assert result.drift[a] == pytest.approx(0.4)
+    assert result.drift[b] == pytest.approx(0.6)
+    assert "OLD" not in set(result.trades["ticker"])
+    assert (result.cash >= 0).all()
+
+    trades = result.trades.set_index(["portfolio_id", "ticker"])["quantity"]
+    # a holds AAA and BBB 5:1 and keeps that mix within stocks
+    assert trades[(a, "AAA")] == -40 and trades[(a, "BBB")] == -4
+    assert trades[(a, "CCC")] == 120
+    # b holds no stock: an even split over AAA and BBB
+    assert trades[(b, "CCC")] == -24
+    assert trades[(b, "AAA")] == 4 and trades[(b, "BBB")] == 2
+
+    with pytest.raises(HTTPException) as error:
+        compute_rebalance(
+            positions, request.model_copy(update={"targets": {"stock": 0.9}}), prices
+        )
+    assert error.value.status_code == 422
+
+
+@pytest.mark.parametrize("engine", [[AssetType, CurrentPosition]], indirect=True)
+def test_rebalance_checks_asset_types(engine):
+    async def run(request):
+        async with AsyncSession(engine) as db:
+            db.add(AssetType(name="stock"))
+            await db.commit()
+            return await rebalance_portfolios(db, request)
+
+    request = RebalanceRequest(targets={"gold": 1.0}, asset_types={"GLD": "gold"})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run(request))
+    assert error.value.status_code == 422
+    assert "gold" in error.value.detail
+
+
+@pytest.mark.parametrize("lot", [0.0, -1.0])
+def test_lot_sizes_must_be_positive(lot):
+    with pytest.raises(ValidationError):
+        RebalanceRequest.model_validate(
+            {"targets": {"stock": 1.0}, "asset_types": {}, "lot_sizes": {"AAA": lot}}
+        )
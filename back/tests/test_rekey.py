@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import create_engine, select
+from sqlmodel import SQLModel
+
+from app.models.asset_type import AssetType
+from app.models.audit_log import AuditLog
+from app.models.user import User
+from app.services.rekey import rekey_all
+
+
+def test_rekey_rewrites_rows_and_references_but_not_users(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rekey.db'}")
+    tables = [AssetType.__table__, AuditLog.__table__, User.__table__]
+    SQLModel.metadata.create_all(engine, tables=tables)
+    start = datetime(2024, 1, 1)
+    user_id, first, second = uuid4(), uuid4(), uuid4()
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": user_id,
+                    "username": "a",
+                    "email": "a@b.c",
+                    "hashed_password": "x",
+                }
+            ],
+        )
+        conn.execute(
+            AssetType.__table__.insert(),
+            [
+                {"id": second, "name": "crypto", "created_at": start + timedelta(1)},
+                {"id": first, "name": "stock", "created_at": start},
+            ],
+        )
+        conn.execute(
+            AuditLog.__table__.insert(),
+            [
+                {
+                    "user_id": user_id,
+                    "action": "create",
+                    "target_type": "asset_type",
+                    "target_id": first,
+                    "details": {},
+                    "timestamp": start,
+                }
+            ],
+        )
+
+        counts = rekey_all(conn)
+
+    assert counts["asset_type"] == 2
+    assert "user" not in counts
+    with engine.connect() as conn:
+        ids = (
+            conn.execute(select(AssetType.id).order_by(AssetType.created_at))
+            .scalars()
+            .all()
+        )
+        audit = conn.execute(select(AuditLog.user_id, AuditLog.target_id)).one()
+        assert conn.execute(select(User.id)).scalar_one() == user_id
+    assert all(value.version == 7 for value in ids)
+    # New ids sort in creation order
+    assert ids == sorted(ids)
+    assert audit == (user_id, ids[0])
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.returns import compute_returns, daily_returns, solve_xirr
+from app.services.valuation import TRADE_COLUMNS, value_portfolios
+
+DATES = pd.bdate_range("2023-01-02", "2024-06-28")
+
+
+def test_time_weighted_returns_ignore_cash_flows():
+    # A price doubling over the period, bought in two lots
+    prices = pd.DataFrame({"AAA": np.linspace(100.0, 200.0, len(DATES))}, index=DATES)
+    trades = pd.DataFrame(
+        [
+            ("p1", DATES[0], "AAA", 10.0, np.nan),
+            ("p1", DATES[200], "AAA", 90.0, np.nan),
+            ("p2", DATES[0], "AAA", 1.0, np.nan),
+        ],
+        columns=TRADE_COLUMNS,
+    )
+    valuation = value_portfolios(trades, prices)
+    returns = compute_returns(valuation)
+
+    close = prices["AAA"]
+    # Both hold the same security: same TWR whatever the flows
+    assert returns.twr.loc["p1"].tolist() == pytest.approx(
+        returns.twr.loc["p2"].tolist()
+    )
+    assert returns.twr.loc["p1", "ITD"] == pytest.approx(1.0)
+    assert returns.twr.loc["p1", "YTD"] == pytest.approx(
+        close.iloc[-1] / close["2023-12-29"] - 1
+    )
+    assert returns.twr.loc["p1", "1M"] == pytest.approx(
+        close.iloc[-1] / close["2024-05-28"] - 1
+    )
+    assert (daily_returns(valuation)["p1"] >= 0).all()
+    # Most money came in late: the money-weighted return differs
+    assert returns.xirr.loc["p1", "ITD"] != pytest.approx(returns.xirr.loc["p2", "ITD"])
+
+
+def test_xirr_matches_known_rates():
+    # 100 invested, 110 a year later; 100 in, 50 out after 6 months, 60 after a year
+    amounts = np.array([[-100.0, 110.0, 0.0], [-100.0, 50.0, 60.0], [0.0, 0.0, 0.0]])
+    years = np.array([[0.0, 1.0, 0.0], [0.0, 0.5, 1.0], [0.0, 0.0, 0.0]])
+    rates = solve_xirr(amounts, years)
+    assert rates[0] == pytest.approx(0.1)
+    npv = -100 + 50 / (1 + rates[1]) ** 0.5 + 60 / (1 + rates[1])
+    assert npv == pytest.approx(0.0, abs=1e-8)
+    assert np.isnan(rates[2])
+
+
+def test_xirr_of_every_window_solves_its_cash_flows():
+    rng = np.random.default_rng(3)
+    prices = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(DATES), 3)), axis=0)),
+        index=DATES,
+        columns=["A", "B", "C"],
+    )
+    trades = pd.DataFrame(
+        [
+            (
+                f"p{rng.integers(5)}",
+                DATES[rng.integers(len(DATES))],
+                "ABC"[i % 3],
+                float(rng.integers(1, 20)),
+                np.nan,
+            )
+            for i in range(60)
+        ],
+        columns=TRADE_COLUMNS,
+    )
+    valuation = value_portfolios(trades, prices)
+    returns = compute_returns(valuation, end="2024-06-14")
+
+    # Check the 3 month window of one portfolio with a scalar present value
+    end = DATES.searchsorted(pd.Timestamp("2024-06-14"))
+    base = DATES.searchsorted(pd.Timestamp("2024-03-14"), "right") - 1
+    market_value = valuation.market_value["p1"]
+    flows = valuation.flows["p1"]
+    rate = returns.xirr.loc["p1", "3M"]
+
+    def years(day):
+        return (DATES[day] - DATES[base]).days / 365.0
+
+    npv = -market_value.iloc[base] + market_value.iloc[end] / (1 + rate) ** years(end)
+    for day in range(base + 1, end + 1):
+        npv -= flows.iloc[day] / (1 + rate) ** years(day)
+    assert npv == pytest.approx(0.0, abs=1e-6)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.price_store import PriceStore
+from app.services.risk import RISK_COLUMNS, risk_key, rolling_risk, update_risk
+
+
+def test_rolling_metrics_match_each_window():
+    rng = np.random.default_rng(11)
+    returns = rng.normal(0.0005, 0.02, (120, 3))
+    returns[:30, 2] = np.nan  # Listed later
+    benchmark = rng.normal(0.0003, 0.01, 120)
+    window = 40
+
+    metrics = rolling_risk(returns, benchmark, window, 0.9, chunk_cells=1)
+    assert np.isnan(metrics[:, : window - 1]).all()
+    assert np.isnan(metrics[:, 30 + window - 2, 2]).all()
+
+    for end in (window - 1, 77, 119):
+        x = returns[end - window + 1 : end + 1, 0]
+        b = benchmark[end - window + 1 : end + 1]
+        wealth = np.concatenate([[1.0], np.cumprod(1 + x)])
+        expected = [
+            x.std(ddof=1) * np.sqrt(252),
+            np.cov(x, b)[0, 1] / b.var(ddof=1),
+            (x - b).std(ddof=1) * np.sqrt(252),
+            -(wealth / np.maximum.accumulate(wealth) - 1).min(),
+            -np.sort(x)[3],
+            -np.sort(x)[:4].mean(),
+        ]
+        assert metrics[:6, end, 0] == pytest.approx(expected, rel=1e-8)
+        # Parametric VaR at 90%: 1.2816 standard deviations below the mean
+        assert metrics[6, end, 0] == pytest.approx(
+            1.2815516 * x.std(ddof=1) - x.mean(), rel=1e-6
+        )
+
+
+def test_update_only_recomputes_new_days(tmp_path):
+    rng = np.random.default_rng(5)
+    days = pd.bdate_range("2023-01-02", periods=90)
+    prices = PriceStore(str(tmp_path / "prices"))
+    for ticker, start in (("AAA", 0), ("BBB", 20), ("SPY", 0)):
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.01, 90 - start))
+        prices.append(ticker, pd.DataFrame({"close": close}, index=days[start:]))
+
+    def computed(path):
+        store = PriceStore(str(tmp_path / path), columns=RISK_COLUMNS)
+        update_risk(["AAA", "BBB"], "SPY", 30, prices, store)
+        return store
+
+    incremental = computed("risk")
+    first = incremental.read(risk_key("AAA", "SPY", 30))
+    assert first.index[0] == days[30]
+    assert incremental.read(risk_key("BBB", "SPY", 30)).index[0] == days[50]
+
+    more = pd.bdate_range(days[-1], periods=11)
+    for ticker in ("AAA", "BBB", "SPY"):
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.01, 11))
+        prices.append(ticker, pd.DataFrame({"close": close}, index=more))
+    # The last stored day is recomputed with its final bar, then 10 new days
+    assert update_risk(["AAA", "BBB"], "SPY", 30, prices, incremental) == 2 * 11
+
+    scratch = computed("scratch")
+    for ticker in ("AAA", "BBB"):
+        key = risk_key(ticker, "SPY", 30)
+        pd.testing.assert_frame_equal(
+            incremental.read(key), scratch.read(key), check_exact=False, rtol=1e-9
+        )
@@ -0,0 +1,32 @@
+import os
+
+from app.config import settings
+from app.utils import scheduler
+from app.utils.scheduler import elect, stop_scheduler, try_lock
+
+
+def test_one_holder_at_a_time(tmp_path):
+    path = str(tmp_path / "lock")
+    holder = try_lock(path)
+    assert holder is not None
+    # flock locks belong to the open file, so this stands in for another worker
+    assert try_lock(path) is None
+
+    os.close(holder)
+    standby = try_lock(path)
+    assert standby is not None
+    os.close(standby)
+
+
+def test_standby_takes_over_once_the_runner_exits(tmp_path, monkeypatch):
+    path = str(tmp_path / "lock")
+    monkeypatch.setattr(settings, "SCHEDULER_LOCK_PATH", path)
+    runner = try_lock(path)
+    try:
+        assert not elect()
+    finally:
+        os.close(runner)
+    assert elect()
+    assert scheduler.scheduler_lock is not None
+    stop_scheduler()
+    assert scheduler.scheduler_lock is None
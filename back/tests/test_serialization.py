@@ -0,0 +1,51 @@
+import asyncio
+from uuid import UUID
+
+import orjson
+import pytest
+from pydantic import field_serializer
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.asset_type import AssetType, AssetTypeRead
+from app.utils.serialization import RowSerializer, dumps
+
+
+class ShoutingRead(SQLModel):
+    id: UUID
+    name: str
+    description: str | None = None
+
+    @field_serializer("name")
+    def shout(self, name: str) -> str:
+        return name.upper()
+
+
+def rendered(serializer, obj):
+    return orjson.loads(dumps(serializer.dump(obj)))
+
+
+@pytest.mark.parametrize("schema", [AssetTypeRead, ShoutingRead])
+def test_dump_matches_the_read_schema(schema):
+    row = AssetType(name="equity", description="Listed shares")
+    assert rendered(RowSerializer(schema), row) == schema.model_validate(
+        row
+    ).model_dump(mode="json")
+
+
+@pytest.mark.parametrize("engine", [[AssetType]], indirect=True)
+def test_unloaded_columns_fail_loudly(engine):
+    serializer = RowSerializer(AssetTypeRead)
+
+    async def scenario():
+        async with AsyncSession(engine) as db:
+            row = AssetType(name="equity")
+            db.add(row)
+            # Commit expires the row: reading it back would need a query
+            await db.commit()
+            with pytest.raises(RuntimeError, match="not loaded"):
+                serializer.dump(row)
+            await db.refresh(row)
+            assert serializer.dump(row)["name"] == "equity"
+
+    asyncio.run(scenario())
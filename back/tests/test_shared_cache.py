@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import random
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.auth.security import principal_values
+from app.models.user import User
+from app.utils.shared_cache import SharedCache, default_path, private_directory
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache"), slots=64, slot_size=256)
+    yield cache
+    cache.close()
+
+
+def test_get_set(cache):
+    assert cache.get("asset_type:1") is None
+    assert cache.set("asset_type:1", {"name": "equity"}, cache.version("asset_type"))
+    assert cache.get("asset_type:1") == {"name": "equity"}
+
+
+def test_invalidate_drops_rows(cache):
+    cache.set("asset_type:1", 1, cache.version("asset_type"))
+    cache.set("asset_type:2", 2, cache.version("asset_type"))
+    cache.set("user:1", 3, cache.version("user"))
+
+    cache.invalidate("asset_type", ["1"])
+    assert cache.get("asset_type:1") is None
+    assert cache.get("asset_type:2") == 2
+
+    cache.invalidate("asset_type")
+    assert cache.get("asset_type:2") is None
+    assert cache.get("user:1") == 3
+
+    cache.clear()
+    assert cache.get("user:1") is None
+
+
+def test_set_refuses_values_read_before_a_write(cache):
+    version = cache.version("asset_type")
+    # A write commits between our read and our store
+    cache.invalidate("asset_type", ["1"])
+    assert not cache.set("asset_type:1", "old", version)
+    assert cache.get("asset_type:1") is None
+
+
+def test_oversized_values_are_not_stored(cache):
+    assert not cache.set("asset_type:1", "x" * 1024, cache.version("asset_type"))
+
+
+def test_memory_is_bounded(cache):
+    for i in range(1000):
+        cache.set(f"asset_type:{i}", i, cache.version("asset_type"))
+    stored = sum(cache.get(f"asset_type:{i}") is not None for i in range(1000))
+    assert 0 < stored <= cache.slots
+
+
+def test_mapping_is_shared(tmp_path):
+    path = str(tmp_path / "cache")
+    first = SharedCache(path, slots=64, slot_size=256)
+    second = SharedCache(path, slots=64, slot_size=256)
+    first.set("user:1", "alice", first.version("user"))
+    assert second.get("user:1") == "alice"
+    second.invalidate("user", ["1"])
+    assert first.get("user:1") is None
+    first.close()
+    second.close()
+
+
+def test_values_keep_their_types(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache"), slots=64, slot_size=1024)
+    row = {
+        "id": uuid4(),
+        "created_at": datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+        "day": date(2024, 1, 2),
+        "price": Decimal("1.10"),
+        "tags": {"$uuid": "not", "other": 1},
+        "name": "equity",
+    }
+    assert cache.set("asset_type:1", row, cache.version("asset_type"))
+    assert cache.get("asset_type:1") == row
+    # Values JSON cannot hold are refused, not pickled
+    assert not cache.set("asset_type:2", object(), cache.version("asset_type"))
+    cache.close()
+
+
+def test_files_other_users_can_reach_are_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.touch(mode=0o644)
+    os.chmod(shared, 0o644)
+    with pytest.raises(RuntimeError):
+        SharedCache(str(shared), slots=64, slot_size=256)
+
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path / "target")
+    with pytest.raises(OSError):
+        SharedCache(str(link), slots=64, slot_size=256)
+    assert not (tmp_path / "target").exists()
+
+
+def test_default_files_live_in_a_private_directory():
+    directory = private_directory()
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+    assert os.path.dirname(default_path(64, 256)) == directory
+
+
+def test_another_layout_is_refused_not_reformatted(tmp_path):
+    path = str(tmp_path / "cache")
+    first = SharedCache(path, slots=64, slot_size=256)
+    first.set("user:1", "alice", first.version("user"))
+    with pytest.raises(RuntimeError):
+        SharedCache(path, slots=32, slot_size=256)
+    # The mapping in use is left intact
+    assert first.get("user:1") == "alice"
+    first.close()
+
+
+def test_default_path_depends_on_the_layout():
+    assert default_path(64, 256) != default_path(32, 256)
+    assert default_path(64, 256) != default_path(64, 512)
+
+
+def test_cached_principals_carry_no_credentials():
+    user = User(username="alice", email="alice@example.com", hashed_password="x")
+    values = principal_values(user)
+    assert "hashed_password" not in values
+    assert User(**values).username == "alice"
+
+
+def _hammer(path):
+    cache = SharedCache(path, slots=32, slot_size=512)
+    torn = 0
+    for _ in range(5000):
+        key = f"t:{random.randrange(64)}"
+        if random.random() < 0.5:
+            size = random.randrange(300)
+            cache.set(key, (key, "x" * size), cache.version("t"))
+        else:
+            value = cache.get(key)
+            if value is not None and value[0] != key:
+                torn += 1
+    cache.close()
+    return torn
+
+
+def test_concurrent_processes_never_read_torn_entries(tmp_path):
+    path = str(tmp_path / "cache")
+    SharedCache(path, slots=32, slot_size=512).close()
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        assert pool.map(_hammer, [path] * 4) == [0, 0, 0, 0]
@@ -0,0 +1,97 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.simulation import (
+    QuantileSketch,
+    ReturnModel,
+    fit_returns,
+    simulate,
+)
+
+
+def test_merged_sketches_track_exact_quantiles():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(0, 1, (2, 40_000))
+    values[1, :12_000] = 0.0  # Depleted paths tie at 0
+
+    sketch = None
+    for chunk in np.split(values, 8, axis=1):
+        part = QuantileSketch.of(chunk, 1001)
+        sketch = part if sketch is None else sketch.merge(part)
+
+    levels = [0.05, 0.25, 0.5, 0.75, 0.95]
+    assert sketch.weight == 40_000
+    expected = np.quantile(values, levels, axis=1).T
+    assert sketch.quantiles(levels) == pytest.approx(expected, rel=0.01)
+    assert (sketch.quantiles([0.05, 0.25])[1] == 0).all()
+
+
+def test_simulation_is_reproducible_across_executors(monkeypatch):
+    monkeypatch.setattr("app.config.settings.SIMULATION_WORKERS", 0)
+    monkeypatch.setattr("app.config.settings.SIMULATION_CHUNK_PATHS", 1_000)
+    covariance = np.array([[0.0016, 0.0004], [0.0004, 0.0009]])
+    model = ReturnModel(
+        ["AAA", "BBB"], np.array([0.006, 0.004]), np.linalg.cholesky(covariance)
+    )
+    weights = np.array([0.6, 0.4])
+
+    def run(executor=None):
+        return asyncio.run(
+            simulate(model, weights, 1e5, 500.0, 10, 4_500, 2e5, 7, executor)
+        )
+
+    threads = run()
+    with ProcessPoolExecutor(
+        2, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        processes = run(pool)
+    pd.testing.assert_frame_equal(threads.percentiles, processes.percentiles)
+    assert threads.goal_probability == processes.goal_probability
+    assert 0 < threads.goal_probability < 1
+    assert threads.depleted_probability == 0
+
+    bands = threads.percentiles
+    assert list(bands.index) == list(range(11))
+    assert (bands.iloc[0] == 1e5).all()
+    assert (bands.diff(axis=1).iloc[:, 1:] >= 0).all().all()
+    assert run().percentiles.equals(bands)
+
+
+def test_certain_returns_give_one_path(monkeypatch):
+    monkeypatch.setattr("app.config.settings.SIMULATION_WORKERS", 0)
+    model = ReturnModel(["AAA"], np.array([0.01]), np.zeros((1, 1)))
+    projection = asyncio.run(
+        simulate(model, np.array([1.0]), 1_000.0, -50.0, 3, 200, 1.0, 1)
+    )
+    value = 1_000.0
+    for _ in range(36):
+        value = max(value * np.exp(0.01) - 50.0, 0.0)
+    final = projection.percentiles.iloc[-1]
+    assert final.to_numpy() == pytest.approx([value] * len(final))
+    assert projection.goal_probability == 0
+    assert projection.depleted_probability == 1
+
+
+def test_return_model_from_month_end_prices():
+    rng = np.random.default_rng(9)
+    months = pd.date_range("2015-01-31", periods=61, freq="ME")
+    log_returns = rng.normal([0.01, 0.005], [0.04, 0.02], (60, 2))
+    closes = 100 * np.exp(np.vstack([[0, 0], np.cumsum(log_returns, axis=0)]))
+    # Daily rows, the month end last in each month
+    days = months - pd.Timedelta(days=3)
+    prices = pd.concat(
+        [
+            pd.DataFrame(closes * 0.9, index=days, columns=["AAA", "BBB"]),
+            pd.DataFrame(closes, index=months, columns=["AAA", "BBB"]),
+        ]
+    ).sort_index()
+
+    model = fit_returns(prices)
+    assert model.mean == pytest.approx(log_returns.mean(axis=0))
+    covariance = np.cov(log_returns, rowvar=False)
+    assert model.factor @ model.factor.T == pytest.approx(covariance)
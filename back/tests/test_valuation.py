@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.valuation import TRADE_COLUMNS, value_portfolios
+
+DATES = pd.bdate_range("2024-01-01", periods=4)
+PRICES = pd.DataFrame(
+    {"AAA": [10.0, 11.0, 12.0, 13.0], "BBB": [100.0, 100.0, 90.0, np.nan]},
+    index=DATES,
+)
+
+
+def trades(*rows):
+    return pd.DataFrame(list(rows), columns=TRADE_COLUMNS)
+
+
+def test_market_value_pnl_and_weights():
+    valuation = value_portfolios(
+        trades(
+            # Opening position, valued at the first close
+            ("p1", pd.Timestamp("2023-12-15"), "AAA", 10.0, 5.0),
+            ("p1", DATES[1], "BBB", 1.0, 95.0),
+            ("p2", DATES[2], "AAA", 5.0, np.nan),
+            ("p2", DATES[3], "AAA", -5.0, 14.0),
+        ),
+        PRICES,
+    )
+    assert valuation.market_value["p1"].tolist() == [100.0, 210.0, 210.0, 220.0]
+    # Day 1 also earns the 5 below the close paid for BBB; BBB is carried at 90
+    assert valuation.pnl["p1"].tolist() == [0.0, 15.0, 0.0, 10.0]
+    assert valuation.market_value["p2"].tolist() == [0.0, 0.0, 60.0, 0.0]
+    # Up 1 a share on the day, and sold 1 above the close
+    assert valuation.pnl["p2"].tolist() == [0.0, 0.0, 0.0, 10.0]
+    assert valuation.weights.loc["p1"].tolist() == pytest.approx([130 / 220, 90 / 220])
+    assert valuation.weights.loc["p2"].tolist() == [0.0, 0.0]
+
+
+def test_portfolios_worth_nothing_have_no_weights():
+    # Long 90 AAA and short 13 BBB are worth 1170 each on the last day
+    valuation = value_portfolios(
+        trades(
+            ("p1", DATES[0], "AAA", 90.0, 10.0),
+            ("p1", DATES[0], "BBB", -13.0, 100.0),
+        ),
+        PRICES,
+    )
+    assert valuation.market_value["p1"].iloc[-1] == 0.0
+    assert valuation.weights.loc["p1"].tolist() == [0.0, 0.0]
+
+
+def test_chunking_does_not_change_results():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2024-01-01", periods=60)
+    prices = pd.DataFrame(
+        rng.uniform(10, 100, (60, 8)), index=dates, columns=list("ABCDEFGH")
+    )
+    rows = [
+        (
+            f"p{rng.integers(25)}",
+            dates[rng.integers(60)],
+            "ABCDEFGH"[rng.integers(8)],
+            float(rng.integers(-5, 10)),
+            float(rng.uniform(10, 100)),
+        )
+        for _ in range(400)
+    ]
+    whole = value_portfolios(trades(*rows), prices, chunk_cells=10**9)
+    chunked = value_portfolios(trades(*rows), prices, chunk_cells=1)
+
+    pd.testing.assert_frame_equal(whole.market_value, chunked.market_value)
+    pd.testing.assert_frame_equal(whole.pnl, chunked.pnl)
+    pd.testing.assert_frame_equal(whole.weights, chunked.weights)
+
+    # Against a position-by-position loop
+    holdings = {}
+    for portfolio, day, ticker, quantity, _ in rows:
+        series = holdings.setdefault((portfolio, ticker), pd.Series(0.0, dates))
+        series[series.index >= day] += quantity
+    expected = pd.Series(0.0, dates)
+    for (portfolio, ticker), series in holdings.items():
+        if portfolio == "p3":
+            expected += series * prices[ticker]
+    np.testing.assert_allclose(whole.market_value["p3"], expected)